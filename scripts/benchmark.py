@@ -0,0 +1,291 @@
+import argparse
+import datetime
+import functools
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+
+# Add the project root directory to the Python path when run as a file;
+# `python -m scripts.cli` runs from the root and needs no path changes
+if not __package__:
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from scripts import enrich_prospects, run_matching
+from src import llm_client
+from src.cache import MemoryCache, ScrapeCache, set_scrape_cache
+from src.classifier import DEFAULT_MAX_CONCURRENCY, BatchStats, classify_many, set_cache
+from src.codes_file import export_codes_file
+from src.llm_client import FakeLLMClient
+from src.metrics import Metrics, set_metrics
+from src.scheduler import RequestScheduler, get_scheduler, set_scheduler
+from src.synthetic import (SyntheticSite, fake_responder, prospect_rows, write_partners_csv,
+                           write_partners_with_codes, write_prospects_csv, write_prospects_with_codes)
+
+logger = logging.getLogger(__name__)
+
+# Benchmarks that can be selected with --benchmarks
+BENCHMARKS = ('classify', 'pipeline', 'matching')
+
+# Sizes the synthetic data generator is usually run at
+STANDARD_SIZES = (1000, 10000, 100000)
+
+# Where results are appended, one JSON object per line
+RESULTS_FILE = os.path.join('output', 'benchmarks.jsonl')
+
+# A benchmark is flagged when its rows/sec drops by more than this share
+# compared with the last recorded run of the same benchmark, variant and size
+DEFAULT_TOLERANCE = 0.2
+
+# Simulated LLM behaviour
+DEFAULT_LLM_LATENCY = 0.05
+DEFAULT_LLM_ERROR_RATE = 0.01
+
+# Pack sizes compared by the classify benchmark
+DEFAULT_PACK_SIZES = (1, 10)
+
+# Partners matched against the prospects in the matching benchmark
+DEFAULT_MATCHING_PARTNERS = 1000
+
+
+def offline_environment(latency=DEFAULT_LLM_LATENCY, error_rate=DEFAULT_LLM_ERROR_RATE, seed=0):
+    """
+    Installs a fake LLM, an empty in-memory classification cache, fresh metrics and
+    a scheduler without rate limits or long backoffs; returns the fake client.
+    """
+    fake = FakeLLMClient(fake_responder(), latency=latency, error_rate=error_rate,
+                         seed=seed, record_calls=False)
+    llm_client.set_client(fake)
+    set_cache(MemoryCache())
+    set_metrics(Metrics())
+    set_scheduler(RequestScheduler(requests_per_minute=10 ** 9, tokens_per_minute=10 ** 12,
+                                   base_delay=0.01, max_delay=0.1))
+    return fake
+
+
+def reset_environment():
+    llm_client.set_client(None)
+    set_cache(None)
+    set_scrape_cache(None)
+    set_scheduler(None)
+    set_metrics(None)
+
+
+def llm_figures(fake):
+    return {
+        'llm_requests': fake.requests,
+        'llm_errors': fake.errors,
+        'llm_retries': get_scheduler().metrics['retries'],
+        'tokens_in': fake.tokens_in,
+        'tokens_out': fake.tokens_out,
+    }
+
+
+def bench_classify(rows, latency, error_rate, pack_sizes=DEFAULT_PACK_SIZES,
+                   max_concurrency=DEFAULT_MAX_CONCURRENCY, seed=0):
+    """
+    Times classify_many over synthetic prospect descriptions once per pack size.
+    """
+    descriptions = [row['Beschreibung'] for row in prospect_rows(rows, seed=seed)]
+    results = []
+    for pack_size in pack_sizes:
+        fake = offline_environment(latency, error_rate, seed)
+        stats = BatchStats(pack_size)
+        try:
+            started = time.perf_counter()
+            classified = classify_many(descriptions, max_concurrency=max_concurrency,
+                                       pack_size=pack_size, stats=stats)
+            seconds = time.perf_counter() - started
+            figures = llm_figures(fake)
+        finally:
+            reset_environment()
+        results.append(dict(
+            benchmark='classify', variant=f"pack_size={pack_size}", rows=rows, seconds=seconds,
+            errors=sum('error' in result for result in classified),
+            fallbacks=stats.fallbacks, **figures))
+    return results
+
+
+def bench_pipeline(rows, workdir, latency, error_rate, page_latency=0.0, seed=0):
+    """
+    Times enrich_prospects.main against a local synthetic site and the fake LLM.
+    """
+    input_file = os.path.join(workdir, f"prospects_{rows}.csv")
+    output_file = os.path.join(workdir, f"prospects_{rows}_with_codes.csv")
+    with SyntheticSite(seed=seed, latency=page_latency) as site:
+        write_prospects_csv(input_file, rows, base_url=site.base_url, seed=seed)
+        fake = offline_environment(latency, error_rate, seed)
+        page_cache = ScrapeCache(os.path.join(workdir, 'scrape_cache.db'))
+        set_scrape_cache(page_cache)
+        try:
+            started = time.perf_counter()
+            enrich_prospects.main(input_file=input_file, output_file=output_file,
+                                  log_file=os.path.join(workdir, 'unknown_log.csv'))
+            seconds = time.perf_counter() - started
+            figures = llm_figures(fake)
+        finally:
+            reset_environment()
+            page_cache.close()
+    with open(output_file + '.run.json', encoding='utf-8') as f:
+        summary = json.load(f)
+    stages = {name: stage['items_per_second'] for name, stage in summary['stages'].items()}
+    return [dict(benchmark='pipeline', variant='default', rows=rows, seconds=seconds,
+                 errors=summary['rows']['error'], stage_rows_per_second=stages, **figures)]
+
+
+def bench_matching(rows, workdir, partners=DEFAULT_MATCHING_PARTNERS, seed=0):
+    """
+    Times run_matching.main (from the CSVs and from the codes files) and run_streaming
+    on synthetic classified partners and prospects.
+    """
+    partners_file = os.path.join(workdir, f"partners_{partners}_with_codes.csv")
+    prospects_file = os.path.join(workdir, f"prospects_{rows}_with_codes.csv")
+    write_partners_with_codes(partners_file, partners, seed=seed)
+    write_prospects_with_codes(prospects_file, rows, seed=seed)
+    # Build the codes files up front so the binary variant times loading, not conversion
+    export_codes_file(partners_file, 'partners')
+    export_codes_file(prospects_file, 'prospects')
+    results = []
+    for variant, run in (('batch', run_matching.main), ('stream', run_matching.run_streaming),
+                         ('binary', functools.partial(run_matching.main, binary=True))):
+        started = time.perf_counter()
+        run(partners_file=partners_file, prospects_file=prospects_file,
+            output_file=os.path.join(workdir, f"matches_{variant}.csv"))
+        seconds = time.perf_counter() - started
+        results.append(dict(benchmark='matching', variant=f"{variant},partners={partners}",
+                            rows=rows, seconds=seconds))
+    return results
+
+
+def load_results(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def compare(result, history):
+    """
+    Returns (previous rows/sec, change) against the last run of the same benchmark, or None.
+    """
+    key = (result['benchmark'], result['variant'], result['rows'])
+    previous = [r for r in history if (r['benchmark'], r['variant'], r['rows']) == key]
+    if not previous:
+        return None
+    before = previous[-1]['rows_per_second']
+    change = (result['rows_per_second'] - before) / before if before else 0.0
+    return before, change
+
+
+def run_benchmarks(benchmarks=BENCHMARKS, sizes=(1000,), results_file=RESULTS_FILE,
+                   latency=DEFAULT_LLM_LATENCY, error_rate=DEFAULT_LLM_ERROR_RATE,
+                   page_latency=0.0, pack_sizes=DEFAULT_PACK_SIZES,
+                   matching_partners=DEFAULT_MATCHING_PARTNERS, tolerance=DEFAULT_TOLERANCE,
+                   seed=0, record=True):
+    """
+    Runs the selected benchmarks at every size and appends the results to results_file.
+
+    Every result is compared with the last recorded result of the same
+    benchmark, variant and size; a drop in rows/sec larger than tolerance is
+    flagged as a regression. Returns (results, regressions).
+    """
+    history = load_results(results_file)
+    recorded_at = datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds')
+    results = []
+    regressions = []
+    for rows in sizes:
+        for benchmark in benchmarks:
+            with tempfile.TemporaryDirectory() as workdir:
+                if benchmark == 'classify':
+                    batch = bench_classify(rows, latency, error_rate, pack_sizes, seed=seed)
+                elif benchmark == 'pipeline':
+                    batch = bench_pipeline(rows, workdir, latency, error_rate, page_latency, seed=seed)
+                else:
+                    batch = bench_matching(rows, workdir, matching_partners, seed=seed)
+            for result in batch:
+                result['seconds'] = round(result['seconds'], 3)
+                result['rows_per_second'] = round(rows / result['seconds'], 1) if result['seconds'] else 0.0
+                result.update(recorded_at=recorded_at, python=platform.python_version(),
+                              llm_latency=latency, llm_error_rate=error_rate)
+                comparison = compare(result, history)
+                line = (f"{result['benchmark']:<9} {result['variant']:<24} {rows:>7} rows "
+                        f"{result['seconds']:>9.3f}s {result['rows_per_second']:>10.1f} rows/s")
+                if comparison is not None:
+                    before, change = comparison
+                    line += f" ({change:+.0%} vs {before:.1f})"
+                    if change < -tolerance:
+                        line += " REGRESSION"
+                        regressions.append(result)
+                print(line)
+                results.append(result)
+
+    if record and results:
+        if os.path.dirname(results_file):
+            os.makedirs(os.path.dirname(results_file), exist_ok=True)
+        with open(results_file, 'a', encoding='utf-8') as f:
+            for result in results:
+                f.write(json.dumps(result, sort_keys=True) + '\n')
+    return results, regressions
+
+
+def write_data(directory, sizes, seed=0):
+    """
+    Writes synthetic prospect and partner CSVs of each size into directory.
+    """
+    os.makedirs(directory, exist_ok=True)
+    for rows in sizes:
+        write_prospects_csv(os.path.join(directory, f"prospects_{rows}.csv"), rows, seed=seed)
+        write_partners_csv(os.path.join(directory, f"partners_{rows}.csv"), rows, seed=seed)
+        write_prospects_with_codes(os.path.join(directory, f"prospects_{rows}_with_codes.csv"), rows, seed=seed)
+        write_partners_with_codes(os.path.join(directory, f"partners_{rows}_with_codes.csv"), rows, seed=seed)
+        print(f"Wrote synthetic data for {rows} rows to {directory}")
+
+
+def cli(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="Offline benchmarks with a fake LLM and synthetic data.")
+    parser.add_argument('--benchmarks', nargs='+', choices=BENCHMARKS, default=list(BENCHMARKS),
+                        help="Benchmarks to run.")
+    parser.add_argument('--sizes', nargs='+', type=int, default=[1000],
+                        help=f"Row counts to run at, e.g. {' '.join(map(str, STANDARD_SIZES))}.")
+    parser.add_argument('--llm-latency', type=float, default=DEFAULT_LLM_LATENCY,
+                        help="Seconds each fake LLM call takes.")
+    parser.add_argument('--llm-error-rate', type=float, default=DEFAULT_LLM_ERROR_RATE,
+                        help="Share of fake LLM calls that fail with a retryable error.")
+    parser.add_argument('--page-latency', type=float, default=0.0,
+                        help="Seconds the synthetic site takes to serve each page.")
+    parser.add_argument('--pack-sizes', nargs='+', type=int, default=list(DEFAULT_PACK_SIZES),
+                        help="Pack sizes compared by the classify benchmark.")
+    parser.add_argument('--matching-partners', type=int, default=DEFAULT_MATCHING_PARTNERS,
+                        help="Number of synthetic partners in the matching benchmark.")
+    parser.add_argument('--results-file', default=RESULTS_FILE,
+                        help="JSON lines file the results are appended to and compared with.")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed drop in rows/sec before a result is flagged as a regression.")
+    parser.add_argument('--no-record', action='store_true',
+                        help="Compare with earlier results without appending this run.")
+    parser.add_argument('--fail-on-regression', action='store_true',
+                        help="Exit with status 1 if any benchmark regressed.")
+    parser.add_argument('--write-data', metavar='DIR',
+                        help="Only write synthetic CSVs of each size into DIR.")
+    parser.add_argument('--seed', type=int, default=0,
+                        help="Seed for the synthetic data and the fake LLM.")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    if args.write_data:
+        write_data(args.write_data, args.sizes, seed=args.seed)
+        sys.exit(0)
+    _, regressions = run_benchmarks(
+        args.benchmarks, args.sizes, args.results_file, latency=args.llm_latency,
+        error_rate=args.llm_error_rate, page_latency=args.page_latency,
+        pack_sizes=args.pack_sizes, matching_partners=args.matching_partners,
+        tolerance=args.tolerance, seed=args.seed, record=not args.no_record)
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+# Execution Block
+if __name__ == "__main__":
+    cli()
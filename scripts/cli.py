@@ -0,0 +1,88 @@
+import argparse
+import importlib
+import json
+import os
+import subprocess
+import sys
+
+from dotenv import load_dotenv
+
+# Run as `python -m scripts.cli` from here, which puts the project root on the
+# Python path without any sys.path changes
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Subcommands and the script module whose cli(argv, prog) runs them. A
+# module is only imported when its command runs, so e.g. 'match' and
+# 'cache' never load the Gemini SDK or the scraping libraries.
+COMMANDS = {
+    'partners': ('scripts.process_partners', "Classify partners into audience codes."),
+    'prospects': ('scripts.enrich_prospects', "Scrape, summarize and classify prospects."),
+    'match': ('scripts.run_matching', "Match prospects to partners."),
+    'cache': ('scripts.manage_cache', "Inspect and maintain the classification cache."),
+    'tune-retrieval': ('scripts.tune_retrieval', "Check the recall of local taxonomy retrieval."),
+    'benchmark': ('scripts.benchmark', "Offline benchmarks with a fake LLM and synthetic data."),
+}
+
+# Modules that are slow to import; reported by import-times when a command loads them
+HEAVY_MODULES = ('google.generativeai', 'bs4', 'requests')
+
+def measure_import(command):
+    """
+    Imports a command's module in a fresh interpreter.
+
+    Returns (seconds, heavy modules it loaded); interpreter startup itself
+    is not included.
+    """
+    code = (
+        "import json, sys, time\n"
+        "started = time.perf_counter()\n"
+        f"import {COMMANDS[command][0]}\n"
+        "seconds = time.perf_counter() - started\n"
+        f"print(json.dumps([seconds, [m for m in {list(HEAVY_MODULES)!r} if m in sys.modules]]))\n"
+    )
+    completed = subprocess.run([sys.executable, '-c', code], cwd=PROJECT_ROOT,
+                               capture_output=True, text=True, check=True)
+    seconds, heavy = json.loads(completed.stdout.strip().splitlines()[-1])
+    return seconds, heavy
+
+def print_import_times(commands, repeat=3):
+    """
+    Prints the best of repeat import times of each command's module.
+    """
+    for command in commands:
+        timings = [measure_import(command) for _ in range(repeat)]
+        seconds = min(seconds for seconds, _ in timings)
+        heavy = timings[0][1]
+        print(f"{command:<15} {seconds * 1000:>8.1f} ms"
+              + (f"  (loads {', '.join(heavy)})" if heavy else ""))
+
+def main(argv=None):
+    """
+    Runs one subcommand, e.g. `python -m scripts.cli match --top-k 5`.
+
+    Everything after the command name is passed on to that command's own
+    argument parser, so `<command> --help` shows its options.
+    """
+    parser = argparse.ArgumentParser(
+        prog='python -m scripts.cli', description="LLM classifier and matching tools.",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="commands:\n" + '\n'.join(f"  {name:<15} {help}" for name, (_, help) in COMMANDS.items())
+        + f"\n  {'import-times':<15} Measure how long each command takes to import.")
+    parser.add_argument('command', choices=list(COMMANDS) + ['import-times'], metavar='command')
+    parser.add_argument('args', nargs=argparse.REMAINDER, help="Arguments of the command.")
+    args = parser.parse_args(argv)
+
+    if args.command == 'import-times':
+        unknown = [command for command in args.args if command not in COMMANDS]
+        if unknown:
+            parser.error(f"unknown commands: {', '.join(unknown)}")
+        print_import_times(args.args or list(COMMANDS))
+        return
+    # Loaded before the command is imported, so .env also sets the settings
+    # modules read at import time (e.g. GEMINI_JSON_MODE)
+    load_dotenv()
+    module = importlib.import_module(COMMANDS[args.command][0])
+    module.cli(args.args, prog=f"{parser.prog} {args.command}")
+
+if __name__ == "__main__":
+    main()
@@ -1,133 +1,414 @@
+import argparse
 import csv
+import logging
 import os
 import json
 import sys
-import requests
-from bs4 import BeautifulSoup
-from google import generativeai as genai
-from dotenv import load_dotenv
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from src.classifier import classify_blurb
+import threading
 
-load_dotenv()
+# Add the project root directory to the Python path when run as a file;
+# `python -m scripts.cli` runs from the root and needs no path changes
+if not __package__:
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.classifier import DEFAULT_MAX_CONCURRENCY, DEFAULT_PACK_SIZE, BatchStats, classify_many, set_retriever
+from src.codes_file import export_codes_file
+from src.journal import CheckpointWriter, RunJournal, rewrite_from_journal, row_keys
+from src import llm_client
+from src.budget import BudgetExceeded, RunBudget, set_budget
+from src.cache import get_scrape_cache, make_summary_key
+from src.extraction import DEFAULT_TOKEN_BUDGET, reduce_page, row_context
+from src.metrics import Metrics, get_metrics, set_metrics, write_run_summary
+from src.near_duplicates import DEFAULT_THRESHOLD, NearDuplicateIndex
+from src.pipeline import Pipeline, Stage, StageFailure
+from src.prefilter import DEFAULT_AUDIT_RATE, PrefilterStats, load_rules
+from src.retrieval import load_retriever
+from src.scheduler import get_scheduler
+from src.scraper import DEFAULT_MAX_WORKERS, Scraper, get_scraper
+
+logger = logging.getLogger(__name__)
 
 # Task 3.2: Implement Placeholder Scraper
 def scrape_url(url):
     """
     Scrapes a URL, extracts the text content, and returns it.
     """
-    try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()  # Raise an exception for bad status codes
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Find the body tag and get all the text
-        body = soup.find('body')
-        if body:
-            return body.get_text(separator=' ', strip=True)
-        return ""  # Return empty string if no body tag is found
-        
-    except requests.exceptions.RequestException as e:
-        print(f"Error scraping {url}: {e}")
-        return ""
+    return get_scraper().scrape(url)
+
+# Model used to summarize scraped pages
+SUMMARY_MODEL_NAME = 'gemini-2.0-flash'
+
+# Bump whenever SUMMARY_PROMPT changes so that cached summaries are not reused
+SUMMARY_PROMPT_VERSION = "1"
+
+SUMMARY_PROMPT = (
+    "As a business analyst, return a concise, 2-3 sentence summary of a company's "
+    "main products and primary customer segments based on the text provided."
+)
+
+# Summary cache counters for the end-of-run report
+summary_stats = {'cache_hits': 0, 'llm_calls': 0}
+_summary_stats_lock = threading.Lock()
+
+def _count_summary(name):
+    with _summary_stats_lock:
+        summary_stats[name] += 1
 
 # Task 3.3: Implement Two-Step LLM Pipeline (Summarizer)
 def get_summary(full_text):
     """
     Uses the live Gemini API to generate a summary of a company's main products and customer segments.
+
+    Summaries are cached by a hash of the normalized page text and the
+    summary prompt version, so unchanged pages are not summarized again.
+    A call that still fails after the scheduler's retries, or returns no
+    text, raises, so the row is journaled as an error and --retry-errors
+    picks it up; BudgetExceeded is raised if the run budget refuses the call.
     """
-    prompt_template = (
-        "As a business analyst, return a concise, 2-3 sentence summary of a company's "
-        "main products and primary customer segments based on the text provided."
-    )
+    cache = get_scrape_cache()
+    cache_key = make_summary_key(full_text, SUMMARY_MODEL_NAME, SUMMARY_PROMPT_VERSION)
+    cached = cache.get(cache_key)
+    if cached is not None:
+        _count_summary('cache_hits')
+        get_metrics().inc('summary.cache', result='hit')
+        return cached
+    get_metrics().inc('summary.cache', result='miss')
 
+    # Call the shared gemini-2.0-flash model with the prompt and the full text
+    prompt = f"{SUMMARY_PROMPT}\n\nTEXT: {full_text}"
+    _count_summary('llm_calls')
     try:
-        # Configure the genai client using the API key
-        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-        
-        # Use the gemini-2.0-flash model
-        model = genai.GenerativeModel('gemini-2.0-flash')
-        
-        # Call the generate_content method with the prompt and the full text
-        prompt = f"{prompt_template}\n\nTEXT: {full_text}"
-        response = model.generate_content(prompt)
-        
-        # Return the response.text on success
-        return response.text
+        summary = llm_client.generate(prompt, SUMMARY_MODEL_NAME, stage='summarize')
+    except BudgetExceeded:
+        raise
     except Exception as e:
-        print(f"An error occurred with the Gemini API: {e}")
-        return ""
+        logger.warning("An error occurred with the Gemini API: %s", e)
+        raise
+    if not summary or not summary.strip():
+        raise ValueError("the summarizer returned an empty summary")
+
+    cache.set(cache_key, summary, model=SUMMARY_MODEL_NAME, prompt_version=SUMMARY_PROMPT_VERSION)
+    return summary
+
+# Threads summarizing pages at once in the pipeline's summarize stage
+DEFAULT_SUMMARY_WORKERS = 8
+
+# How the CSV's Beschreibung/Kategorie columns are used:
+# 'off' ignores them, 'fallback' uses them as the summary when a page yields
+# no text, 'extra' also passes them to the summarizer alongside the page text
+ROW_CONTEXT_MODES = ('off', 'fallback', 'extra')
+DEFAULT_ROW_CONTEXT = 'fallback'
+
+# Input token counters for the end-of-run report
+reduction_stats = {'pages': 0, 'raw_tokens': 0, 'reduced_tokens': 0, 'fallbacks': 0}
+
+def _count_reduction(url, report):
+    with _summary_stats_lock:
+        reduction_stats['pages'] += 1
+        reduction_stats['raw_tokens'] += report['raw_tokens']
+        reduction_stats['reduced_tokens'] += report['reduced_tokens']
+    metrics = get_metrics()
+    metrics.inc('extraction.raw_tokens', report['raw_tokens'])
+    metrics.inc('extraction.reduced_tokens', report['reduced_tokens'])
+    logger.debug("Reduced %s: %d -> %d tokens (%d saved)",
+                 url, report['raw_tokens'], report['reduced_tokens'], report['saved_tokens'])
+
+# Define headers
+OUTPUT_HEADERS = ['firma', 'url', 'audience_codes']
+LOG_HEADERS = ['firma', 'url', 'summary']
+
+def prospect_key(row):
+    """
+    Stable key identifying a prospect row across runs.
+    """
+    return f"{row.get('firma', '')}|{row.get('url', '')}"
+
+def build_pipeline(scraper, stats, max_concurrency=DEFAULT_MAX_CONCURRENCY,
+                   pack_size=DEFAULT_PACK_SIZE, summary_workers=DEFAULT_SUMMARY_WORKERS,
+                   page_token_budget=DEFAULT_TOKEN_BUDGET, row_context_mode=DEFAULT_ROW_CONTEXT,
+                   near_duplicates=None):
+    """
+    Builds the scrape -> summarize -> classify pipeline.
+
+    Each item is a dict holding the prospect's url and its row context
+    (see src.extraction.row_context); the stages add 'text', 'summary' and
+    'audience_codes' to it. Items that already have 'audience_codes' pass
+    through untouched. Pages are reduced to their informative text
+    within page_token_budget before summarization. The classify stage takes
+    up to pack_size summaries at a time so that packed requests stay full,
+    and reuses results for near-duplicate summaries via near_duplicates.
+    """
+    # Rows answered by the rule fast path already carry their audience_codes
+    def scrape(job):
+        if 'audience_codes' in job:
+            return job
+        page = scraper.fetch_page(job['url'])
+        job['text'] = ""
+        if page is not None:
+            job['text'], report = reduce_page(*page, max_tokens=page_token_budget)
+            _count_reduction(job['url'], report)
+        return job
+
+    def summarize(job):
+        if 'audience_codes' in job:
+            return job
+        context = job.get('context') if row_context_mode != 'off' else ""
+        if context and not job['text']:
+            # The row's own description is a usable summary; skip the LLM
+            with _summary_stats_lock:
+                reduction_stats['fallbacks'] += 1
+            job['summary'] = context
+        elif context and row_context_mode == 'extra':
+            job['summary'] = get_summary(f"{context}\n\n{job['text']}")
+        else:
+            job['summary'] = get_summary(job['text'])
+        return job
+
+    def classify(jobs):
+        todo = [job for job in jobs if 'audience_codes' not in job]
+        results = classify_many([job['summary'] for job in todo], max_concurrency=1,
+                                pack_size=pack_size, stats=stats, near_duplicates=near_duplicates,
+                                names=[job.get('name') for job in todo])
+        for job, audience_codes in zip(todo, results):
+            job['audience_codes'] = audience_codes
+        return jobs
+
+    return Pipeline([
+        Stage('scrape', scrape, workers=scraper.max_workers),
+        Stage('summarize', summarize, workers=summary_workers),
+        Stage('classify', classify if pack_size > 1 else (lambda job: classify([job])[0]),
+              workers=max_concurrency, batch_size=pack_size),
+    ])
 
 # Tasks 3.4 & 3.5: Implement Main Processing Logic
-def main():
+def main(max_concurrency=DEFAULT_MAX_CONCURRENCY, pack_size=DEFAULT_PACK_SIZE,
+         scrape_workers=DEFAULT_MAX_WORKERS, summary_workers=DEFAULT_SUMMARY_WORKERS,
+         page_token_budget=DEFAULT_TOKEN_BUDGET, row_context_mode=DEFAULT_ROW_CONTEXT,
+         use_rules=False, audit_rate=DEFAULT_AUDIT_RATE, near_duplicate_threshold=DEFAULT_THRESHOLD,
+         resume=False, retry_errors=False,
+         input_file='data/Manuav B-Liste Export.csv',
+         output_file='output/prospects_with_codes.csv',
+         log_file='logs/unknown_log.csv',
+         summary_file=None, binary_output=False, taxonomy_top_n=0, max_tokens=None, max_calls=None):
     """
     Main function to orchestrate the prospect enrichment pipeline.
+
+    Rows stream through concurrent scrape, summarize and classify stages
+    (see src.pipeline), so fetching, summarizing and classifying overlap.
+    Finished rows are appended (and fsynced) to the output in input order
+    and recorded in a run journal next to it. With resume, rows already in
+    the journal are skipped; with retry_errors, rows whose last result was
+    an error are processed again.
+
+    With use_rules, prospects whose Kategorie clearly matches a rule of the
+    'prospects' profile in prefilter_rules.json skip scraping, summarizing and the LLM; a share
+    (audit_rate) of them still goes through the pipeline to measure
+    agreement. Summaries whose similarity to an already classified summary
+    reaches near_duplicate_threshold reuse its result; 0 turns this off.
+
+    At the end a JSON run summary (per-stage rows/sec, metrics and counters)
+    is written to summary_file, by default <output>.run.json. With
+    binary_output, the compact codes file read by run_matching.py --binary
+    is written next to the CSV as well.
+
+    With taxonomy_top_n, classification prompts list only the taxonomy_top_n
+    codes that local retrieval (src.retrieval) ranks highest for the
+    summaries, plus UNKNOWN and OTHER; 0 sends the full taxonomy.
+
+    max_tokens and max_calls limit the LLM tokens and calls of the run
+    (src.budget). Once either is used up, no further rows are fed into the
+    pipeline, rows already in it finish, and rows whose summary or
+    classification call was refused are left out of the journal, so a
+    later --resume run picks them up.
     """
     # Prepare output and log directories
-    os.makedirs('output', exist_ok=True)
-    os.makedirs('logs', exist_ok=True)
-
-    # Define file paths
-    input_file = 'data/Manuav B-Liste Export.csv'
-    output_file = 'output/prospects_with_codes.csv'
-    log_file = 'logs/unknown_log.csv'
-
-    # Define headers
-    output_headers = ['firma', 'url', 'audience_codes']
-    log_headers = ['firma', 'url', 'summary']
-
-    print(f"Starting prospect enrichment process...")
-    print(f"Input file: {input_file}")
-
-    with open(input_file, mode='r', encoding='latin-1') as infile, \
-         open(output_file, mode='w', newline='', encoding='utf-8') as outfile, \
-         open(log_file, mode='w', newline='', encoding='utf-8') as logfile:
-
-        reader = csv.DictReader(infile)
-        
-        output_writer = csv.DictWriter(outfile, fieldnames=output_headers)
-        output_writer.writeheader()
-        
-        log_writer = csv.DictWriter(logfile, fieldnames=log_headers)
-        log_writer.writeheader()
-
-        for row in reader:
+    for path in (output_file, log_file):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+    journal_file = output_file + '.journal.jsonl'
+    summary_file = summary_file or output_file + '.run.json'
+    set_metrics(Metrics())
+    # The report counters are per run, also when main() runs several times in one process
+    with _summary_stats_lock:
+        summary_stats.update(dict.fromkeys(summary_stats, 0))
+        reduction_stats.update(dict.fromkeys(reduction_stats, 0))
+    set_retriever(load_retriever(top_n=taxonomy_top_n) if taxonomy_top_n else None)
+    budget = RunBudget(max_tokens, max_calls)
+    set_budget(budget)
+
+    logger.info("Starting prospect enrichment process...")
+    logger.info("Input file: %s", input_file)
+
+    with open(input_file, mode='r', encoding='latin-1') as infile:
+        rows = [row for row in csv.DictReader(infile) if row.get('url')]
+    keys = row_keys(rows, prospect_key)
+
+    journal = RunJournal(journal_file)
+    if not resume:
+        journal.reset()
+    pending = [(key, row) for key, row in zip(keys, rows)
+               if journal.should_process(key, retry_errors)]
+    logger.info("%d of %d prospects already done; processing %d.",
+                len(rows) - len(pending), len(rows), len(pending))
+
+    stats = BatchStats(pack_size)
+    scraper = Scraper(max_workers=scrape_workers, page_cache=get_scrape_cache())
+    near_duplicates = NearDuplicateIndex(near_duplicate_threshold) if near_duplicate_threshold else None
+    pipeline = build_pipeline(scraper, stats, max_concurrency, pack_size, summary_workers,
+                              page_token_budget, row_context_mode, near_duplicates)
+    rules = load_rules(profile='prospects') if use_rules else None
+    prefilter = PrefilterStats(audit_rate)
+
+    def make_job(row):
+        job = {'url': row.get('url'), 'name': row.get('firma'), 'context': row_context(row)}
+        rule_codes = rules.classify(row) if rules else None
+        if prefilter.admit(rule_codes):
+            job['rule_codes'] = rule_codes
+        elif rule_codes is not None:
+            job['audience_codes'] = rule_codes
+        return job
+
+    def admitted_jobs():
+        for _, row in pending:
+            if budget.exhausted:
+                logger.warning("LLM budget used up; no further prospects are started.")
+                return
+            yield make_job(row)
+
+    deferred = 0
+    output_writer = CheckpointWriter(output_file, OUTPUT_HEADERS, resume=resume)
+    log_writer = CheckpointWriter(log_file, LOG_HEADERS, resume=resume)
+    try:
+        for (key, row), job in zip(pending, pipeline.run(admitted_jobs())):
             firma = row.get('firma')
             url = row.get('url')
 
-            if not url:
+            if (isinstance(job, StageFailure) and isinstance(job.error, BudgetExceeded)
+                    or isinstance(job, dict) and job['audience_codes'].get('budget_exceeded')):
+                # Refused by the budget; left for a later --resume run
+                deferred += 1
                 continue
+            if isinstance(job, StageFailure):
+                audience_codes = {"error": f"{job.stage} failed: {job.error}"}
+            else:
+                audience_codes = job['audience_codes']
+                if 'rule_codes' in job:
+                    prefilter.record_audit(job['rule_codes'], audience_codes, label=key)
+
+                # Logging for UNKNOWN/OTHER
+                primary_code = audience_codes.get('primary')
+                if primary_code in ['UNKNOWN', 'OTHER']:
+                    log_writer.writerow({
+                        'firma': firma,
+                        'url': url,
+                        'summary': job.get('summary', '')
+                    })
 
-            # Task 3.3 Orchestration
-            # 1. Scrape URL to get fake full text
-            full_text = scrape_url(url)
-            
-            # 2. Get clean summary
-            summary = get_summary(full_text)
-            
-            # 3. Classify the summary to get codes
-            audience_codes = classify_blurb(summary)
-
-            # Logging for UNKNOWN/OTHER
-            primary_code = audience_codes.get('primary')
-            if primary_code in ['UNKNOWN', 'OTHER']:
-                log_writer.writerow({
-                    'firma': firma,
-                    'url': url,
-                    'summary': summary
-                })
-
-            # Write to main output file
-            output_writer.writerow({
+            # Write to main output file and record the row as done
+            output_row = {
                 'firma': firma,
                 'url': url,
                 'audience_codes': json.dumps(audience_codes)
-            })
+            }
+            output_writer.writerow(output_row)
+            journal.record(key, 'error' if 'error' in audience_codes else 'ok', output_row)
+    finally:
+        scraper.close()
+        output_writer.close()
+        log_writer.close()
+        journal.close()
+
+    # Drop rows superseded by retries and restore input order
+    rewrite_from_journal(output_file, OUTPUT_HEADERS, keys, journal)
+    if binary_output:
+        logger.info("Codes file for matching written to %s", export_codes_file(output_file, 'prospects'))
+
+    counts = journal.counts()
+    logger.info("Processing complete.")
+    logger.info("Rows: %d ok, %d errors (rerun with --resume --retry-errors to retry)",
+                counts['ok'], counts['error'])
+    not_done = len(rows) - counts['ok'] - counts['error']
+    if not_done:
+        logger.warning("%d prospects not processed (%d refused by the LLM budget); rerun with --resume.",
+                       not_done, deferred)
+    logger.info("%s", pipeline.report())
+    logger.info("Scraping: %d fetched, %d from cache, %d revalidated, %d errors",
+                scraper.stats['fetched'], scraper.stats['cache_hits'],
+                scraper.stats['revalidated'], scraper.stats['errors'])
+    saved = reduction_stats['raw_tokens'] - reduction_stats['reduced_tokens']
+    logger.info("Page text: %d -> %d tokens over %d pages (%d saved)",
+                reduction_stats['raw_tokens'], reduction_stats['reduced_tokens'],
+                reduction_stats['pages'], saved)
+    logger.info("Summaries: %d LLM calls, %d from cache, %d taken from the CSV description",
+                summary_stats['llm_calls'], summary_stats['cache_hits'], reduction_stats['fallbacks'])
+    if rules:
+        logger.info("Rule fast path: %s", prefilter.report())
+    logger.info("Classification: %s", stats.report())
+    metrics = get_scheduler().metrics
+    logger.info("LLM requests: %d, retries: %d, failures: %d, circuit opens: %d",
+                metrics['requests'], metrics['retries'], metrics['failures'], metrics['circuit_opens'])
+    logger.info("LLM budget: %s", budget.report())
+    logger.info("Results saved to: %s", output_file)
+    logger.info("Log for 'UNKNOWN' or 'OTHER' classifications saved to: %s", log_file)
+
+    write_run_summary(summary_file, script='enrich_prospects', rows=counts,
+                      pipeline_seconds=round(pipeline.seconds or 0.0, 3),
+                      stages={stage.name: stage.summary() for stage in pipeline.stages},
+                      scraping=dict(scraper.stats), page_text=dict(reduction_stats),
+                      summaries=dict(summary_stats), classification=stats.summary(),
+                      prefilter=prefilter.summary() if rules else None,
+                      scheduler=dict(metrics), budget=budget.summary())
+    logger.info("Run summary written to %s", summary_file)
 
-    print(f"Processing complete.")
-    print(f"Results saved to: {output_file}")
-    print(f"Log for 'UNKNOWN' or 'OTHER' classifications saved to: {log_file}")
+def cli(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="Enrich prospects with audience codes.")
+    parser.add_argument('--max-concurrency', type=int, default=DEFAULT_MAX_CONCURRENCY,
+                        help="Maximum number of classification requests in flight at once.")
+    parser.add_argument('--pack-size', type=int, default=DEFAULT_PACK_SIZE,
+                        help="Number of descriptions classified per LLM request.")
+    parser.add_argument('--scrape-workers', type=int, default=DEFAULT_MAX_WORKERS,
+                        help="Maximum number of pages fetched at once.")
+    parser.add_argument('--summary-workers', type=int, default=DEFAULT_SUMMARY_WORKERS,
+                        help="Maximum number of pages summarized at once.")
+    parser.add_argument('--page-token-budget', type=int, default=DEFAULT_TOKEN_BUDGET,
+                        help="Maximum estimated tokens of page text sent to the summarizer.")
+    parser.add_argument('--row-context', choices=ROW_CONTEXT_MODES, default=DEFAULT_ROW_CONTEXT,
+                        help="How to use the CSV's Beschreibung/Kategorie columns.")
+    parser.add_argument('--rules', action='store_true',
+                        help="Classify prospects that clearly match prefilter_rules.json without the LLM.")
+    parser.add_argument('--rules-audit-rate', type=float, default=DEFAULT_AUDIT_RATE,
+                        help="Share of rule-classified prospects also sent to the LLM to measure agreement.")
+    parser.add_argument('--near-duplicate-threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="Similarity (0-1) at which summaries share one classification; 0 disables.")
+    parser.add_argument('--resume', action='store_true',
+                        help="Skip prospects already recorded in the run journal.")
+    parser.add_argument('--retry-errors', action='store_true',
+                        help="With --resume, process prospects whose last result was an error again.")
+    parser.add_argument('--taxonomy-top-n', type=int, default=0,
+                        help="List only the N most likely codes in classification prompts (0 = full taxonomy); "
+                             "see scripts/tune_retrieval.py.")
+    parser.add_argument('--max-tokens', type=int, default=None,
+                        help="Stop starting new prospects once the run's LLM calls have used this many tokens.")
+    parser.add_argument('--max-calls', type=int, default=None,
+                        help="Stop starting new prospects after this many LLM calls.")
+    parser.add_argument('--binary-output', action='store_true',
+                        help="Also write the compact codes file (<output>.bin) read by run_matching.py --binary.")
+    parser.add_argument('--summary-file', default=None,
+                        help="Where to write the JSON run summary (default: <output>.run.json).")
+    parser.add_argument('--log-level', default='INFO',
+                        help="Logging level, e.g. DEBUG to see per-page reductions and raw LLM responses.")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=args.log_level.upper(),
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    main(max_concurrency=args.max_concurrency, pack_size=args.pack_size,
+         scrape_workers=args.scrape_workers, summary_workers=args.summary_workers,
+         page_token_budget=args.page_token_budget, row_context_mode=args.row_context,
+         use_rules=args.rules, audit_rate=args.rules_audit_rate,
+         near_duplicate_threshold=args.near_duplicate_threshold, resume=args.resume,
+         retry_errors=args.retry_errors, summary_file=args.summary_file,
+         binary_output=args.binary_output, taxonomy_top_n=args.taxonomy_top_n,
+         max_tokens=args.max_tokens, max_calls=args.max_calls)
 
 # Add Execution Block
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    cli()
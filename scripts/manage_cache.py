@@ -0,0 +1,202 @@
+import argparse
+import csv
+import json
+import logging
+import os
+import sqlite3
+import sys
+from contextlib import closing
+
+# Add the project root directory to the Python path when run as a file;
+# `python -m scripts.cli` runs from the root and needs no path changes
+if not __package__:
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from scripts.process_partners import create_partner_blurb
+from src.cache import SQLiteCache, make_cache_key
+from src.classifier import (CACHE_DB, MODEL_NAME, PROMPT_VERSION, is_current_entry, load_taxonomy,
+                            validate_result)
+
+logger = logging.getLogger(__name__)
+
+def open_db(path, ttl_days=None):
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No cache database at {path}")
+    return SQLiteCache(path, ttl=ttl_days * 86400 if ttl_days else None)
+
+def is_scrape_cache(path):
+    """
+    True if the database at path is a scrape cache (it has the pages table of src.cache.ScrapeCache).
+    """
+    with closing(sqlite3.connect(path)) as conn:
+        return conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'pages'").fetchone() is not None
+
+def usable_result(result, taxonomy):
+    """
+    True if a result from a *_with_codes CSV can stand in for an LLM answer to its own description.
+
+    Errors, rule fast-path answers and answers shared from a near-duplicate
+    description are not LLM answers to that exact description.
+    """
+    return (isinstance(result, dict) and 'error' not in result
+            and result.get('primary') in taxonomy
+            and 'near_duplicate_of' not in result
+            and not str(result.get('explanation', '')).startswith('Rule-based:'))
+
+def warm(cache, pairs, taxonomy):
+    """
+    Stores (description, result) pairs as full-prompt answers, keeping existing entries.
+
+    Results go through validate_result first, so the cache holds exactly
+    what the classifier itself would have stored.
+
+    Returns {'warmed': n, 'present': n, 'skipped': n}.
+    """
+    counts = {'warmed': 0, 'present': 0, 'skipped': 0}
+    for description, result in pairs:
+        if not description or not usable_result(result, taxonomy):
+            counts['skipped'] += 1
+            continue
+        result, problem = validate_result(result, taxonomy)
+        if problem:
+            counts['skipped'] += 1
+            continue
+        key = make_cache_key(description, taxonomy.version, MODEL_NAME, PROMPT_VERSION)
+        if key in cache:
+            counts['present'] += 1
+            continue
+        cache.set(key, result, model=MODEL_NAME, prompt_version=PROMPT_VERSION,
+                  taxonomy_version=taxonomy.version)
+        counts['warmed'] += 1
+    return counts
+
+def _results(rows):
+    for row in rows:
+        try:
+            yield row, json.loads(row.get('audience_codes') or 'null')
+        except json.JSONDecodeError:
+            yield row, None
+
+def partner_pairs(codes_file, input_file):
+    """
+    Pairs partners_with_codes.csv results with the blurbs rebuilt from the partner input CSV.
+    """
+    with open(input_file, mode='r', encoding='latin-1') as infile:
+        blurbs = {row['Company Name']: create_partner_blurb(row) for row in csv.DictReader(infile)}
+    with open(codes_file, mode='r', encoding='utf-8') as infile:
+        return [(blurbs.get(row['Company Name']), result) for row, result in _results(csv.DictReader(infile))]
+
+def column_pairs(codes_file, column):
+    """
+    Pairs each result of a *_with_codes CSV with the description in one of its own columns.
+    """
+    with open(codes_file, mode='r', encoding='utf-8') as infile:
+        return [(row.get(column), result) for row, result in _results(csv.DictReader(infile))]
+
+def print_stats(stats):
+    print(f"Cache: {stats['path']}")
+    print(f"  Entries: {stats['entries']} ({stats['error_entries']} errors), "
+          f"data {stats['data_bytes'] / 1e6:.2f} MB, file {stats['file_bytes'] / 1e6:.2f} MB")
+    if stats['hit_rate'] is None:
+        print("  Hit rate: no lookups recorded yet")
+    else:
+        print(f"  Hit rate: {stats['hit_rate']:.1%} ({stats['hits']} hits, {stats['misses']} misses)")
+    print("  Age:       " + ', '.join(f"{label} {n}" for label, n in stats['age'].items()))
+    print("  Last used: " + ', '.join(f"{label} {n}" for label, n in stats['last_used'].items()))
+    print("  Versions:")
+    for version in stats['versions']:
+        print(f"    {version['entries']:>8}  model={version['model']} prompt={version['prompt_version']} "
+              f"taxonomy={version['taxonomy_version']}")
+
+def main(command, db=CACHE_DB, json_output=False, ttl_days=None, drop_unversioned=False,
+         keep_other_versions=False, max_entries=None, max_mb=None, codes_file=None,
+         input_file='data/kgs_001_ER47_20250617.csv', description_column=None):
+    """
+    Runs one cache maintenance command ('stats', 'compact', 'evict' or 'warm') on the database db.
+
+    compact drops entries of other classifier versions unless
+    keep_other_versions is set; as the summaries in a scrape cache are never
+    current classifier entries, it refuses to run on one without it.
+    """
+    if command == 'warm':
+        taxonomy = load_taxonomy()
+        if description_column:
+            pairs = column_pairs(codes_file, description_column)
+        else:
+            pairs = partner_pairs(codes_file, input_file)
+        cache = SQLiteCache(db)
+        counts = warm(cache, pairs, taxonomy)
+        print(f"Warmed {counts['warmed']} entries from {codes_file} "
+              f"({counts['present']} already cached, {counts['skipped']} not usable).")
+        cache.close()
+        return
+
+    cache = open_db(db, ttl_days)
+    try:
+        if command == 'stats':
+            stats = cache.stats()
+            if json_output:
+                print(json.dumps(stats, indent=2))
+            else:
+                print_stats(stats)
+        elif command == 'compact':
+            if not keep_other_versions and is_scrape_cache(db):
+                raise ValueError(f"{db} is a scrape cache; compacting it against the classifier "
+                                 f"versions would drop every summary (use --keep-other-versions)")
+            before = os.path.getsize(db)
+            is_current = None if keep_other_versions else is_current_entry
+            removed = cache.compact(is_current, drop_unversioned=drop_unversioned)
+            print("Removed " + ', '.join(f"{n} {reason}" for reason, n in removed.items())
+                  + f" entries; file {before / 1e6:.2f} MB -> {os.path.getsize(db) / 1e6:.2f} MB.")
+        elif command == 'evict':
+            max_bytes = int(max_mb * 1e6) if max_mb else None
+            removed = cache.evict(max_entries=max_entries, max_bytes=max_bytes)
+            print(f"Evicted {removed} entries; {len(cache)} left.")
+    finally:
+        cache.close()
+
+def cli(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="Inspect and maintain the classification cache.")
+    parser.add_argument('--db', default=CACHE_DB, help=f"Cache database (default {CACHE_DB}).")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    stats_parser = commands.add_parser('stats', help="Report size, hit rate, versions and age distribution.")
+    stats_parser.add_argument('--json', action='store_true', help="Print the report as JSON.")
+
+    compact_parser = commands.add_parser(
+        'compact', help="Drop error entries, entries from other model/prompt/taxonomy versions and expired ones.")
+    compact_parser.add_argument('--ttl-days', type=float, default=None,
+                                help="Also drop entries created more than this many days ago.")
+    compact_parser.add_argument('--drop-unversioned', action='store_true',
+                                help="Also drop entries written before version metadata was recorded.")
+    compact_parser.add_argument('--keep-other-versions', action='store_true',
+                                help="Keep entries from other classifier versions (required for scrape_cache.db).")
+
+    evict_parser = commands.add_parser('evict', help="Apply a TTL and trim to a size cap, least recently used first.")
+    evict_parser.add_argument('--ttl-days', type=float, default=None, help="Drop entries older than this.")
+    evict_parser.add_argument('--max-entries', type=int, default=None, help="Keep at most this many entries.")
+    evict_parser.add_argument('--max-mb', type=float, default=None, help="Keep at most this much entry data.")
+
+    warm_parser = commands.add_parser('warm', help="Prefill the cache from a *_with_codes CSV.")
+    warm_parser.add_argument('codes_file', help="e.g. output/partners_with_codes.csv")
+    warm_parser.add_argument('--input', default='data/kgs_001_ER47_20250617.csv',
+                             help="Partner CSV the blurbs are rebuilt from.")
+    warm_parser.add_argument('--description-column', default=None,
+                             help="Take descriptions from this column of codes_file instead of partner blurbs.")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    try:
+        main(args.command, db=args.db, json_output=getattr(args, 'json', False),
+             ttl_days=getattr(args, 'ttl_days', None),
+             drop_unversioned=getattr(args, 'drop_unversioned', False),
+             keep_other_versions=getattr(args, 'keep_other_versions', False),
+             max_entries=getattr(args, 'max_entries', None), max_mb=getattr(args, 'max_mb', None),
+             codes_file=getattr(args, 'codes_file', None), input_file=getattr(args, 'input', None),
+             description_column=getattr(args, 'description_column', None))
+    except ValueError as e:
+        parser.error(str(e))
+
+if __name__ == "__main__":
+    cli()
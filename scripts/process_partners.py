@@ -1,12 +1,26 @@
+import argparse
 import csv
+import logging
 import os
 import json
 import sys
 
-# Add the project root directory to the Python path
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+# Add the project root directory to the Python path when run as a file;
+# `python -m scripts.cli` runs from the root and needs no path changes
+if not __package__:
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from src.classifier import classify_blurb
+from src.budget import RunBudget, set_budget
+from src.classifier import DEFAULT_MAX_CONCURRENCY, DEFAULT_PACK_SIZE, BatchStats, classify_many, set_retriever
+from src.codes_file import export_codes_file
+from src.journal import CheckpointWriter, RunJournal, rewrite_from_journal, row_keys
+from src.metrics import Metrics, set_metrics, write_run_summary
+from src.near_duplicates import DEFAULT_THRESHOLD, NearDuplicateIndex
+from src.prefilter import DEFAULT_AUDIT_RATE, PrefilterStats, load_rules
+from src.retrieval import load_retriever
+from src.scheduler import get_scheduler
+
+logger = logging.getLogger(__name__)
 
 def create_partner_blurb(row):
     """
@@ -18,40 +32,186 @@ def create_partner_blurb(row):
         f"Their unique selling proposition is: {row['USP (Unique Selling Proposition) / Key Selling Points']}"
     )
 
-def main():
+# Rows classified between checkpoints
+CHECKPOINT_BATCH_SIZE = 25
+
+OUTPUT_HEADERS = ['Company Name', 'Evaluation Score', 'Avg Leads Per Day', 'audience_codes']
+
+def partner_key(row):
+    """
+    Stable key identifying a partner row across runs.
+    """
+    return row.get('Company Name', '')
+
+def main(max_concurrency=DEFAULT_MAX_CONCURRENCY, pack_size=DEFAULT_PACK_SIZE,
+         resume=False, retry_errors=False, use_rules=False, audit_rate=DEFAULT_AUDIT_RATE,
+         near_duplicate_threshold=DEFAULT_THRESHOLD,
+         input_file='data/kgs_001_ER47_20250617.csv',
+         output_file=os.path.join('output', 'partners_with_codes.csv'),
+         summary_file=None, binary_output=False, taxonomy_top_n=0, max_tokens=None, max_calls=None):
     """
     Main function to process the partner data.
+
+    Finished rows are appended (and fsynced) to the output and recorded in a
+    run journal next to it. With resume, rows already in the journal are
+    skipped; with retry_errors, rows whose last result was an error are
+    classified again.
+
+    With use_rules, partners whose Industry clearly matches a rule of the
+    'partners' profile in prefilter_rules.json are classified without the LLM; a share
+    (audit_rate) of them is still sent to the LLM to measure agreement.
+
+    Blurbs whose similarity to an already classified blurb (ignoring the
+    company name) reaches near_duplicate_threshold reuse its result; 0
+    turns this off.
+
+    At the end a JSON run summary (metrics, counters and rates) is written
+    to summary_file, by default next to the output as <output>.run.json.
+    With binary_output, the compact codes file read by run_matching.py
+    --binary is written next to the CSV as well.
+
+    With taxonomy_top_n, classification prompts list only the taxonomy_top_n
+    codes that local retrieval (src.retrieval) ranks highest for the
+    blurbs, plus UNKNOWN and OTHER; 0 sends the full taxonomy.
+
+    max_tokens and max_calls limit the LLM tokens and calls of the run
+    (src.budget). Once either is used up, no further batches are started;
+    rows whose call was refused are left out of the journal, so a later
+    --resume run picks them up.
     """
-    input_file = 'data/kgs_001_ER47_20250617.csv'
-    output_dir = 'output'
-    output_file = os.path.join(output_dir, 'partners_with_codes.csv')
+    output_dir = os.path.dirname(output_file)
+    journal_file = output_file + '.journal.jsonl'
+    summary_file = summary_file or output_file + '.run.json'
+    set_metrics(Metrics())
+    set_retriever(load_retriever(top_n=taxonomy_top_n) if taxonomy_top_n else None)
+    budget = RunBudget(max_tokens, max_calls)
+    set_budget(budget)
 
     # Create output directory if it doesn't exist
-    if not os.path.exists(output_dir):
+    if output_dir and not os.path.exists(output_dir):
         os.makedirs(output_dir)
 
-    output_headers = ['Company Name', 'Evaluation Score', 'Avg Leads Per Day', 'audience_codes']
-
-    with open(input_file, mode='r', encoding='latin-1') as infile, \
-         open(output_file, mode='w', newline='', encoding='utf-8') as outfile:
-        
-        reader = csv.DictReader(infile)
-        writer = csv.DictWriter(outfile, fieldnames=output_headers)
-        writer.writeheader()
-
-        for row in reader:
-            description = create_partner_blurb(row)
-            audience_codes = classify_blurb(description)
-            
-            output_row = {
-                'Company Name': row['Company Name'],
-                'Evaluation Score': row['Evaluation Score'],
-                'Avg Leads Per Day': row['Avg Leads Per Day'],
-                'audience_codes': json.dumps(audience_codes)
-            }
-            writer.writerow(output_row)
-
-    print(f"Processing complete. Output written to {output_file}")
+    with open(input_file, mode='r', encoding='latin-1') as infile:
+        rows = list(csv.DictReader(infile))
+    keys = row_keys(rows, partner_key)
+
+    journal = RunJournal(journal_file)
+    if not resume:
+        journal.reset()
+    pending = [(key, row) for key, row in zip(keys, rows)
+               if journal.should_process(key, retry_errors)]
+    logger.info("%d of %d partners already done; classifying %d.",
+                len(rows) - len(pending), len(rows), len(pending))
+
+    stats = BatchStats(pack_size)
+    rules = load_rules(profile='partners') if use_rules else None
+    prefilter = PrefilterStats(audit_rate)
+    near_duplicates = NearDuplicateIndex(near_duplicate_threshold) if near_duplicate_threshold else None
+    deferred = 0
+    writer = CheckpointWriter(output_file, OUTPUT_HEADERS, resume=resume)
+    try:
+        for start in range(0, len(pending), CHECKPOINT_BATCH_SIZE):
+            if budget.exhausted:
+                logger.warning("LLM budget used up; no further partners are started.")
+                break
+            batch = pending[start:start + CHECKPOINT_BATCH_SIZE]
+            rule_results = [rules.classify(row) if rules else None for _, row in batch]
+            audits = [prefilter.admit(rule_result) for rule_result in rule_results]
+            needs_llm = [i for i, (rule_result, audit) in enumerate(zip(rule_results, audits))
+                         if rule_result is None or audit]
+            descriptions = [create_partner_blurb(batch[i][1]) for i in needs_llm]
+            names = [batch[i][1]['Company Name'] for i in needs_llm]
+            llm_results = dict(zip(needs_llm, classify_many(descriptions, max_concurrency=max_concurrency,
+                                                            pack_size=pack_size, stats=stats,
+                                                            near_duplicates=near_duplicates,
+                                                            names=names)))
+
+            for i, (key, row) in enumerate(batch):
+                audience_codes = llm_results.get(i, rule_results[i])
+                if audience_codes.get('budget_exceeded'):
+                    # Refused by the budget; left for a later --resume run
+                    deferred += 1
+                    continue
+                if audits[i]:
+                    prefilter.record_audit(rule_results[i], audience_codes, label=key)
+                output_row = {
+                    'Company Name': row['Company Name'],
+                    'Evaluation Score': row['Evaluation Score'],
+                    'Avg Leads Per Day': row['Avg Leads Per Day'],
+                    'audience_codes': json.dumps(audience_codes)
+                }
+                writer.writerow(output_row)
+                journal.record(key, 'error' if 'error' in audience_codes else 'ok', output_row)
+    finally:
+        writer.close()
+        journal.close()
+
+    # Drop rows superseded by retries and restore input order
+    rewrite_from_journal(output_file, OUTPUT_HEADERS, keys, journal)
+    if binary_output:
+        logger.info("Codes file for matching written to %s", export_codes_file(output_file, 'partners'))
+
+    counts = journal.counts()
+    logger.info("Processing complete. Output written to %s", output_file)
+    logger.info("Rows: %d ok, %d errors (rerun with --resume --retry-errors to retry)",
+                counts['ok'], counts['error'])
+    not_done = len(rows) - counts['ok'] - counts['error']
+    if not_done:
+        logger.warning("%d partners not classified (%d refused by the LLM budget); rerun with --resume.",
+                       not_done, deferred)
+    if rules:
+        logger.info("Rule fast path: %s", prefilter.report())
+    logger.info("Classification: %s", stats.report())
+    metrics = get_scheduler().metrics
+    logger.info("LLM requests: %d, retries: %d, failures: %d, circuit opens: %d",
+                metrics['requests'], metrics['retries'], metrics['failures'], metrics['circuit_opens'])
+    logger.info("LLM budget: %s", budget.report())
+
+    write_run_summary(summary_file, script='process_partners', rows=counts,
+                      stages={'classify': stats.summary()},
+                      prefilter=prefilter.summary() if rules else None,
+                      scheduler=dict(metrics), budget=budget.summary())
+    logger.info("Run summary written to %s", summary_file)
+
+def cli(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="Classify partners into audience codes.")
+    parser.add_argument('--max-concurrency', type=int, default=DEFAULT_MAX_CONCURRENCY,
+                        help="Maximum number of LLM requests in flight at once.")
+    parser.add_argument('--pack-size', type=int, default=DEFAULT_PACK_SIZE,
+                        help="Number of descriptions classified per LLM request.")
+    parser.add_argument('--resume', action='store_true',
+                        help="Skip partners already recorded in the run journal.")
+    parser.add_argument('--retry-errors', action='store_true',
+                        help="With --resume, classify partners whose last result was an error again.")
+    parser.add_argument('--rules', action='store_true',
+                        help="Classify partners that clearly match prefilter_rules.json without the LLM.")
+    parser.add_argument('--rules-audit-rate', type=float, default=DEFAULT_AUDIT_RATE,
+                        help="Share of rule-classified partners also sent to the LLM to measure agreement.")
+    parser.add_argument('--near-duplicate-threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="Similarity (0-1) at which partners share one classification; 0 disables.")
+    parser.add_argument('--taxonomy-top-n', type=int, default=0,
+                        help="List only the N most likely codes in classification prompts (0 = full taxonomy); "
+                             "see scripts/tune_retrieval.py.")
+    parser.add_argument('--max-tokens', type=int, default=None,
+                        help="Stop starting new batches once the run's LLM calls have used this many tokens.")
+    parser.add_argument('--max-calls', type=int, default=None,
+                        help="Stop starting new batches after this many LLM calls.")
+    parser.add_argument('--binary-output', action='store_true',
+                        help="Also write the compact codes file (<output>.bin) read by run_matching.py --binary.")
+    parser.add_argument('--summary-file', default=None,
+                        help="Where to write the JSON run summary (default: <output>.run.json).")
+    parser.add_argument('--log-level', default='INFO',
+                        help="Logging level, e.g. DEBUG to see raw LLM responses.")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=args.log_level.upper(),
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    main(max_concurrency=args.max_concurrency, pack_size=args.pack_size,
+         resume=args.resume, retry_errors=args.retry_errors,
+         use_rules=args.rules, audit_rate=args.rules_audit_rate,
+         near_duplicate_threshold=args.near_duplicate_threshold,
+         summary_file=args.summary_file,
+         binary_output=args.binary_output, taxonomy_top_n=args.taxonomy_top_n,
+         max_tokens=args.max_tokens, max_calls=args.max_calls)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    cli()
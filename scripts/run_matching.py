@@ -1,192 +1,338 @@
+import argparse
 import csv
 import os
-import json
-
-# Task 4.2: Implement Scoring Logic
-# --- Constants for scoring weights ---
-VERTICAL_WEIGHT = 1.0
-HORIZONTAL_WEIGHT = 0.5
-FUNCTIONAL_WEIGHT = 0.8
-SPECIAL_VERTICAL_WEIGHT = 1.2 # e.g., for regulated industries
-SPECIAL_FUNCTIONAL_WEIGHT = 1.1 # e.g., for critical functions
-
-# --- Score Boosts ---
-EVALUATION_SCORE_BOOST = 0.1 # 10% boost for each point of evaluation score
-LEAD_VOLUME_BOOST = 0.05 # 5% boost for high lead volume partners
-
-# --- Code Sets ---
-# Using sets for efficient lookups
-SPECIAL_SET = {'X_HORIZ', 'X_SME', 'F_HR', 'F_SALES', 'F_OPS'}
-REGULATED_SET = {'FIN_BANK', 'FIN_INS', 'HC_HOSP', 'HC_PHARM'}
-
-def calculate_match_score(prospect_codes, partner_codes, partner_row):
-    """
-    Calculates the match score between a prospect and a partner based on their audience codes.
-
-    Args:
-        prospect_codes (list): A list of audience codes for the prospect.
-        partner_codes (list): A list of audience codes for the partner.
-        partner_row (dict): The full data row for the partner, used for boosts.
-
-    Returns:
-        tuple: A tuple containing the final score (float) and the type of overlap (str).
-               Returns (0, 'No Overlap') if there's no match.
-    """
-    prospect_set = set(prospect_codes)
-    partner_set = set(partner_codes)
-
-    # Find the intersection of codes
-    overlap = prospect_set.intersection(partner_set)
-
-    if not overlap:
-        return 0, "No Overlap"
-
-    base_score = 0
-    overlap_type = "Unknown"
-
-    # Determine the highest-value match type based on weights
-    # This logic prioritizes the highest value match if multiple exist
-    is_vertical = any(code.startswith('V_') for code in overlap)
-    is_functional = any(code.startswith('F_') for code in overlap)
-    is_horizontal = any(code.startswith('X_') for code in overlap)
-    is_regulated = any(code in REGULATED_SET for code in overlap)
-
-    if is_vertical:
-        base_score = SPECIAL_VERTICAL_WEIGHT if is_regulated else VERTICAL_WEIGHT
-        overlap_type = 'VERTICAL'
-    elif is_functional:
-        base_score = FUNCTIONAL_WEIGHT
-        overlap_type = 'FUNCTIONAL'
-    elif is_horizontal:
-        base_score = HORIZONTAL_WEIGHT
-        overlap_type = 'HORIZONTAL'
-
-    # --- Apply Score Boosts ---
-    final_score = base_score
-
-    # Boost based on partner's Evaluation Score
+import sys
+import time
+
+# Add the project root directory to the Python path when run as a file;
+# `python -m scripts.cli` runs from the root and needs no path changes
+if not __package__:
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.codes_file import CodesFile, LazyRows, codes_path, export_codes_file
+from src.journal import row_keys
+from src.match_state import (DELTA_HEADERS, diff_top_lists, load_state, partner_fingerprint,
+                             prospect_fingerprint, save_state, update_top_lists)
+from src.matching import MatchEngine, boost_factors, extract_codes
+from src.taxonomy import get_taxonomy
+from src.weight_sweep import SWEEP_HEADERS, PairTable, compare_rankings, load_sweep
+
+# Number of partners reported per prospect
+TOP_K = 5
+
+# Define file paths
+PARTNERS_FILE = os.path.join('output', 'partners_with_codes.csv')
+PROSPECTS_FILE = os.path.join('output', 'prospects_with_codes.csv')
+OUTPUT_FILE = os.path.join('output', 'matches_v1.csv')
+SWEEP_CONFIG_FILE = 'weight_sweep.json'
+SWEEP_OUTPUT_FILE = os.path.join('output', 'weight_sweep.csv')
+
+REPORT_HEADERS = [
+    'prospect_firma', 'prospect_url', 'partner_name',
+    'partner_evaluation_score', 'partner_avg_leads',
+    'match_score', 'overlap_type'
+]
+
+def match_row(prospect, partner, score, overlap_type):
+    """
+    Builds one report row for a prospect/partner match.
+    """
+    return {
+        'prospect_firma': prospect.get('firma', 'Unknown Prospect'),
+        'prospect_url': prospect.get('url', ''),
+        'partner_name': partner.get('Company Name', 'Unknown Partner'),
+        'partner_evaluation_score': partner.get('Evaluation Score', ''),
+        'partner_avg_leads': partner.get('Avg Leads Per Day', ''),
+        'match_score': score,
+        'overlap_type': overlap_type
+    }
+
+def top_rows_by_firma(results, top_k=TOP_K):
+    """
+    Groups match rows by prospect firma and keeps each firma's top k, highest score first.
+
+    Groups appear in order of their first row; ties keep row order.
+    """
+    prospects_processed = {}
+    for result in results:
+        prospects_processed.setdefault(result['prospect_firma'], []).append(result)
+    final_report_data = []
+    for matches in prospects_processed.values():
+        sorted_matches = sorted(matches, key=lambda x: x['match_score'], reverse=True)
+        final_report_data.extend(sorted_matches[:top_k])
+    return final_report_data
+
+def write_report(output_file, rows, headers=REPORT_HEADERS):
+    with open(output_file, mode='w', encoding='utf-8', newline='') as outfile:
+        writer = csv.DictWriter(outfile, fieldnames=headers)
+        writer.writeheader()
+        writer.writerows(rows)
+
+def load_engine(partners_file=PARTNERS_FILE):
+    """
+    Loads the partners file and builds the matching engine over it.
+    """
+    with open(partners_file, mode='r', encoding='utf-8') as infile:
+        partners = list(csv.DictReader(infile))
+
+    taxonomy = get_taxonomy()
+    if not taxonomy:
+        taxonomy = None
+
+    partner_codes = [extract_codes(partner.get('audience_codes')) for partner in partners]
+    return MatchEngine(partners, partner_codes, taxonomy), taxonomy
+
+def open_codes_file(csv_path, kind, taxonomy):
+    """
+    Opens the codes file next to a *_with_codes CSV, (re)building it when it is missing or stale.
+    """
+    path = codes_path(csv_path)
+    if os.path.exists(csv_path) and (not os.path.exists(path)
+                                     or os.path.getmtime(path) < os.path.getmtime(csv_path)):
+        export_codes_file(csv_path, kind, path, taxonomy)
     try:
-        eval_score = float(partner_row.get('Evaluation Score', 0))
-        if eval_score > 0:
-            final_score *= (1 + (eval_score * EVALUATION_SCORE_BOOST))
-    except (ValueError, TypeError):
-        pass # Ignore if the score is not a valid number
+        return CodesFile(path, kind, taxonomy)
+    except ValueError as e:
+        if not os.path.exists(csv_path):
+            raise
+        print(f"Rebuilding {path}: {e}")
+        export_codes_file(csv_path, kind, path, taxonomy)
+        return CodesFile(path, kind, taxonomy)
+
+def load_binary(partners_file=PARTNERS_FILE, prospects_file=PROSPECTS_FILE):
+    """
+    Loads the matching engine and prospects from the compact codes files (see src.codes_file).
+
+    Returns (engine, taxonomy, prospects, prospect masks); prospects are
+    decoded lazily and the masks are read straight from the mapped file.
+    If the files use codes outside the taxonomy, their code orders differ
+    and the prospect masks are re-encoded against the partners' order.
+    """
+    taxonomy = get_taxonomy()
+    partner_codes = open_codes_file(partners_file, 'partners', taxonomy)
+    prospect_codes = open_codes_file(prospects_file, 'prospects', taxonomy)
+    partners = list(LazyRows(partner_codes))
+    boosts = [boost_factors(eval_score, avg_leads) for eval_score, avg_leads in
+              zip(partner_codes.floats('Evaluation Score'), partner_codes.floats('Avg Leads Per Day'))]
+    engine = MatchEngine.from_masks(partners, partner_codes.masks(), partner_codes.code_order, boosts)
+    prospect_masks = prospect_codes.masks()
+    if prospect_codes.code_order != partner_codes.code_order:
+        order = prospect_codes.code_order
+        prospect_masks = [engine.encode([code for i, code in enumerate(order) if mask >> i & 1])
+                          for mask in prospect_masks]
+    return engine, taxonomy, LazyRows(prospect_codes), prospect_masks
+
+def run_streaming(top_k=TOP_K, partners_file=PARTNERS_FILE, prospects_file=PROSPECTS_FILE,
+                  output_file=OUTPUT_FILE):
+    """
+    Streams prospects from disk and writes each prospect's top-k partners as soon as it is scored.
 
-    # Boost based on Average Leads Per Day
+    Only the partners and k candidates per prospect are held in memory, so
+    peak memory does not grow with the number of prospects or matches.
+    Unlike main(), prospects that share a firma name are reported separately.
+    """
+    print("Starting streaming matching process...")
     try:
-        avg_leads = float(partner_row.get('Avg Leads Per Day', 0))
-        if avg_leads > 50: # Example threshold for a high-volume partner
-            final_score *= (1 + LEAD_VOLUME_BOOST)
-    except (ValueError, TypeError):
-        pass # Ignore if leads are not a valid number
+        engine, taxonomy = load_engine(partners_file)
+        infile = open(prospects_file, mode='r', encoding='utf-8')
+    except FileNotFoundError as e:
+        print(f"Error: {e}. Please ensure the input files exist.")
+        return
 
-    return final_score, overlap_type
+    prospect_count = 0
+    row_count = 0
+    with infile, open(output_file, mode='w', encoding='utf-8', newline='') as outfile:
+        writer = csv.DictWriter(outfile, fieldnames=REPORT_HEADERS)
+        writer.writeheader()
+        for prospect in csv.DictReader(infile):
+            prospect_count += 1
+            prospect_codes = extract_codes(prospect.get('audience_codes'))
+            for j, score, overlap_type in engine.top_k(prospect_codes, top_k):
+                writer.writerow(match_row(prospect, engine.partners[j], score, overlap_type))
+                row_count += 1
+
+    print(f"Matched {prospect_count} prospects against {len(engine.partners)} partners.")
+    if row_count:
+        print(f"Successfully generated report with {row_count} rows at {output_file}")
+    else:
+        print("No matches found to generate a report.")
 
 # Task 4.3 & 4.4: Main Processing Logic and Report Generation
-def main():
+def main(top_k=TOP_K, partners_file=PARTNERS_FILE, prospects_file=PROSPECTS_FILE,
+         output_file=OUTPUT_FILE, binary=False):
     """
     Main function to load data, run the matching process, and generate the final report.
+
+    With binary, codes and boosts are read from the memory-mapped codes
+    files next to the CSVs instead of parsing every audience_codes cell;
+    the files are built from the CSVs first if missing or older.
     """
     print("Starting matching process...")
 
-    # Define file paths
-    partners_file = os.path.join('output', 'partners_with_codes.csv')
-    prospects_file = os.path.join('output', 'prospects_with_codes.csv')
-    output_file = os.path.join('output', 'matches_v1.csv')
-
     # Load data
     try:
-        with open(partners_file, mode='r', encoding='utf-8') as infile:
-            partners = list(csv.DictReader(infile))
-        with open(prospects_file, mode='r', encoding='utf-8') as infile:
-            prospects = list(csv.DictReader(infile))
+        if binary:
+            engine, taxonomy, prospects, prospect_masks = load_binary(partners_file, prospects_file)
+        else:
+            engine, taxonomy = load_engine(partners_file)
+            with open(prospects_file, mode='r', encoding='utf-8') as infile:
+                prospects = list(csv.DictReader(infile))
+            prospect_masks = None
     except FileNotFoundError as e:
         print(f"Error: {e}. Please ensure the input files exist.")
         return
+    partners = engine.partners
 
     all_results = []
 
     print(f"Comparing {len(prospects)} prospects against {len(partners)} partners...")
 
-    # Run Match: Nested loop to compare every prospect against every partner
-    for prospect in prospects:
-        prospect_id = prospect.get('firma', 'Unknown Prospect')
-        try:
-            # Safely load JSON string from the CSV
-            # Safely load JSON string and extract codes
-            prospect_data = json.loads(prospect.get('audience_codes', '{}'))
-            prospect_codes = []
-            if isinstance(prospect_data, dict):
-                if prospect_data.get('primary'):
-                    prospect_codes.append(prospect_data['primary'])
-                if prospect_data.get('secondary'):
-                    prospect_codes.extend(prospect_data['secondary'])
-        except (json.JSONDecodeError, TypeError):
-            prospect_codes = [] # Default to empty list on error
-
-        for partner in partners:
-            partner_id = partner.get('Company Name', 'Unknown Partner')
-            try:
-                # Safely load JSON string and extract codes
-                partner_data = json.loads(partner.get('audience_codes', '{}'))
-                partner_codes = []
-                if isinstance(partner_data, dict):
-                    if partner_data.get('primary'):
-                        partner_codes.append(partner_data['primary'])
-                    if partner_data.get('secondary'):
-                        partner_codes.extend(partner_data['secondary'])
-            except (json.JSONDecodeError, TypeError):
-                partner_codes = [] # Default to empty list on error
-
-            score, overlap_type = calculate_match_score(prospect_codes, partner_codes, partner)
-
-            if score > 0:
-                all_results.append({
-                    'prospect_firma': prospect_id,
-                    'prospect_url': prospect.get('url', ''),
-                    'partner_name': partner_id,
-                    'partner_evaluation_score': partner.get('Evaluation Score', ''),
-                    'partner_avg_leads': partner.get('Avg Leads Per Day', ''),
-                    'match_score': score,
-                    'overlap_type': overlap_type
-                })
+    # Run Match: score each prospect only against the partners that share
+    # at least one code with it
+    for i, prospect in enumerate(prospects):
+        if prospect_masks is not None:
+            matches = engine.match_mask(prospect_masks[i])
+        else:
+            matches = engine.match(extract_codes(prospect.get('audience_codes')))
+        for j, score, overlap_type in matches:
+            all_results.append(match_row(prospect, partners[j], score, overlap_type))
 
     print(f"Found {len(all_results)} potential matches. Generating report...")
 
-    # Generate Report: Find top 5 partners for each prospect
-    final_report_data = []
-    prospects_processed = {} # To store top matches for each prospect
-
-    # Group results by prospect
-    for result in all_results:
-        prospect_name = result['prospect_firma']
-        if prospect_name not in prospects_processed:
-            prospects_processed[prospect_name] = []
-        prospects_processed[prospect_name].append(result)
-
-    # Sort and get top 5 for each prospect
-    for prospect_name, matches in prospects_processed.items():
-        # Sort matches by score in descending order
-        sorted_matches = sorted(matches, key=lambda x: x['match_score'], reverse=True)
-        # Add the top 5 to the final report list
-        final_report_data.extend(sorted_matches[:5])
-
+    # Generate Report: Find top k partners for each prospect
+    final_report_data = top_rows_by_firma(all_results, top_k)
 
     # Write the final report
     if final_report_data:
-        headers = [
-            'prospect_firma', 'prospect_url', 'partner_name',
-            'partner_evaluation_score', 'partner_avg_leads',
-            'match_score', 'overlap_type'
-        ]
-        with open(output_file, mode='w', encoding='utf-8', newline='') as outfile:
-            writer = csv.DictWriter(outfile, fieldnames=headers)
-            writer.writeheader()
-            writer.writerows(final_report_data)
+        write_report(output_file, final_report_data)
         print(f"Successfully generated report at {output_file}")
     else:
         print("No matches found to generate a report.")
 
+def run_incremental(top_k=TOP_K, partners_file=PARTNERS_FILE, prospects_file=PROSPECTS_FILE,
+                    output_file=OUTPUT_FILE, state_file=None, delta_file=None):
+    """
+    Like main(), but only rescores prospects and partners whose codes or boost fields changed.
+
+    Each prospect's top-k list is kept in a state file next to the report
+    (<output>.state.json) together with content hashes of every row.
+    Unchanged prospects reuse their saved list, or only score the partners
+    that changed (see src.match_state.update_top_lists). The full report is
+    identical to main()'s; a delta report (<output>_delta.csv) lists the
+    top-k entries that were added, removed or changed since the last run.
+    """
+    state_file = state_file or output_file + '.state.json'
+    delta_file = delta_file or os.path.splitext(output_file)[0] + '_delta.csv'
+    print("Starting incremental matching process...")
+
+    try:
+        engine, taxonomy = load_engine(partners_file)
+        with open(prospects_file, mode='r', encoding='utf-8') as infile:
+            prospects = list(csv.DictReader(infile))
+    except FileNotFoundError as e:
+        print(f"Error: {e}. Please ensure the input files exist.")
+        return
+    partners = engine.partners
+
+    partner_keys = row_keys(partners, lambda row: row.get('Company Name', ''))
+    partner_hashes = [partner_fingerprint(partner) for partner in partners]
+    prospect_keys = row_keys(prospects, lambda row: f"{row.get('firma', '')}|{row.get('url', '')}")
+    old_state = load_state(state_file)
+
+    tops, state, counts = update_top_lists(
+        engine, partner_keys, partner_hashes,
+        [(key, prospect_fingerprint(prospect), prospect.get('audience_codes'))
+         for key, prospect in zip(prospect_keys, prospects)],
+        top_k, old_state)
+    print(f"Prospects: {counts['scored']} scored, {counts['rescored']} rescored, "
+          f"{counts['updated']} updated with changed partners, {counts['reused']} unchanged, "
+          f"{counts['removed']} removed.")
+
+    labels = {key: [prospect.get('firma', 'Unknown Prospect'), prospect.get('url', '')]
+              for key, prospect in zip(prospect_keys, prospects)}
+    partner_names = {key: partner.get('Company Name', 'Unknown Partner')
+                     for key, partner in zip(partner_keys, partners)}
+    delta_rows = diff_top_lists(old_state, state, labels, partner_names)
+    state['labels'] = labels
+    state['partner_names'] = partner_names
+
+    all_results = [match_row(prospect, partners[j], score, overlap_type)
+                   for key, prospect in zip(prospect_keys, prospects)
+                   for j, score, overlap_type in tops[key]]
+    final_report_data = top_rows_by_firma(all_results, top_k)
+    if final_report_data:
+        write_report(output_file, final_report_data)
+        print(f"Successfully generated report at {output_file}")
+    else:
+        print("No matches found to generate a report.")
+    write_report(delta_file, delta_rows, DELTA_HEADERS)
+    print(f"Delta report with {len(delta_rows)} changed entries at {delta_file}")
+    save_state(state_file, state)
+
+def run_sweep(config_file=SWEEP_CONFIG_FILE, top_k=TOP_K, partners_file=PARTNERS_FILE,
+              prospects_file=PROSPECTS_FILE, output_file=SWEEP_OUTPUT_FILE):
+    """
+    Re-ranks every prospect's top-k under each weight configuration in config_file.
+
+    The overlap class of every prospect/partner pair is computed once (see
+    src.weight_sweep.PairTable); each configuration then only re-scores and
+    re-ranks. One row per configuration with rank-stability and diff
+    metrics against the baseline is written to output_file. Rankings are
+    per prospect row, as in run_streaming.
+    """
+    print("Starting weight sweep...")
+    try:
+        configs = load_sweep(config_file)
+        engine, taxonomy = load_engine(partners_file)
+        with open(prospects_file, mode='r', encoding='utf-8') as infile:
+            prospect_masks = [engine.encode(extract_codes(prospect.get('audience_codes')))
+                              for prospect in csv.DictReader(infile)]
+    except FileNotFoundError as e:
+        print(f"Error: {e}. Please ensure the input files exist.")
+        return
+
+    started = time.perf_counter()
+    table = PairTable(engine, prospect_masks)
+    partner_names = [partner.get('Company Name', 'Unknown Partner') for partner in engine.partners]
+    baseline = table.rank(configs[0][1], top_k)
+    rows = []
+    for name, config in configs:
+        metrics = compare_rankings(table, baseline, table.rank(config, top_k), partner_names)
+        rows.append({'config': name, **config, **metrics})
+    seconds = time.perf_counter() - started
+
+    write_report(output_file, rows, SWEEP_HEADERS)
+    print(f"Swept {len(configs)} configurations over {len(prospect_masks)} prospects "
+          f"({len(table.pairs)} distinct code sets) in {seconds:.2f}s.")
+    print(f"Results written to {output_file}")
+    for row in sorted(rows[1:], key=lambda row: -row['changed_prospects'])[:5]:
+        print(f"  {row['config']}: {row['changed_prospects']:.0%} of prospects changed, "
+              f"top-1 changed for {row['top1_changed']:.0%}, mean overlap {row['mean_overlap']:.2f}")
+
+def cli(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="Match prospects to partners.")
+    parser.add_argument('--top-k', type=int, default=TOP_K,
+                        help="Number of partners reported per prospect.")
+    # Only the batch report reads the binary codes files, so the modes exclude each other
+    modes = parser.add_mutually_exclusive_group()
+    modes.add_argument('--stream', action='store_true',
+                       help="Stream prospects and write each one's top-k rows as it finishes.")
+    modes.add_argument('--binary', action='store_true',
+                       help="Read codes from the compact .bin files next to the CSVs (built on first use).")
+    modes.add_argument('--sweep', nargs='?', const=SWEEP_CONFIG_FILE, metavar='CONFIG',
+                       help=f"Re-rank under every weight configuration in CONFIG (default {SWEEP_CONFIG_FILE}).")
+    modes.add_argument('--incremental', action='store_true',
+                       help="Only rescore rows that changed since the last incremental run and write a delta report.")
+    args = parser.parse_args(argv)
+    if args.sweep:
+        run_sweep(args.sweep, top_k=args.top_k)
+    elif args.incremental:
+        run_incremental(top_k=args.top_k)
+    elif args.stream:
+        run_streaming(top_k=args.top_k)
+    else:
+        main(top_k=args.top_k, binary=args.binary)
+
 # Execution Block
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    cli()
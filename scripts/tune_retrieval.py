@@ -0,0 +1,158 @@
+import argparse
+import csv
+import json
+import logging
+import os
+import sys
+
+# Add the project root directory to the Python path when run as a file;
+# `python -m scripts.cli` runs from the root and needs no path changes
+if not __package__:
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from scripts.process_partners import create_partner_blurb
+from src.cache import make_cache_key
+from src.classifier import MODEL_NAME, PACKED_PROMPT_VERSION, PROMPT_VERSION, get_cache, load_taxonomy
+from src.retrieval import KEYWORDS_FILE, CodeRetriever, learn_keywords, load_retriever, recall_at
+from src.taxonomy import codes_from_result
+
+logger = logging.getLogger(__name__)
+
+# Candidate list sizes whose recall is reported
+DEFAULT_SIZES = [4, 6, 8, 10, 12, 16, 20]
+
+# Share of cached primary codes the candidates must contain for a size to be recommended
+DEFAULT_TARGET_RECALL = 0.95
+
+# With --learn, every HOLDOUT_EVERY-th answer is kept out of learning to measure recall
+HOLDOUT_EVERY = 5
+
+def partner_descriptions(input_file):
+    """
+    Rebuilds the blurbs process_partners.py classifies from the partner CSV.
+    """
+    with open(input_file, mode='r', encoding='latin-1') as infile:
+        return [create_partner_blurb(row) for row in csv.DictReader(infile)]
+
+def column_descriptions(input_file, column):
+    """
+    Reads descriptions from one column of a CSV, e.g. the summary column of logs/unknown_log.csv.
+    """
+    with open(input_file, mode='r', encoding='utf-8') as infile:
+        return [row[column] for row in csv.DictReader(infile) if row.get(column)]
+
+def cached_answers(descriptions, cache, taxonomy):
+    """
+    Returns (description, primary, codes) for every description with a cached full-prompt answer.
+
+    Answers to pruned prompts are not used, since they could only contain
+    codes the retriever already proposed.
+    """
+    labelled = []
+    for description in dict.fromkeys(descriptions):
+        for prompt_version in (PROMPT_VERSION, PACKED_PROMPT_VERSION):
+            result = cache.get(make_cache_key(description, taxonomy.version, MODEL_NAME, prompt_version))
+            if isinstance(result, dict) and result.get('primary') in taxonomy:
+                labelled.append((description, result['primary'], codes_from_result(result, taxonomy)))
+                break
+    return labelled
+
+def recommend(results, target):
+    """
+    Returns the smallest top_n whose primary recall reaches target, or None.
+    """
+    return next((r['top_n'] for r in results if r['primary_recall'] >= target), None)
+
+def print_recall(title, results):
+    print(title)
+    for r in results:
+        print(f"  top {r['top_n']:>3}: primary recall {r['primary_recall']:.1%}, "
+              f"code recall {r['code_recall']:.1%}")
+
+def main(descriptions, sizes=DEFAULT_SIZES, target=DEFAULT_TARGET_RECALL,
+         keywords_file=KEYWORDS_FILE, learn=False):
+    """
+    Measures how many cached LLM answers the retriever's top-N candidates contain.
+
+    Recall is reported for every size in sizes, and the smallest size that
+    keeps target of the primary codes is recommended as --taxonomy-top-n.
+    With learn, keywords learned from the cached answers are merged into
+    keywords_file; recall is then measured before and after on a holdout
+    that the learning did not see. Returns the recommended size.
+    """
+    taxonomy = load_taxonomy()
+    labelled = cached_answers(descriptions, get_cache(taxonomy), taxonomy)
+    print(f"{len(labelled)} of {len(set(descriptions))} descriptions have a cached answer.")
+    if not labelled:
+        return None
+
+    retriever = load_retriever(keywords_file, taxonomy)
+    if not learn:
+        results = recall_at(retriever, labelled, sizes)
+        print_recall("Recall against cached answers:", results)
+    else:
+        holdout = labelled[::HOLDOUT_EVERY]
+        training = [item for i, item in enumerate(labelled) if i % HOLDOUT_EVERY]
+        print_recall(f"Recall on {len(holdout)} held-out answers before learning:",
+                     recall_at(retriever, holdout, sizes))
+        config = _read_keywords(keywords_file)
+        keywords, frequencies = learn_keywords(((d, codes) for d, _, codes in training), taxonomy)
+        learned = CodeRetriever(taxonomy, _merged(config['keywords'], keywords), frequencies)
+        results = recall_at(learned, holdout, sizes)
+        print_recall("... and after learning:", results)
+
+        keywords, frequencies = learn_keywords(((d, codes) for d, _, codes in labelled), taxonomy)
+        config['keywords'] = _merged(config['keywords'], keywords)
+        config['frequencies'] = frequencies
+        with open(keywords_file, 'w', encoding='utf-8') as f:
+            json.dump(config, f, ensure_ascii=False, indent=2)
+        print(f"Learned keywords from {len(labelled)} answers written to {keywords_file}")
+
+    size = recommend(results, target)
+    if size is None:
+        print(f"No size reaches {target:.0%} primary recall; keep the full taxonomy or extend the keyword map.")
+    else:
+        print(f"Recommended: --taxonomy-top-n {size} ({target:.0%} primary recall target)")
+    return size
+
+def _read_keywords(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    except FileNotFoundError:
+        config = {}
+    config.setdefault('keywords', {})
+    return config
+
+def _merged(keywords, learned):
+    merged = {code: list(terms) for code, terms in keywords.items()}
+    for code, terms in learned.items():
+        merged[code] = list(dict.fromkeys(merged.get(code, []) + terms))
+    return merged
+
+def cli(argv=None, prog=None):
+    parser = argparse.ArgumentParser(
+        prog=prog, description="Check the recall of local taxonomy retrieval against cached LLM answers.")
+    parser.add_argument('--input', default='data/kgs_001_ER47_20250617.csv',
+                        help="CSV with the classified descriptions (default: the partner CSV).")
+    parser.add_argument('--column', default=None,
+                        help="Column holding the descriptions; without it, partner blurbs are rebuilt.")
+    parser.add_argument('--sizes', nargs='+', type=int, default=DEFAULT_SIZES,
+                        help="Candidate list sizes to report.")
+    parser.add_argument('--target-recall', type=float, default=DEFAULT_TARGET_RECALL,
+                        help="Primary recall the recommended size must reach.")
+    parser.add_argument('--keywords-file', default=KEYWORDS_FILE,
+                        help="Keyword map used (and, with --learn, updated).")
+    parser.add_argument('--learn', action='store_true',
+                        help="Learn keywords from the cached answers and merge them into the keyword map.")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    if args.column:
+        descriptions = column_descriptions(args.input, args.column)
+    else:
+        descriptions = partner_descriptions(args.input)
+    main(descriptions, sorted(args.sizes), args.target_recall, args.keywords_file, args.learn)
+
+if __name__ == "__main__":
+    cli()
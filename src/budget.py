@@ -0,0 +1,145 @@
+import os
+import threading
+
+# Prices in USD per million tokens, used to report the cost of a run
+INPUT_PRICE_PER_MILLION_TOKENS = float(os.getenv("GEMINI_INPUT_PRICE_PER_MTOK", "0.075"))
+OUTPUT_PRICE_PER_MILLION_TOKENS = float(os.getenv("GEMINI_OUTPUT_PRICE_PER_MTOK", "0.30"))
+
+
+class BudgetExceeded(Exception):
+    """
+    Raised instead of starting an LLM call once the run's token or call budget is used up.
+    """
+
+
+class RunBudget:
+    """
+    Token and call budget of one run, with usage accounted per stage.
+
+    admit() is called before every LLM call with the prompt's estimated
+    tokens. It refuses (BudgetExceeded) once max_calls calls have been
+    admitted, or when the tokens used so far, plus the estimates of calls
+    still in flight, plus this prompt would exceed max_tokens. Calls already
+    admitted always finish. record() replaces a call's estimate with the
+    usage the API reported (or the estimate if it reported none).
+    """
+
+    def __init__(self, max_tokens=None, max_calls=None):
+        self.max_tokens = max_tokens
+        self.max_calls = max_calls
+        self.calls = 0
+        self.tokens = 0
+        self.reserved = 0
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def _stage(self, stage):
+        counters = self.stages.get(stage)
+        if counters is None:
+            counters = self.stages[stage] = {
+                'calls': 0, 'failed_calls': 0, 'refused_calls': 0, 'estimated_prompt_tokens': 0,
+                'prompt_tokens': 0, 'response_tokens': 0, 'reported_calls': 0,
+            }
+        return counters
+
+    @property
+    def exhausted(self):
+        """
+        True once no further call would be admitted, so callers can stop taking on new work.
+        """
+        with self._lock:
+            return ((self.max_calls is not None and self.calls >= self.max_calls)
+                    or (self.max_tokens is not None and self.tokens + self.reserved >= self.max_tokens))
+
+    def admit(self, estimated_tokens, stage='llm'):
+        with self._lock:
+            counters = self._stage(stage)
+            if self.max_calls is not None and self.calls >= self.max_calls:
+                problem = f"call budget of {self.max_calls} calls used up"
+            elif (self.max_tokens is not None
+                  and self.tokens + self.reserved + estimated_tokens > self.max_tokens):
+                problem = f"token budget of {self.max_tokens} tokens used up"
+            else:
+                self.calls += 1
+                self.reserved += estimated_tokens
+                counters['calls'] += 1
+                counters['estimated_prompt_tokens'] += estimated_tokens
+                return
+            counters['refused_calls'] += 1
+        raise BudgetExceeded(problem)
+
+    def release(self, estimated_tokens, stage='llm'):
+        """
+        Ends an admitted call that failed; it used no tokens.
+        """
+        with self._lock:
+            self.reserved -= estimated_tokens
+            self._stage(stage)['failed_calls'] += 1
+
+    def record(self, estimated_tokens, prompt_tokens, response_tokens, stage='llm', reported=False):
+        """
+        Ends an admitted call that returned, counting the tokens it used.
+        """
+        with self._lock:
+            self.reserved -= estimated_tokens
+            self.tokens += prompt_tokens + response_tokens
+            counters = self._stage(stage)
+            counters['prompt_tokens'] += prompt_tokens
+            counters['response_tokens'] += response_tokens
+            counters['reported_calls'] += reported
+
+    def summary(self):
+        """
+        Returns the limits, the totals and per-stage calls, tokens and cost.
+        """
+        with self._lock:
+            stages = {}
+            for stage, counters in self.stages.items():
+                stage_summary = dict(counters)
+                stage_summary['tokens'] = counters['prompt_tokens'] + counters['response_tokens']
+                stage_summary['cost_usd'] = round(
+                    (counters['prompt_tokens'] * INPUT_PRICE_PER_MILLION_TOKENS
+                     + counters['response_tokens'] * OUTPUT_PRICE_PER_MILLION_TOKENS) / 1_000_000, 6)
+                stages[stage] = stage_summary
+            return {
+                'max_tokens': self.max_tokens,
+                'max_calls': self.max_calls,
+                'calls': self.calls,
+                'tokens': self.tokens,
+                'cost_usd': round(sum(s['cost_usd'] for s in stages.values()), 6),
+                'stages': stages,
+            }
+
+    def report(self):
+        s = self.summary()
+        limits = ', '.join(f"{name} {value}" for name, value in
+                           (('max tokens', s['max_tokens']), ('max calls', s['max_calls'])) if value is not None)
+        lines = [f"{s['calls']} calls, {s['tokens']} tokens, ${s['cost_usd']:.4f}"
+                 + (f" (limits: {limits})" if limits else "")]
+        for stage, t in s['stages'].items():
+            lines.append(f"  {stage}: {t['calls']} calls ({t['refused_calls']} refused, {t['failed_calls']} failed), "
+                         f"{t['prompt_tokens']} prompt + {t['response_tokens']} response tokens "
+                         f"(estimated prompt tokens {t['estimated_prompt_tokens']}), ${t['cost_usd']:.4f}")
+        return '\n'.join(lines)
+
+
+_budget = None
+_budget_lock = threading.Lock()
+
+def get_budget():
+    """
+    Returns the process-wide run budget, an unlimited one unless set_budget was called.
+    """
+    global _budget
+    with _budget_lock:
+        if _budget is None:
+            _budget = RunBudget()
+        return _budget
+
+def set_budget(budget):
+    """
+    Replaces the process-wide run budget, e.g. with limits at the start of a run.
+    """
+    global _budget
+    with _budget_lock:
+        _budget = budget
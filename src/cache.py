@@ -0,0 +1,496 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+
+logger = logging.getLogger(__name__)
+
+# Default location of the classification cache database
+CACHE_DB_FILE = 'cache.db'
+
+# Cache of fetched pages and their summaries for the enrichment pipeline
+SCRAPE_CACHE_DB_FILE = 'scrape_cache.db'
+
+# Legacy whole-file cache written by earlier versions of the classifier
+LEGACY_CACHE_FILE = 'cache.json'
+
+# Version columns added to the entries table; rows written before they existed hold NULL
+METADATA_COLUMNS = ('model', 'prompt_version', 'taxonomy_version')
+
+# last_used_at is refreshed on a hit at most this often (seconds), so reads rarely write
+TOUCH_INTERVAL = 3600
+
+# With max_entries set, the cache is trimmed every EVICT_INTERVAL writes
+EVICT_INTERVAL = 500
+
+# Hit/miss counters are added to the meta table every STATS_FLUSH_INTERVAL lookups
+STATS_FLUSH_INTERVAL = 100
+
+# Age buckets of the stats report, in days
+AGE_BUCKETS = (1, 7, 30, 90, 365)
+
+
+def make_cache_key(description, taxonomy_version, model, prompt_version):
+    """
+    Builds a stable cache key from everything that affects a classification result.
+    """
+    material = json.dumps(
+        [description, taxonomy_version, model, prompt_version],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+class CacheBackend(ABC):
+    """
+    Interface for classification cache backends.
+
+    Backends map a key (see make_cache_key) to a JSON-serializable result.
+    set() optionally records the model, prompt_version and
+    taxonomy_version the result was produced with.
+    """
+
+    @abstractmethod
+    def get(self, key):
+        pass
+
+    @abstractmethod
+    def set(self, key, value, **metadata):
+        pass
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    @abstractmethod
+    def __len__(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class MemoryCache(CacheBackend):
+    """
+    In-process dictionary cache. Useful for tests and one-off runs.
+    """
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            return self._data.get(key)
+
+    def set(self, key, value, **metadata):
+        with self._lock:
+            self._data[key] = value
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteCache(CacheBackend):
+    """
+    Cache stored in a single SQLite database file.
+
+    Each lookup is a primary-key query and each write is its own small
+    transaction, so the cost of a cache operation does not depend on the
+    number of entries. WAL mode lets several threads or processes read and
+    write the same file concurrently.
+
+    Entries record when they were created and last used and, if given, the
+    model, prompt and taxonomy version that produced them. Entries older
+    than ttl seconds are treated as missing; with max_entries, the least
+    recently used entries beyond it are evicted as new ones are written.
+    Older databases are migrated in place when opened.
+    """
+
+    def __init__(self, path=CACHE_DB_FILE, timeout=30.0, ttl=None, max_entries=None):
+        self.path = path
+        self.timeout = timeout
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._counts = {'hits': 0, 'misses': 0}
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " created_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS meta ("
+                " name TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL)"
+            )
+            self._migrate(conn)
+
+    def _migrate(self, conn):
+        """
+        Adds the version and last-used columns to an entries table created before they existed.
+        """
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(entries)")}
+        for column in METADATA_COLUMNS:
+            if column not in columns:
+                conn.execute(f"ALTER TABLE entries ADD COLUMN {column} TEXT")
+        if 'last_used_at' not in columns:
+            conn.execute("ALTER TABLE entries ADD COLUMN last_used_at REAL")
+            conn.execute("UPDATE entries SET last_used_at = created_at")
+        conn.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used_at)")
+
+    def _connect(self):
+        """
+        Returns the connection owned by the calling thread, opening it on first use.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def get(self, key):
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT value, created_at, last_used_at FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        now = time.time()
+        if row is None or (self.ttl and row[1] < now - self.ttl):
+            self._count('misses')
+            return None
+        self._count('hits')
+        if row[2] is None or row[2] < now - TOUCH_INTERVAL:
+            with conn:
+                conn.execute("UPDATE entries SET last_used_at = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def __contains__(self, key):
+        # A plain existence check: not counted as a lookup and does not refresh last_used_at
+        return self._connect().execute("SELECT 1 FROM entries WHERE key = ?", (key,)).fetchone() is not None
+
+    def set(self, key, value, **metadata):
+        conn = self._connect()
+        now = time.time()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries"
+                " (key, value, created_at, last_used_at, model, prompt_version, taxonomy_version)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), now, now,
+                 *(metadata.get(column) for column in METADATA_COLUMNS)),
+            )
+        if self.max_entries:
+            with self._lock:
+                self._writes += 1
+                due = self._writes % EVICT_INTERVAL == 0
+            if due:
+                self.evict(max_entries=self.max_entries)
+
+    def _count(self, name):
+        with self._lock:
+            self._counts[name] += 1
+            due = sum(self._counts.values()) >= STATS_FLUSH_INTERVAL
+        if due:
+            self.flush_stats()
+
+    def flush_stats(self):
+        """
+        Adds the hits and misses counted since the last flush to the totals in the meta table.
+        """
+        with self._lock:
+            counts, self._counts = self._counts, {'hits': 0, 'misses': 0}
+        conn = self._connect()
+        with conn:
+            for name, count in counts.items():
+                if count:
+                    conn.execute(
+                        "INSERT INTO meta (name, value) VALUES (?, ?)"
+                        " ON CONFLICT(name) DO UPDATE SET value = CAST(value AS INTEGER) + excluded.value",
+                        (name, count),
+                    )
+
+    def evict(self, ttl=None, max_entries=None, max_bytes=None):
+        """
+        Deletes expired entries, then the least recently used ones beyond max_entries or max_bytes.
+
+        ttl defaults to the cache's own; max_bytes counts the stored key and
+        value text. Returns the number of deleted entries.
+        """
+        ttl = ttl if ttl is not None else self.ttl
+        conn = self._connect()
+        deleted = 0
+        with conn:
+            if ttl:
+                deleted += conn.execute("DELETE FROM entries WHERE created_at < ?",
+                                        (time.time() - ttl,)).rowcount
+            if max_entries is not None:
+                deleted += conn.execute(
+                    "DELETE FROM entries WHERE key IN (SELECT key FROM entries"
+                    " ORDER BY last_used_at DESC LIMIT -1 OFFSET ?)", (max_entries,)).rowcount
+            if max_bytes is not None:
+                total = 0
+                stale = []
+                for key, size in conn.execute(
+                        "SELECT key, length(key) + length(value) FROM entries ORDER BY last_used_at DESC"):
+                    total += size
+                    if total > max_bytes:
+                        stale.append((key,))
+                conn.executemany("DELETE FROM entries WHERE key = ?", stale)
+                deleted += len(stale)
+        return deleted
+
+    def compact(self, is_current=None, drop_unversioned=False):
+        """
+        Drops error results, expired entries and entries from other versions, then vacuums the file.
+
+        is_current(model, prompt_version, taxonomy_version) decides whether a
+        versioned entry is still usable; entries without version metadata
+        (written before it was recorded) are dropped only with
+        drop_unversioned. Expired entries and those beyond the cache's
+        max_entries are evicted as well. Returns {reason: deleted entries}.
+        """
+        conn = self._connect()
+        removed = {'error': 0, 'stale': 0, 'unversioned': 0}
+        doomed = []
+        for key, value, *versions in conn.execute(
+                "SELECT key, value, model, prompt_version, taxonomy_version FROM entries"):
+            try:
+                result = json.loads(value)
+            except json.JSONDecodeError:
+                result = {'error': 'unreadable'}
+            if isinstance(result, dict) and 'error' in result:
+                reason = 'error'
+            elif all(version is None for version in versions):
+                reason = 'unversioned' if drop_unversioned else None
+            elif is_current is not None and not is_current(*versions):
+                reason = 'stale'
+            else:
+                reason = None
+            if reason:
+                removed[reason] += 1
+                doomed.append((key,))
+        with conn:
+            conn.executemany("DELETE FROM entries WHERE key = ?", doomed)
+        removed['evicted'] = self.evict(max_entries=self.max_entries) if (self.ttl or self.max_entries) else 0
+        conn.execute("VACUUM")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return removed
+
+    def stats(self):
+        """
+        Returns entry counts, sizes, version breakdown, age distribution and the lifetime hit rate.
+        """
+        self.flush_stats()
+        conn = self._connect()
+        now = time.time()
+        count, value_bytes = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(length(key) + length(value)), 0) FROM entries").fetchone()
+        errors = conn.execute("SELECT COUNT(*) FROM entries WHERE value LIKE '{\"error\"%'").fetchone()[0]
+        versions = [
+            {'model': model, 'prompt_version': prompt_version, 'taxonomy_version': taxonomy_version,
+             'entries': entries}
+            for model, prompt_version, taxonomy_version, entries in conn.execute(
+                "SELECT model, prompt_version, taxonomy_version, COUNT(*) FROM entries"
+                " GROUP BY model, prompt_version, taxonomy_version ORDER BY COUNT(*) DESC")
+        ]
+
+        def distribution(column):
+            buckets = {f"<{days}d": 0 for days in AGE_BUCKETS}
+            buckets[f">={AGE_BUCKETS[-1]}d"] = 0
+            for (timestamp,) in conn.execute(f"SELECT {column} FROM entries"):
+                age = (now - (timestamp or now)) / 86400
+                label = next((f"<{days}d" for days in AGE_BUCKETS if age < days), f">={AGE_BUCKETS[-1]}d")
+                buckets[label] += 1
+            return buckets
+
+        hits = int(self.get_meta('hits') or 0)
+        misses = int(self.get_meta('misses') or 0)
+        files = [self.path + suffix for suffix in ('', '-wal', '-shm')]
+        return {
+            'path': self.path,
+            'entries': count,
+            'error_entries': errors,
+            'data_bytes': value_bytes,
+            'file_bytes': sum(os.path.getsize(f) for f in files if os.path.exists(f)),
+            'versions': versions,
+            'age': distribution('created_at'),
+            'last_used': distribution('last_used_at'),
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / (hits + misses), 4) if hits + misses else None,
+        }
+
+    def get_meta(self, name):
+        row = self._connect().execute(
+            "SELECT value FROM meta WHERE name = ?", (name,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, name, value):
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)", (name, str(value))
+            )
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def close(self):
+        if self._connections and any(self._counts.values()):
+            self.flush_stats()
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+        self._local = threading.local()
+
+
+def import_legacy_cache(cache, json_path, taxonomy_version, model, prompt_version):
+    """
+    Copies entries from an old description-keyed cache.json into a cache backend.
+
+    Error results are skipped so that failed calls are retried. Returns the
+    number of imported entries.
+    """
+    if not os.path.exists(json_path):
+        return 0
+    with open(json_path, 'r', encoding='utf-8') as f:
+        try:
+            legacy = json.load(f)
+        except json.JSONDecodeError:
+            logger.warning("Could not decode legacy cache %s; skipping import.", json_path)
+            return 0
+
+    imported = 0
+    for description, result in legacy.items():
+        if not isinstance(result, dict) or 'error' in result:
+            continue
+        key = make_cache_key(description, taxonomy_version, model, prompt_version)
+        cache.set(key, result, model=model, prompt_version=prompt_version, taxonomy_version=taxonomy_version)
+        imported += 1
+    return imported
+
+
+def open_cache(path=CACHE_DB_FILE, legacy_path=LEGACY_CACHE_FILE,
+               taxonomy_version=None, model=None, prompt_version=None, ttl=None, max_entries=None):
+    """
+    Opens the SQLite cache and, the first time, imports a legacy cache.json next to it.
+    """
+    cache = SQLiteCache(path, ttl=ttl, max_entries=max_entries)
+    if taxonomy_version is not None and cache.get_meta('legacy_imported') is None:
+        count = import_legacy_cache(cache, legacy_path, taxonomy_version, model, prompt_version)
+        if count:
+            logger.info("Imported %d entries from %s into %s.", count, legacy_path, path)
+        cache.set_meta('legacy_imported', legacy_path)
+    return cache
+
+
+def normalize_text(text):
+    """
+    Collapses whitespace so that pages differing only in layout share a summary.
+    """
+    return ' '.join((text or '').split())
+
+
+def make_summary_key(text, model, prompt_version):
+    """
+    Builds a content-addressed key for the summary of a page's text.
+    """
+    material = json.dumps([normalize_text(text), model, prompt_version], ensure_ascii=False)
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+class ScrapeCache(SQLiteCache):
+    """
+    SQLite store for fetched pages (keyed by URL) and page summaries.
+
+    Pages keep their ETag and Last-Modified headers so stale entries can be
+    revalidated with a conditional request. Summaries use the inherited
+    key/value table with keys from make_summary_key.
+    """
+
+    def __init__(self, path=SCRAPE_CACHE_DB_FILE, timeout=30.0):
+        super().__init__(path, timeout)
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS pages ("
+                " url TEXT PRIMARY KEY,"
+                " content BLOB NOT NULL,"
+                " encoding TEXT,"
+                " etag TEXT,"
+                " last_modified TEXT,"
+                " fetched_at REAL NOT NULL)"
+            )
+
+    def get_page(self, url):
+        """
+        Returns the cached page for url as a dict, or None.
+        """
+        row = self._connect().execute(
+            "SELECT content, encoding, etag, last_modified, fetched_at FROM pages WHERE url = ?",
+            (url,),
+        ).fetchone()
+        if row is None:
+            return None
+        return {
+            'content': bytes(row[0]),
+            'encoding': row[1],
+            'etag': row[2],
+            'last_modified': row[3],
+            'fetched_at': row[4],
+        }
+
+    def set_page(self, url, content, encoding=None, etag=None, last_modified=None):
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO pages"
+                " (url, content, encoding, etag, last_modified, fetched_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (url, sqlite3.Binary(content), encoding, etag, last_modified, time.time()),
+            )
+
+    def touch_page(self, url):
+        """
+        Marks a cached page as freshly validated.
+        """
+        conn = self._connect()
+        with conn:
+            conn.execute("UPDATE pages SET fetched_at = ? WHERE url = ?", (time.time(), url))
+
+
+_scrape_cache = None
+_scrape_cache_lock = threading.Lock()
+
+def get_scrape_cache():
+    """
+    Returns the process-wide ScrapeCache, opening it on first use.
+    """
+    global _scrape_cache
+    with _scrape_cache_lock:
+        if _scrape_cache is None:
+            _scrape_cache = ScrapeCache()
+        return _scrape_cache
+
+def set_scrape_cache(cache):
+    """
+    Replaces the process-wide ScrapeCache (e.g. with a temporary one in tests).
+    """
+    global _scrape_cache
+    with _scrape_cache_lock:
+        _scrape_cache = cache
@@ -1,12 +1,47 @@
 import json
+import logging
 import os
-from dotenv import load_dotenv
-from google import generativeai as genai
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-load_dotenv()
+from src import llm_client
+from src.budget import INPUT_PRICE_PER_MILLION_TOKENS, OUTPUT_PRICE_PER_MILLION_TOKENS, BudgetExceeded
+from src.cache import CACHE_DB_FILE, LEGACY_CACHE_FILE, make_cache_key, open_cache
+from src.metrics import get_metrics
+from src.scheduler import estimate_tokens, is_retryable
+from src.taxonomy import Taxonomy, get_taxonomy
 
-# Define the cache file path
-CACHE_FILE = 'cache.json'
+logger = logging.getLogger(__name__)
+
+# Model used for classification
+MODEL_NAME = "gemini-1.5-flash"
+GENERATION_CONFIG = {"temperature": 0.0}
+
+# Bump whenever PROMPT_TEMPLATE changes so that old cache entries are not reused
+PROMPT_VERSION = "1"
+
+# Bump whenever PACKED_PROMPT_TEMPLATE changes
+PACKED_PROMPT_VERSION = "packed-1"
+
+# Ask Gemini for schema-constrained JSON (response_mime_type + response_schema).
+# Set GEMINI_JSON_MODE=0 to send plain-text requests instead.
+JSON_MODE = os.getenv("GEMINI_JSON_MODE", "1") != "0"
+
+# Maximum number of classification requests in flight at once in classify_many
+DEFAULT_MAX_CONCURRENCY = 8
+
+# Number of descriptions sent per LLM request in classify_many (1 = one prompt per description)
+DEFAULT_PACK_SIZE = 1
+
+# Define the cache file paths
+CACHE_FILE = LEGACY_CACHE_FILE
+CACHE_DB = CACHE_DB_FILE
+
+# Cache entries older than this many days are not reused, and at most this many
+# entries are kept (least recently used go first); 0 means no limit
+CACHE_TTL_DAYS = float(os.getenv("CLASSIFIER_CACHE_TTL_DAYS", "0"))
+CACHE_MAX_ENTRIES = int(os.getenv("CLASSIFIER_CACHE_MAX_ENTRIES", "0"))
 
 # Sub-Tasks 1.3.2 & 1.3.3: Design and Populate LLM Prompt
 PROMPT_TEMPLATE = """
@@ -61,115 +96,709 @@ You are a highly intelligent text classification engine. Your task is to analyze
 Now, based on the provided taxonomy and company description, please classify the company.
 """
 
+# Variant of PROMPT_TEMPLATE that classifies several descriptions in one request
+PACKED_PROMPT_TEMPLATE = """
+You are a highly intelligent text classification engine. Your task is to analyze each of the provided company descriptions and classify it into the most relevant primary and secondary categories based on the given taxonomy.
+
+**Classification Rules:**
+1.  **Primary Category:** For each company, choose exactly one primary category from the provided taxonomy. This should be the most fitting category that describes the company's core business.
+2.  **Secondary Categories:** For each company, you may choose one or more secondary categories that also describe the company's business, but are less central than the primary category. If no secondary categories apply, return an empty list.
+3.  **Independence:** Classify every company on its own. Do not let one description influence another.
+4.  **JSON Output:** Your final output must be a single, valid JSON array with exactly one object per company, each with four keys:
+    *   `"id"`: The ID of the company description, exactly as given.
+    *   `"primary"`: A string representing the single primary category code.
+    *   `"secondary"`: A list of strings representing the secondary category codes.
+    *   `"explanation"`: A brief (1-2 sentence) explanation for your choices.
+
+**Taxonomy:**
+```json
+{{taxonomy}}
+```
+
+**Company Descriptions:**
+{{descriptions}}
+
+**Example Output:**
+```json
+[
+  {"id": "1", "primary": "F_HR", "secondary": ["TECH_SAAS"], "explanation": "The company's core business is HR software sold as a service."},
+  {"id": "2", "primary": "X_SME", "secondary": ["MFG_SM"], "explanation": "A specialized small manufacturer serving a niche market."}
+]
+```
+
+Now, based on the provided taxonomy, please classify every company description above.
+"""
+
+# Sent once when a response cannot be parsed or uses codes outside the taxonomy
+REPAIR_PROMPT_TEMPLATE = """
+Your previous answer could not be used: {{problem}}.
+
+Previous answer:
+{{response}}
+
+Return only a single valid JSON object with the keys "primary" (one code), "secondary" (a list of codes) and "explanation" (a string). Use only these codes:
+{{codes}}
+"""
+
 # Sub-Task 1.3.1: Implement load_taxonomy()
 def load_taxonomy():
     """
-    Reads the taxonomy file and returns it as a dictionary.
+    Returns the shared Taxonomy, loaded from the project root once per process.
     """
-    try:
-        with open('audience_taxonomy_v2025-06.json', 'r') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        print("Error: Taxonomy file not found.")
-        return {}
-    except json.JSONDecodeError:
-        print("Error: Could not decode JSON from the taxonomy file.")
-        return {}
+    return get_taxonomy()
+
+def _as_taxonomy(taxonomy):
+    """
+    Accepts either a Taxonomy or a plain {code: label} dictionary.
+    """
+    return taxonomy if isinstance(taxonomy, Taxonomy) else Taxonomy(taxonomy)
+
+def taxonomy_version(taxonomy):
+    """
+    Returns a short content hash identifying a taxonomy.
+    """
+    return _as_taxonomy(taxonomy).version
 
 # Sub-Task 1.3.5: Implement Caching
-def load_cache():
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache(taxonomy=None):
     """
-    Loads the cache from cache.json.
+    Returns the process-wide cache backend, opening the SQLite cache on first use.
+
+    The first open also imports any legacy cache.json into the database.
     """
-    if os.path.exists(CACHE_FILE):
-        with open(CACHE_FILE, 'r') as f:
-            try:
-                return json.load(f)
-            except json.JSONDecodeError:
-                return {}
-    return {}
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            version = taxonomy_version(taxonomy) if taxonomy else None
+            _cache = open_cache(CACHE_DB, CACHE_FILE, version, MODEL_NAME, PROMPT_VERSION,
+                                ttl=CACHE_TTL_DAYS * 86400 or None, max_entries=CACHE_MAX_ENTRIES or None)
+        return _cache
+
+def is_current_entry(model, prompt_version, taxonomy_version):
+    """
+    True if a cache entry with this metadata can still be returned by the classifier.
+    """
+    base_version = (prompt_version or '').split('+')[0]
+    return (model == MODEL_NAME and base_version in (PROMPT_VERSION, PACKED_PROMPT_VERSION)
+            and taxonomy_version == load_taxonomy().version)
+
+def set_cache(backend):
+    """
+    Replaces the process-wide cache backend (e.g. with a MemoryCache in tests).
+    """
+    global _cache
+    with _cache_lock:
+        _cache = backend
+
+# Optional src.retrieval.CodeRetriever; with one set, prompts list only its candidate codes
+_retriever = None
+
+def get_retriever():
+    return _retriever
 
-def save_cache(cache_data):
+def set_retriever(retriever):
     """
-    Saves the cache data to cache.json.
+    Prunes the taxonomy in classification prompts with retriever, or sends all of it if None.
     """
-    with open(CACHE_FILE, 'w') as f:
-        json.dump(cache_data, f, indent=4)
+    global _retriever
+    _retriever = retriever
+
+def _prompt_version(base, retriever):
+    """
+    Prompt version for cache keys; answers to pruned prompts are kept apart from full-prompt ones.
+    """
+    return base if retriever is None else f"{base}+top{retriever.top_n}"
 
 # Sub-Task 1.3.4: Implement build_prompt()
-def build_prompt(description, taxonomy_codes):
+def build_prompt(description, taxonomy):
     """
     Formats the PROMPT_TEMPLATE with the company description and taxonomy.
     """
-    taxonomy_str = json.dumps(taxonomy_codes, indent=2)
-    prompt = PROMPT_TEMPLATE.replace('{{taxonomy}}', taxonomy_str)
-    prompt = prompt.replace('{{description}}', description)
-    return prompt
+    prefix, suffix = _as_taxonomy(taxonomy).prompt_parts(PROMPT_TEMPLATE, '{{description}}')
+    return prefix + description + suffix
 
-# Sub-Task 1.3.6: Implement call_llm()
-def call_llm(prompt):
+def build_packed_prompt(items, taxonomy):
     """
-    Sends the prompt to the Gemini API and returns the response.
+    Formats the PACKED_PROMPT_TEMPLATE with (id, description) pairs and the taxonomy.
+    """
+    descriptions_str = "\n".join(
+        f"*   **ID {item_id}:** {json.dumps(description, ensure_ascii=False)}"
+        for item_id, description in items
+    )
+    prefix, suffix = _as_taxonomy(taxonomy).prompt_parts(PACKED_PROMPT_TEMPLATE, '{{descriptions}}')
+    return prefix + descriptions_str + suffix
+
+def build_repair_prompt(response_str, problem, taxonomy):
+    """
+    Formats the REPAIR_PROMPT_TEMPLATE for a response that could not be used.
+    """
+    return (REPAIR_PROMPT_TEMPLATE
+            .replace('{{problem}}', problem)
+            .replace('{{response}}', (response_str or '')[:2000])
+            .replace('{{codes}}', ', '.join(_as_taxonomy(taxonomy).codes)))
+
+def response_schema(taxonomy, packed=False):
     """
+    Returns the Gemini response schema for one classification, or a list of them if packed.
+
+    The primary code is an enum over the taxonomy, so the model cannot
+    answer with a code that does not exist.
+    """
+    codes = list(_as_taxonomy(taxonomy).codes)
+    item = {
+        "type": "object",
+        "properties": {
+            "primary": {"type": "string", "format": "enum", "enum": codes},
+            "secondary": {"type": "array", "items": {"type": "string"}},
+            "explanation": {"type": "string"},
+        },
+        "required": ["primary", "secondary", "explanation"],
+    }
+    if not packed:
+        return item
+    item["properties"]["id"] = {"type": "string"}
+    item["required"].insert(0, "id")
+    return {"type": "array", "items": item}
+
+# Generation configs kept for reuse; with pruned prompt taxonomies every
+# candidate set has its own schema, so the oldest are dropped beyond this
+GENERATION_CONFIG_CACHE_SIZE = 256
+
+_generation_configs = {}
+_json_mode_available = True
+
+def generation_config(taxonomy, packed=False):
+    """
+    Returns the generation config for a classification request.
+
+    In JSON mode the config asks for application/json constrained by
+    response_schema; otherwise, or after the API has rejected JSON mode,
+    it is the plain GENERATION_CONFIG.
+    """
+    if not (JSON_MODE and _json_mode_available):
+        return GENERATION_CONFIG
+    taxonomy = _as_taxonomy(taxonomy)
+    key = (taxonomy.version, packed)
+    config = _generation_configs.get(key)
+    if config is None:
+        config = dict(GENERATION_CONFIG, response_mime_type="application/json",
+                      response_schema=response_schema(taxonomy, packed))
+        while len(_generation_configs) >= GENERATION_CONFIG_CACHE_SIZE:
+            _generation_configs.pop(next(iter(_generation_configs)), None)
+        _generation_configs[key] = config
+    return config
+
+def extract_json(response_str):
+    """
+    Returns the first JSON object or array found in a response, or None.
+
+    Markdown code fences and prose around the JSON are tolerated.
+    """
+    if not isinstance(response_str, str):
+        return None
+    text = response_str.strip().replace('```json', '').replace('```', '').strip()
     try:
-        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+    decoder = json.JSONDecoder()
+    for index, char in enumerate(text):
+        if char in '{[':
+            try:
+                return decoder.raw_decode(text, index)[0]
+            except json.JSONDecodeError:
+                continue
+    return None
 
-        model = genai.GenerativeModel(
-            model_name="gemini-1.5-flash",
-            generation_config={"temperature": 0.0},
-        )
+def validate_result(result, taxonomy):
+    """
+    Checks a parsed classification against the taxonomy.
+
+    Returns (result, problem): problem is None for a usable result. Unknown
+    secondary codes are dropped; an unknown primary code is a problem.
+    """
+    if not isinstance(result, dict):
+        return None, "the answer is not a JSON object"
+    if 'error' in result:
+        # An API failure reported by call_llm; returned as is and not cached
+        return result, None
+    if not _is_valid_result(result):
+        return None, "'primary' must be a code and 'secondary' a list of codes"
+    taxonomy = _as_taxonomy(taxonomy)
+    if result['primary'] not in taxonomy.code_set:
+        return None, f"primary code {result['primary']!r} is not in the taxonomy"
+    explanation = result.get('explanation', '')
+    return {
+        'primary': result['primary'],
+        'secondary': taxonomy.valid_codes(result['secondary']),
+        'explanation': explanation if isinstance(explanation, str) else str(explanation),
+    }, None
+
+def parse_result(response_str, taxonomy):
+    """
+    Extracts and validates a single classification from a raw response.
+
+    Returns (result, problem) as validate_result does.
+    """
+    parsed = extract_json(response_str)
+    if parsed is None:
+        return None, "no JSON object was found"
+    if isinstance(parsed, list) and len(parsed) == 1:
+        parsed = parsed[0]
+    return validate_result(parsed, taxonomy)
+
+def _is_valid_result(result):
+    """
+    Checks that a parsed classification has a primary code and a list of secondary codes.
+    """
+    return (
+        isinstance(result, dict)
+        and isinstance(result.get('primary'), str)
+        and result['primary'] != ''
+        and isinstance(result.get('secondary'), list)
+        and all(isinstance(code, str) for code in result['secondary'])
+    )
+
+def parse_packed_response(response_str, item_ids, taxonomy=None):
+    """
+    Parses a packed response into {id: result} for every valid item.
+
+    Items that are missing, duplicated or malformed are left out so the
+    caller can classify them individually. With a taxonomy, an item whose
+    primary code is not in it is also left out, and unknown secondary codes
+    are dropped.
+    """
+    parsed = extract_json(response_str)
+    if isinstance(parsed, dict):
+        parsed = parsed.get('results', [])
+    if not isinstance(parsed, list):
+        return {}
+
+    wanted = {str(item_id) for item_id in item_ids}
+    results = {}
+    seen = set()
+    for entry in parsed:
+        if not isinstance(entry, dict):
+            continue
+        item_id = str(entry.get('id'))
+        if item_id not in wanted:
+            continue
+        if item_id in seen:
+            results.pop(item_id, None)
+            continue
+        seen.add(item_id)
+        result = {
+            'primary': entry.get('primary'),
+            'secondary': entry.get('secondary'),
+            'explanation': entry.get('explanation', ''),
+        }
+        if not _is_valid_result(result):
+            continue
+        if taxonomy is not None:
+            if result['primary'] not in taxonomy.code_set:
+                continue
+            result['secondary'] = taxonomy.valid_codes(result['secondary'])
+        results[item_id] = result
+    return results
+
+def _rejects_json_mode(exc):
+    """
+    True if an error says the SDK or model does not support the JSON-mode config.
+
+    Only errors that name the JSON-mode fields, or the API's InvalidArgument
+    error, count; any other error (e.g. a TypeError from a bug in our own
+    code) takes the normal error path and leaves JSON mode on.
+    """
+    if is_retryable(exc):
+        return False
+    message = str(exc)
+    if 'response_schema' in message or 'response_mime_type' in message:
+        return True
+    return any(cls.__name__ == 'InvalidArgument' for cls in type(exc).__mro__)
+
+# Sub-Task 1.3.6: Implement call_llm()
+def call_llm(prompt, generation_config=None):
+    """
+    Sends the prompt to the Gemini API and returns the response.
 
-        response = model.generate_content(prompt)
+    If a JSON-mode request is rejected because the SDK or model does not
+    support response_schema, JSON mode is switched off for the rest of the
+    run and the prompt is sent again as plain text.
+
+    If the run budget (src.budget) refuses the call, an error marked with
+    budget_exceeded is returned, so callers can leave the item for a later run.
+    """
+    global _json_mode_available
+    config = generation_config or GENERATION_CONFIG
+    try:
+        # Shared model instance, rate-limited and retried by the scheduler
+        response_text = llm_client.generate(prompt, MODEL_NAME, config, stage='classify')
         # Log the raw response for debugging
-        print("----------- RAW LLM RESPONSE -----------")
-        print(response.text)
-        print("------------------------------------")
-        return response.text
+        logger.debug("Raw LLM response: %s", response_text)
+        return response_text
+    except BudgetExceeded as e:
+        logger.debug("LLM call not made: %s", e)
+        return json.dumps({"error": f"Budget exceeded: {e}", "budget_exceeded": True})
     except Exception as e:
-        print(f"An error occurred during the Gemini API call: {e}")
+        if 'response_mime_type' in config and _rejects_json_mode(e):
+            logger.warning("JSON response mode is not available (%s); falling back to plain text.", e)
+            _json_mode_available = False
+            return call_llm(prompt, GENERATION_CONFIG)
+        logger.warning("An error occurred during the Gemini API call: %s", e)
         return json.dumps({"error": f"Gemini API call failed: {str(e)}"})
 
+def _refused(response_str):
+    """
+    True if response_str is call_llm's error for a call the run budget refused.
+    """
+    parsed = extract_json(response_str)
+    return isinstance(parsed, dict) and bool(parsed.get('budget_exceeded'))
+
 # Sub-Task 1.3.7: Implement classify_blurb()
-def classify_blurb(description):
+def classify_blurb(description, stats=None):
     """
     Main orchestrator function to classify a company description.
+
+    If a BatchStats object is given, the LLM call and its estimated tokens are recorded on it.
     """
     # a. Load the taxonomy
     taxonomy = load_taxonomy()
     if not taxonomy:
         return {"error": "Failed to load taxonomy."}
 
-    # b. Load the cache
-    cache = load_cache()
+    # b. Look up the description in the cache
+    cache = get_cache(taxonomy)
+    retriever = get_retriever()
+    cache_key = make_cache_key(description, taxonomy.version, MODEL_NAME,
+                               _prompt_version(PROMPT_VERSION, retriever))
 
-    # c. Check if the description is in the cache
-    if description in cache:
-        print("--- CACHE HIT ---")
-        return cache[description]
+    # c. Return the cached result if there is one (a full-prompt answer also serves a pruned prompt)
+    cached = cache.get(cache_key)
+    if cached is None and retriever is not None:
+        cached = cache.get(make_cache_key(description, taxonomy.version, MODEL_NAME, PROMPT_VERSION))
+    if cached is not None:
+        logger.debug("Cache hit for %.60r", description)
+        get_metrics().inc('classifier.cache', result='hit')
+        if stats is not None:
+            stats.add(cache_hits=1)
+        return cached
 
-    print("--- CACHE MISS ---")
-    # d. If not in cache, build the prompt
-    prompt = build_prompt(description, taxonomy)
+    logger.debug("Cache miss for %.60r", description)
+    get_metrics().inc('classifier.cache', result='miss')
+    # d. If not in cache, build the prompt, listing only the likely codes if a retriever is set
+    prompt_taxonomy = retriever.prune(description) if retriever is not None else taxonomy
+    prompt = build_prompt(description, prompt_taxonomy)
+    config = generation_config(prompt_taxonomy)
 
     # e. Call the LLM
-    llm_response_str = call_llm(prompt)
+    llm_response_str = call_llm(prompt, config)
+    if stats is not None and not _refused(llm_response_str):
+        stats.add(llm_calls=1, prompt_tokens=estimate_tokens(prompt),
+                  response_tokens=estimate_tokens(llm_response_str))
 
-    # f. Parse the JSON response
-    try:
-        # Clean the response string by removing markdown backticks and "json" identifier
-        clean_response = llm_response_str.strip().replace('```json', '').replace('```', '').strip()
-        result = json.loads(clean_response)
-    except json.JSONDecodeError:
-        print(f"Failed to decode JSON from response: {llm_response_str}")
-        return {"error": "Failed to parse LLM response."}
+    # f. Parse and validate the JSON response, asking once for a repair if it is unusable
+    result, problem = parse_result(llm_response_str, taxonomy)
+    if problem is not None:
+        logger.warning("Unusable LLM response (%s); asking for a repair.", problem)
+        logger.debug("Unusable response: %s", llm_response_str)
+        get_metrics().inc('classifier.parse_failures')
+        repair_prompt = build_repair_prompt(llm_response_str, problem, prompt_taxonomy)
+        repaired_str = call_llm(repair_prompt, config)
+        if stats is not None:
+            stats.add(parse_failures=1)
+            if not _refused(repaired_str):
+                stats.add(llm_calls=1, prompt_tokens=estimate_tokens(repair_prompt),
+                          response_tokens=estimate_tokens(repaired_str))
+        result, problem = parse_result(repaired_str, taxonomy)
+        if problem is not None:
+            logger.warning("Repair failed (%s).", problem)
+            get_metrics().inc('classifier.repairs', result='failed')
+            return {"error": f"Failed to parse LLM response: {problem}"}
+        if 'error' in result:
+            # The repair call itself failed or was refused by the budget
+            get_metrics().inc('classifier.repairs', result='failed')
+            return result
+        get_metrics().inc('classifier.repairs', result='ok')
+        if stats is not None:
+            stats.add(repairs=1)
 
-    # g. Update the cache and save it
-    cache[description] = result
-    save_cache(cache)
+    # g. Store the result in the cache, unless the call failed
+    if isinstance(result, dict) and 'error' not in result:
+        cache.set(cache_key, result, model=MODEL_NAME, taxonomy_version=taxonomy.version,
+                  prompt_version=_prompt_version(PROMPT_VERSION, retriever))
 
     # h. Return the parsed JSON result
     return result
 
+class BatchStats:
+    """
+    Throughput and estimated token/cost counters for one classify_many run.
+    """
+
+    def __init__(self, pack_size=DEFAULT_PACK_SIZE):
+        self.pack_size = pack_size
+        self.items = 0
+        self.unique_items = 0
+        self.cache_hits = 0
+        self.llm_calls = 0
+        self.fallbacks = 0
+        self.near_duplicates = 0
+        self.parse_failures = 0
+        self.repairs = 0
+        self.prompt_tokens = 0
+        self.response_tokens = 0
+        self.started = time.monotonic()
+        self.finished = None
+        self._lock = threading.Lock()
+
+    def add(self, **counts):
+        with self._lock:
+            for name, amount in counts.items():
+                setattr(self, name, getattr(self, name) + amount)
+
+    def finish(self):
+        self.finished = time.monotonic()
+
+    def summary(self):
+        """
+        Returns the counters plus derived throughput and cost-per-item figures.
+        """
+        elapsed = (self.finished or time.monotonic()) - self.started
+        cost = (self.prompt_tokens * INPUT_PRICE_PER_MILLION_TOKENS
+                + self.response_tokens * OUTPUT_PRICE_PER_MILLION_TOKENS) / 1_000_000
+        items = max(self.items, 1)
+        return {
+            'pack_size': self.pack_size,
+            'items': self.items,
+            'unique_items': self.unique_items,
+            'cache_hits': self.cache_hits,
+            'llm_calls': self.llm_calls,
+            'fallbacks': self.fallbacks,
+            'near_duplicates': self.near_duplicates,
+            'parse_failures': self.parse_failures,
+            'repairs': self.repairs,
+            'parse_failure_rate': round(self.parse_failures / self.llm_calls, 4) if self.llm_calls else 0.0,
+            'prompt_tokens': self.prompt_tokens,
+            'response_tokens': self.response_tokens,
+            'seconds': round(elapsed, 3),
+            'items_per_second': round(self.items / elapsed, 3) if elapsed > 0 else None,
+            'tokens_per_item': round((self.prompt_tokens + self.response_tokens) / items, 1),
+            'cost_per_item_usd': cost / items,
+        }
+
+    def report(self):
+        s = self.summary()
+        return (
+            f"K={s['pack_size']}: {s['items']} items in {s['seconds']}s "
+            f"({s['items_per_second']} items/s), {s['llm_calls']} LLM calls, "
+            f"{s['fallbacks']} single-item fallbacks, {s['near_duplicates']} near-duplicates shared, "
+            f"{s['parse_failures']} parse failures ({s['parse_failure_rate']:.1%} of calls, "
+            f"{s['repairs']} repaired), "
+            f"{s['tokens_per_item']} tokens/item, "
+            f"${s['cost_per_item_usd']:.6f}/item"
+        )
+
+def _classify_safely(description, stats=None):
+    """
+    Runs classify_blurb and turns an unexpected exception into an error result.
+    """
+    try:
+        return classify_blurb(description, stats=stats)
+    except Exception as e:
+        logger.warning("Classification failed: %s", e)
+        return {"error": f"Classification failed: {str(e)}"}
+
+def classify_packed(descriptions, taxonomy, stats=None):
+    """
+    Classifies several uncached descriptions with a single packed LLM request.
+
+    Valid results are cached under the packed prompt version. Any description
+    whose result is missing or malformed falls back to classify_blurb.
+    With a retriever set, the prompt lists the union of the descriptions'
+    candidate codes. Returns results in input order.
+    """
+    taxonomy = _as_taxonomy(taxonomy)
+    cache = get_cache(taxonomy)
+    version = taxonomy.version
+    retriever = get_retriever()
+    prompt_version = _prompt_version(PACKED_PROMPT_VERSION, retriever)
+    items = [(str(i + 1), description) for i, description in enumerate(descriptions)]
+
+    prompt_taxonomy = retriever.prune(descriptions) if retriever is not None else taxonomy
+    prompt = build_packed_prompt(items, prompt_taxonomy)
+    llm_response_str = call_llm(prompt, generation_config(prompt_taxonomy, packed=True))
+    if _refused(llm_response_str):
+        # Single-item fallbacks would be refused as well
+        return [json.loads(llm_response_str) for _ in items]
+    if stats is not None:
+        stats.add(llm_calls=1, prompt_tokens=estimate_tokens(prompt),
+                  response_tokens=estimate_tokens(llm_response_str))
+    parsed = parse_packed_response(llm_response_str, [item_id for item_id, _ in items], taxonomy)
+    if not parsed:
+        get_metrics().inc('classifier.parse_failures')
+        if stats is not None:
+            stats.add(parse_failures=1)
+
+    results = []
+    for item_id, description in items:
+        result = parsed.get(item_id)
+        if result is None:
+            if stats is not None:
+                stats.add(fallbacks=1)
+            result = _classify_safely(description, stats=stats)
+        else:
+            cache.set(make_cache_key(description, version, MODEL_NAME, prompt_version), result,
+                      model=MODEL_NAME, prompt_version=prompt_version, taxonomy_version=version)
+        results.append(result)
+    return results
+
+def _classify_packed_safely(descriptions, taxonomy, stats=None):
+    """
+    Runs classify_packed, falling back to single-item calls if the packed call itself fails.
+    """
+    try:
+        return classify_packed(descriptions, taxonomy, stats=stats)
+    except Exception as e:
+        logger.warning("Packed classification failed, retrying items individually: %s", e)
+        if stats is not None:
+            stats.add(fallbacks=len(descriptions))
+        return [_classify_safely(description, stats=stats) for description in descriptions]
+
+def _cached_result(cache, description, version):
+    """
+    Returns a cached result for description under either prompt version, or None.
+
+    With a retriever set, answers to pruned prompts are looked up after the
+    full-prompt ones.
+    """
+    versions = [PACKED_PROMPT_VERSION, PROMPT_VERSION]
+    retriever = get_retriever()
+    if retriever is not None:
+        versions += [_prompt_version(base, retriever) for base in versions]
+    for prompt_version in versions:
+        cached = cache.get(make_cache_key(description, version, MODEL_NAME, prompt_version))
+        if cached is not None:
+            return cached
+    return None
+
+def _classify_unique(unique, workers, pack_size, stats=None):
+    """
+    Classifies distinct descriptions and returns {description: result}.
+    """
+    if pack_size <= 1:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            classified = executor.map(lambda d: _classify_safely(d, stats=stats), unique)
+            return dict(zip(unique, classified))
+
+    taxonomy = load_taxonomy()
+    if not taxonomy:
+        return {description: {"error": "Failed to load taxonomy."} for description in unique}
+    cache = get_cache(taxonomy)
+    version = taxonomy.version
+
+    results = {}
+    misses = []
+    for description in unique:
+        cached = _cached_result(cache, description, version)
+        if cached is not None:
+            results[description] = cached
+        else:
+            misses.append(description)
+    get_metrics().inc('classifier.cache', len(unique) - len(misses), result='hit')
+    get_metrics().inc('classifier.cache', len(misses), result='miss')
+    if stats is not None:
+        stats.add(cache_hits=len(unique) - len(misses))
+
+    chunks = [misses[i:i + pack_size] for i in range(0, len(misses), pack_size)]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        classified = executor.map(lambda c: _classify_packed_safely(c, taxonomy, stats=stats), chunks)
+        for chunk, chunk_results in zip(chunks, classified):
+            results.update(zip(chunk, chunk_results))
+    return results
+
+def _share_near_duplicates(unique, names, near_duplicates):
+    """
+    Splits unique descriptions into representatives and near-duplicates of indexed ones.
+
+    Descriptions with an exact cache entry are always representatives, so
+    a cached answer is never replaced by a neighbour's. Returns
+    (representatives, {description: (representative, similarity)}).
+    """
+    taxonomy = load_taxonomy()
+    cache = get_cache(taxonomy) if taxonomy else None
+    representatives = []
+    shared = {}
+    for description in unique:
+        name = names.get(description)
+        if cache is None or _cached_result(cache, description, taxonomy.version) is None:
+            match = near_duplicates.match(description, name)
+            if match is not None:
+                shared[description] = match
+                continue
+        near_duplicates.add(description, name)
+        representatives.append(description)
+    return representatives, shared
+
+def classify_many(descriptions, max_concurrency=DEFAULT_MAX_CONCURRENCY,
+                  pack_size=DEFAULT_PACK_SIZE, stats=None, near_duplicates=None, names=None):
+    """
+    Classifies a batch of descriptions with at most max_concurrency LLM requests in flight.
+
+    Identical descriptions are classified once. Results are returned in input
+    order, and a failure only affects the rows with that description. With
+    pack_size > 1, uncached descriptions are sent pack_size at a time in one
+    prompt. Pass a BatchStats object to collect throughput and cost figures.
+
+    With a NearDuplicateIndex (src.near_duplicates), a description that is
+    near-identical to one already classified in this or an earlier call
+    reuses that result; the shared result names its source in
+    'near_duplicate_of' and 'similarity'. names optionally gives the company
+    name of each description, which is ignored when comparing.
+    """
+    descriptions = list(descriptions)
+    unique = list(dict.fromkeys(descriptions))
+    if stats is not None:
+        stats.add(items=len(descriptions), unique_items=len(unique))
+    if not unique:
+        if stats is not None:
+            stats.finish()
+        return []
+
+    workers = max(1, min(max_concurrency, len(unique)))
+    if near_duplicates is None:
+        results = _classify_unique(unique, workers, pack_size, stats=stats)
+    else:
+        first_names = {}
+        for description, name in zip(descriptions, names or []):
+            first_names.setdefault(description, name)
+        representatives, shared = _share_near_duplicates(unique, first_names, near_duplicates)
+        results = _classify_unique(representatives, workers, pack_size, stats=stats)
+        for description, result in results.items():
+            if 'error' not in result:
+                near_duplicates.set_result(description, result)
+
+        orphans = []
+        for description, (representative, similarity) in shared.items():
+            result = results.get(representative) or near_duplicates.result(representative)
+            if result is None or 'error' in result:
+                # The representative failed or is still in flight elsewhere
+                orphans.append(description)
+                continue
+            results[description] = dict(result, near_duplicate_of=representative,
+                                        similarity=round(similarity, 3))
+            near_duplicates.record(description, representative, similarity)
+        if stats is not None:
+            stats.add(near_duplicates=len(shared) - len(orphans))
+        if orphans:
+            results.update(_classify_unique(orphans, workers, pack_size, stats=stats))
+
+    if stats is not None:
+        stats.finish()
+    return [results[description] for description in descriptions]
+
 if __name__ == '__main__':
     # Example usage:
     test_description = "A sample company that provides horizontal business solutions for SMEs."
@@ -0,0 +1,226 @@
+import csv
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from src.matching import as_float, extract_codes
+from src.taxonomy import get_taxonomy
+
+# First bytes of every codes file, followed by the header length (uint32) and a JSON header
+MAGIC = b'LLMCODES'
+FORMAT_VERSION = 1
+
+# Text columns kept for the report, per kind of *_with_codes file
+TEXT_COLUMNS = {
+    'partners': ['Company Name', 'Evaluation Score', 'Avg Leads Per Day'],
+    'prospects': ['firma', 'url'],
+}
+
+# Numeric boost columns, stored as float64 (NaN for missing or invalid values)
+FLOAT_COLUMNS = {
+    'partners': ['Evaluation Score', 'Avg Leads Per Day'],
+    'prospects': [],
+}
+
+
+def codes_path(csv_path):
+    """
+    Default codes file next to a *_with_codes CSV, e.g. output/partners_with_codes.bin.
+    """
+    return os.path.splitext(csv_path)[0] + '.bin'
+
+
+def _pad(data):
+    return data + b'\0' * (-len(data) % 8)
+
+
+def write_codes_file(path, rows, kind, taxonomy=None):
+    """
+    Writes *_with_codes rows as a compact, memory-mappable columnar file.
+
+    audience_codes becomes a bitmask against a code order (in 64-bit words,
+    so more than 64 codes fit): the taxonomy's codes, then any other codes
+    the rows use in first-seen order, so scoring sees the raw codes as
+    from the CSV. Boost fields become float64 and the text columns needed
+    for the report are stored as UTF-8 with offsets. The header records the
+    taxonomy version and code order, so a file written for another taxonomy
+    is rejected when loaded.
+    """
+    taxonomy = taxonomy if taxonomy is not None else get_taxonomy()
+    if not taxonomy:
+        raise ValueError("A taxonomy is required to encode audience codes.")
+    rows = list(rows)
+    row_codes = [extract_codes(row.get('audience_codes')) for row in rows]
+    bits = {code: i for i, code in enumerate(taxonomy.codes)}
+    for codes in row_codes:
+        for code in codes:
+            bits.setdefault(code, len(bits))
+    code_order = list(bits)
+    words = max(1, (len(code_order) + 63) // 64)
+
+    sections = []
+    masks = array('Q')
+    for codes in row_codes:
+        mask = 0
+        for code in codes:
+            mask |= 1 << bits[code]
+        masks.extend((mask >> (64 * w)) & 0xFFFFFFFFFFFFFFFF for w in range(words))
+    sections.append(('masks', 'Q', masks.tobytes()))
+    for column in FLOAT_COLUMNS[kind]:
+        values = array('d', (as_float(row.get(column)) for row in rows))
+        sections.append((f"float:{column}", 'd', values.tobytes()))
+    for column in TEXT_COLUMNS[kind]:
+        encoded = [(row.get(column) or '').encode('utf-8') for row in rows]
+        offsets = array('Q', [0])
+        for value in encoded:
+            offsets.append(offsets[-1] + len(value))
+        sections.append((f"offsets:{column}", 'Q', offsets.tobytes()))
+        sections.append((f"text:{column}", 'B', b''.join(encoded)))
+
+    layout = {}
+    offset = 0
+    for name, typecode, data in sections:
+        layout[name] = [offset, len(data), typecode]
+        offset += len(_pad(data))
+    header = _pad(json.dumps({
+        'format_version': FORMAT_VERSION,
+        'kind': kind,
+        'byteorder': sys.byteorder,
+        'taxonomy_version': taxonomy.version,
+        'code_order': code_order,
+        'rows': len(rows),
+        'words': words,
+        'sections': layout,
+    }, ensure_ascii=False).encode('utf-8'))
+
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(_pad(MAGIC + struct.pack('<I', len(header))))
+        f.write(header)
+        for _, _, data in sections:
+            f.write(_pad(data))
+    os.replace(tmp_path, path)
+
+
+def export_codes_file(csv_path, kind, path=None, taxonomy=None):
+    """
+    Converts a *_with_codes CSV into a codes file and returns its path.
+    """
+    path = path or codes_path(csv_path)
+    with open(csv_path, mode='r', encoding='utf-8') as infile:
+        write_codes_file(path, csv.DictReader(infile), kind, taxonomy)
+    return path
+
+
+class CodesFile:
+    """
+    Read-only view of a codes file written by write_codes_file.
+
+    The file is memory-mapped and every column is a memoryview cast onto the
+    mapping, so opening it copies nothing; masks, floats and text are read
+    per row on access.
+    """
+
+    def __init__(self, path, kind=None, taxonomy=None):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"{path} is empty.")
+        prefix = len(_pad(MAGIC + b'\0' * 4))
+        if self._map[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a codes file.")
+        (header_length,) = struct.unpack('<I', self._map[len(MAGIC):len(MAGIC) + 4])
+        header = json.loads(bytes(self._map[prefix:prefix + header_length]).rstrip(b'\0').decode('utf-8'))
+        taxonomy = taxonomy if taxonomy is not None else get_taxonomy()
+        problem = None
+        if header['format_version'] != FORMAT_VERSION or header['byteorder'] != sys.byteorder:
+            problem = "was written by an incompatible version or platform"
+        elif kind is not None and header['kind'] != kind:
+            problem = f"holds {header['kind']}, not {kind}"
+        elif not taxonomy or header['taxonomy_version'] != taxonomy.version:
+            problem = "was written for another taxonomy version"
+        if problem:
+            self.close()
+            raise ValueError(f"{path} {problem}.")
+
+        self.kind = header['kind']
+        self.code_order = header['code_order']
+        self.rows = header['rows']
+        self.words = header['words']
+        view = memoryview(self._map)
+        base = prefix + header_length
+        self._columns = {}
+        for name, (offset, length, typecode) in header['sections'].items():
+            self._columns[name] = view[base + offset:base + offset + length].cast(typecode)
+
+    def __len__(self):
+        return self.rows
+
+    def mask(self, i):
+        masks = self._columns['masks']
+        if self.words == 1:
+            return masks[i]
+        value = 0
+        for w in range(self.words):
+            value |= masks[i * self.words + w] << (64 * w)
+        return value
+
+    def masks(self):
+        if self.words == 1:
+            return self._columns['masks']
+        return [self.mask(i) for i in range(self.rows)]
+
+    def floats(self, column):
+        return self._columns[f"float:{column}"]
+
+    def text(self, column, i):
+        offsets = self._columns[f"offsets:{column}"]
+        return bytes(self._columns[f"text:{column}"][offsets[i]:offsets[i + 1]]).decode('utf-8')
+
+    def row(self, i):
+        return {column: self.text(column, i) for column in TEXT_COLUMNS[self.kind]}
+
+    def close(self):
+        self._columns = {}
+        if getattr(self, '_map', None) is not None:
+            try:
+                self._map.close()
+            except BufferError:
+                # Views handed out are still alive; the mapping closes with them
+                pass
+            self._map = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class LazyRows:
+    """
+    Sequence of a CodesFile's rows (as dicts of text columns), decoded only when accessed.
+    """
+
+    def __init__(self, codes_file):
+        self.codes_file = codes_file
+
+    def __len__(self):
+        return len(self.codes_file)
+
+    def __getitem__(self, i):
+        return self.codes_file.row(i)
+
+    def __iter__(self):
+        for i in range(len(self.codes_file)):
+            yield self.codes_file.row(i)
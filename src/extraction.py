@@ -0,0 +1,108 @@
+import re
+
+from bs4 import BeautifulSoup
+
+from src.scheduler import estimate_tokens
+
+# Elements that never carry a description of the company
+BOILERPLATE_TAGS = ['script', 'style', 'noscript', 'template', 'svg', 'iframe',
+                    'nav', 'footer', 'aside', 'form']
+
+# Elements that are usually page furniture but may hold the hero heading
+GUARDED_BOILERPLATE_TAGS = ['header']
+
+# id/class fragments of cookie banners, menus and similar page furniture
+BOILERPLATE_PATTERN = re.compile(
+    r'cookie|consent|gdpr|banner|newsletter|navbar|menu|breadcrumb|footer|sidebar|popup|modal',
+    re.IGNORECASE,
+)
+
+# Elements that start a new block of text when rendered
+BLOCK_TAGS = ['p', 'div', 'section', 'article', 'main', 'li', 'ul', 'ol', 'table', 'tr', 'td', 'th',
+              'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'blockquote', 'dd', 'dt', 'br']
+
+# Default cap on the page text sent to the summarizer, in estimated tokens
+DEFAULT_TOKEN_BUDGET = 2000
+
+
+def _is_boilerplate(tag):
+    names = ' '.join(tag.get('class') or []) + ' ' + (tag.get('id') or '')
+    if not (tag.name in GUARDED_BOILERPLATE_TAGS or BOILERPLATE_PATTERN.search(names)
+            or tag.get('role') in ('navigation', 'banner', 'contentinfo')):
+        return False
+    # A wrapper such as <div class="page sidebar-layout"> or a <header> with the
+    # page's <h1> may hold the real content
+    return tag.find(['main', 'article', 'h1']) is None
+
+
+def dedupe_blocks(blocks):
+    """
+    Drops blank blocks and blocks whose normalized text has been seen before, keeping order.
+    """
+    seen = set()
+    kept = []
+    for block in blocks:
+        text = ' '.join(block.split())
+        key = text.lower()
+        if not text or key in seen:
+            continue
+        seen.add(key)
+        kept.append(text)
+    return kept
+
+
+def truncate_to_budget(text, max_tokens):
+    """
+    Cuts text to roughly max_tokens estimated tokens, at a word boundary.
+    """
+    if max_tokens is None or estimate_tokens(text) <= max_tokens:
+        return text
+    cut = text[:max_tokens * 4]
+    space = cut.rfind(' ')
+    return cut[:space] if space > 0 else cut
+
+
+def reduce_page(content, encoding=None, max_tokens=DEFAULT_TOKEN_BUDGET):
+    """
+    Extracts the informative text of an HTML page for summarization.
+
+    Scripts, styles, navigation, footers and cookie banners are removed,
+    repeated blocks (menus, taglines repeated per section) are kept once and
+    the result is truncated to max_tokens. Returns (text, report), where
+    report compares the estimated tokens of the full body text with those
+    of the reduced text.
+    """
+    soup = BeautifulSoup(content, 'html.parser', from_encoding=encoding)
+    body = soup.find('body')
+    if body is None:
+        return "", {'raw_tokens': 0, 'reduced_tokens': 0, 'saved_tokens': 0}
+    raw_tokens = estimate_tokens(body.get_text(separator=' ', strip=True))
+
+    for tag in body.find_all(BOILERPLATE_TAGS):
+        tag.decompose()
+    for tag in body.find_all(_is_boilerplate):
+        tag.decompose()
+
+    for tag in body.find_all(BLOCK_TAGS):
+        tag.insert_before('\n')
+        tag.append('\n')
+    blocks = dedupe_blocks(body.get_text().split('\n'))
+    text = truncate_to_budget(' '.join(blocks), max_tokens)
+    reduced_tokens = estimate_tokens(text) if text else 0
+    return text, {
+        'raw_tokens': raw_tokens,
+        'reduced_tokens': reduced_tokens,
+        'saved_tokens': max(0, raw_tokens - reduced_tokens),
+    }
+
+
+def row_context(row):
+    """
+    Returns the prospect's own description and category from the CSV, or "".
+    """
+    parts = []
+    if (row.get('Beschreibung') or '').strip():
+        parts.append(f"Beschreibung: {row['Beschreibung'].strip()}")
+    if (row.get('Kategorie') or '').strip():
+        parts.append(f"Kategorie: {row['Kategorie'].strip()}")
+    return '\n'.join(parts)
@@ -0,0 +1,144 @@
+import csv
+import json
+import os
+
+
+def row_keys(rows, key_fn):
+    """
+    Returns a stable key for each row.
+
+    key_fn gives the natural key (e.g. firma + url); repeated natural keys
+    get an occurrence suffix so that every row has its own key.
+    """
+    seen = {}
+    keys = []
+    for row in rows:
+        key = key_fn(row)
+        count = seen.get(key, 0)
+        seen[key] = count + 1
+        keys.append(key if count == 0 else f"{key}#{count + 1}")
+    return keys
+
+
+class RunJournal:
+    """
+    Append-only record of finished rows for a resumable pipeline run.
+
+    Each line is a JSON object with the row key, its status ('ok' or
+    'error') and the output row that was written for it. Every record is
+    flushed and fsynced, so after a crash the journal lists exactly the rows
+    whose results are safe on disk. A partially written last line is ignored.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self.entries[entry['key']] = entry
+        self._file = None
+
+    def _open(self):
+        if self._file is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = open(self.path, 'a', encoding='utf-8')
+        return self._file
+
+    def reset(self):
+        """
+        Forgets every recorded row and truncates the journal file.
+        """
+        self.close()
+        self.entries = {}
+        open(self.path, 'w', encoding='utf-8').close()
+
+    def status(self, key):
+        entry = self.entries.get(key)
+        return entry['status'] if entry else None
+
+    def should_process(self, key, retry_errors=False):
+        """
+        Returns True if the row is not done yet, or failed and retry_errors is set.
+        """
+        status = self.status(key)
+        if status is None:
+            return True
+        return retry_errors and status == 'error'
+
+    def record(self, key, status, row):
+        entry = {'key': key, 'status': status, 'row': row}
+        f = self._open()
+        f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+        self.entries[key] = entry
+
+    def counts(self):
+        """
+        Returns {'ok': n, 'error': m} over all recorded rows.
+        """
+        counts = {'ok': 0, 'error': 0}
+        for entry in self.entries.values():
+            counts[entry['status']] = counts.get(entry['status'], 0) + 1
+        return counts
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class CheckpointWriter:
+    """
+    CSV writer that appends rows and fsyncs after each one.
+
+    When resuming, an existing file is appended to; otherwise it is
+    truncated and a header is written.
+    """
+
+    def __init__(self, path, fieldnames, resume=False):
+        self.path = path
+        append = resume and os.path.exists(path) and os.path.getsize(path) > 0
+        self._file = open(path, 'a' if append else 'w', newline='', encoding='utf-8')
+        self._writer = csv.DictWriter(self._file, fieldnames=fieldnames)
+        if not append:
+            self._writer.writeheader()
+            self._sync()
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def writerow(self, row):
+        self._writer.writerow(row)
+        self._sync()
+
+    def close(self):
+        self._file.close()
+
+
+def rewrite_from_journal(path, fieldnames, keys, journal):
+    """
+    Rewrites the output CSV from the journal: one row per key, in input order.
+
+    This drops the superseded rows that retries append. The file is replaced
+    atomically, so a crash here leaves the previous version intact.
+    """
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        for key in keys:
+            entry = journal.entries.get(key)
+            if entry is not None:
+                writer.writerow(entry['row'])
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
@@ -0,0 +1,221 @@
+import os
+import random
+import threading
+import time
+
+from src.budget import get_budget
+from src.metrics import get_metrics
+from src.scheduler import estimate_tokens, get_scheduler
+
+
+def response_usage(response):
+    """
+    Returns {'prompt_tokens', 'response_tokens'} from a Gemini response's usage metadata, or None.
+    """
+    metadata = getattr(response, 'usage_metadata', None)
+    prompt_tokens = getattr(metadata, 'prompt_token_count', None)
+    if prompt_tokens is None:
+        return None
+    return {
+        'prompt_tokens': prompt_tokens,
+        'response_tokens': getattr(metadata, 'candidates_token_count', None) or 0,
+    }
+
+
+# google.generativeai, imported on first use: it takes most of a second to load,
+# which tools that never call the API should not pay
+genai = None
+
+def _load_genai():
+    global genai
+    if genai is None:
+        from google import generativeai
+        genai = generativeai
+    return genai
+
+
+class GeminiClient:
+    """
+    Process-wide Gemini client.
+
+    genai is imported and configured once, on first use, and each GenerativeModel is built
+    once per model name and then reused by every caller. Generation configs,
+    whose response schema can differ per request (e.g. with a pruned
+    taxonomy), are passed with each request rather than baked into a model.
+    """
+
+    def __init__(self, api_key=None):
+        self.api_key = api_key
+        self._configured = False
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def get_model(self, model_name):
+        with self._lock:
+            if not self._configured:
+                if not self.api_key:
+                    # Read GEMINI_API_KEY from .env only when the API is actually used
+                    from dotenv import load_dotenv
+                    load_dotenv()
+                _load_genai().configure(api_key=self.api_key or os.getenv("GEMINI_API_KEY"))
+                self._configured = True
+            model = self._models.get(model_name)
+            if model is None:
+                model = genai.GenerativeModel(model_name=model_name)
+                self._models[model_name] = model
+            return model
+
+    def generate(self, prompt, model_name, generation_config=None):
+        """
+        Sends the prompt to the given model and returns the response text.
+        """
+        return self.generate_with_usage(prompt, model_name, generation_config)[0]
+
+    def generate_with_usage(self, prompt, model_name, generation_config=None):
+        """
+        Like generate, but returns (text, usage) with the token usage the API reported.
+        """
+        model = self.get_model(model_name)
+        if generation_config:
+            response = model.generate_content(prompt, generation_config=generation_config)
+        else:
+            response = model.generate_content(prompt)
+        return response.text, response_usage(response)
+
+
+class FakeLLMError(Exception):
+    """
+    Transient error raised by FakeLLMClient; the scheduler retries it like a 503.
+    """
+    code = 503
+
+
+class FakeLLMClient:
+    """
+    Offline stand-in for GeminiClient.
+
+    responder is either a fixed response string or a callable
+    (prompt, model_name) -> str. Every call is recorded in self.calls.
+
+    For benchmarks, each call can sleep for latency seconds (plus up to
+    jitter seconds) and fail with FakeLLMError at error_rate; failures are
+    drawn from a seeded generator, so runs are repeatable. Estimated tokens
+    of answered prompts and responses are summed in tokens_in/tokens_out
+    and reported as the usage of each call.
+    """
+
+    def __init__(self, responder='{"primary": "UNKNOWN", "secondary": [], "explanation": ""}',
+                 latency=0.0, jitter=0.0, error_rate=0.0, seed=0, record_calls=True):
+        self.responder = responder
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.record_calls = record_calls
+        self.calls = []
+        self.requests = 0
+        self.errors = 0
+        self.tokens_in = 0
+        self.tokens_out = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def generate(self, prompt, model_name, generation_config=None):
+        return self.generate_with_usage(prompt, model_name, generation_config)[0]
+
+    def generate_with_usage(self, prompt, model_name, generation_config=None):
+        with self._lock:
+            if self.record_calls:
+                self.calls.append((model_name, prompt))
+            self.requests += 1
+            delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+            failed = bool(self.error_rate) and self._random.random() < self.error_rate
+            self.errors += failed
+        if delay:
+            time.sleep(delay)
+        if failed:
+            raise FakeLLMError("503 Service Unavailable (simulated)")
+        if callable(self.responder):
+            response = self.responder(prompt, model_name)
+        else:
+            response = self.responder
+        usage = {'prompt_tokens': estimate_tokens(prompt), 'response_tokens': estimate_tokens(response or '')}
+        with self._lock:
+            self.tokens_in += usage['prompt_tokens']
+            self.tokens_out += usage['response_tokens']
+        return response, usage
+
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """
+    Returns the process-wide LLM client, building a GeminiClient on first use.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = GeminiClient()
+        return _client
+
+def set_client(client):
+    """
+    Replaces the process-wide LLM client (e.g. with a FakeLLMClient in tests).
+    """
+    global _client
+    with _client_lock:
+        _client = client
+
+def _timed_generate(prompt, model_name, generation_config=None):
+    """
+    One attempt at a request, recorded in the latency histogram of its model.
+
+    Returns (text, usage); usage['reported'] is False if the client reported
+    no usage and the token counts are estimates.
+    """
+    metrics = get_metrics()
+    metrics.inc('llm.requests', model=model_name)
+    client = get_client()
+    try:
+        with metrics.timer('llm.latency_seconds', model=model_name):
+            if hasattr(client, 'generate_with_usage'):
+                text, usage = client.generate_with_usage(prompt, model_name, generation_config)
+            else:
+                text, usage = client.generate(prompt, model_name, generation_config), None
+    except Exception:
+        metrics.inc('llm.errors', model=model_name)
+        raise
+    if usage is None:
+        metrics.inc('llm.usage_estimated', model=model_name)
+        usage = {'prompt_tokens': estimate_tokens(prompt), 'response_tokens': estimate_tokens(text or ''),
+                 'reported': False}
+    else:
+        usage = dict(usage, reported=True)
+    metrics.inc('llm.tokens_in', usage['prompt_tokens'], model=model_name)
+    metrics.inc('llm.tokens_out', usage['response_tokens'], model=model_name)
+    return text, usage
+
+def generate(prompt, model_name, generation_config=None, stage='llm'):
+    """
+    Generates text through the shared client and the shared request scheduler.
+
+    The call is first admitted by the run budget (src.budget) under its
+    estimated prompt tokens and counted towards stage; BudgetExceeded is
+    raised if the budget is used up. Each attempt is counted and timed per
+    model in the process-wide metrics (src.metrics), with the token usage
+    the API reported where available and estimates otherwise.
+    """
+    estimated_tokens = estimate_tokens(prompt)
+    budget = get_budget()
+    budget.admit(estimated_tokens, stage)
+    try:
+        text, usage = get_scheduler().call(
+            _timed_generate, prompt, model_name, generation_config,
+            estimated_tokens=estimated_tokens,
+        )
+    except Exception:
+        budget.release(estimated_tokens, stage)
+        raise
+    budget.record(estimated_tokens, usage['prompt_tokens'], usage['response_tokens'], stage,
+                  reported=usage['reported'])
+    return text
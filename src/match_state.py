@@ -0,0 +1,222 @@
+import hashlib
+import heapq
+import json
+import os
+
+from src import matching
+from src.matching import extract_codes
+
+# Bump whenever the layout of the state file changes
+STATE_VERSION = 1
+
+DELTA_HEADERS = [
+    'prospect_firma', 'prospect_url', 'partner_name', 'change',
+    'old_rank', 'new_rank', 'old_score', 'new_score', 'overlap_type'
+]
+
+
+def content_hash(*values):
+    """
+    Short hash of JSON-serializable values, used to detect changed rows.
+    """
+    material = json.dumps(values, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()[:16]
+
+
+def partner_fingerprint(row):
+    """
+    Hash of everything that affects a partner's scores: its codes and the boost fields.
+    """
+    return content_hash(row.get('audience_codes'), row.get('Evaluation Score'), row.get('Avg Leads Per Day'))
+
+
+def prospect_fingerprint(row):
+    return content_hash(row.get('audience_codes'))
+
+
+def scoring_signature():
+    """
+    Hash of the scoring weights and code sets, so that a state scored with other weights is not reused.
+    """
+    return content_hash(
+        matching.VERTICAL_WEIGHT, matching.HORIZONTAL_WEIGHT, matching.FUNCTIONAL_WEIGHT,
+        matching.SPECIAL_VERTICAL_WEIGHT, matching.SPECIAL_FUNCTIONAL_WEIGHT,
+        matching.EVALUATION_SCORE_BOOST, matching.LEAD_VOLUME_BOOST, matching.LEAD_VOLUME_THRESHOLD,
+        sorted(matching.SPECIAL_SET), sorted(matching.REGULATED_SET),
+    )
+
+
+def load_state(path):
+    """
+    Returns the saved matching state, or None if there is none or it cannot be used.
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"Ignoring unreadable matching state {path}: {e}")
+        return None
+    if not isinstance(state, dict) or state.get('version') != STATE_VERSION:
+        return None
+    return state
+
+
+def save_state(path, state):
+    """
+    Writes the matching state atomically.
+    """
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+
+def _reusable(state, engine, partner_keys, top_k):
+    """
+    True if the saved top-k lists were scored the same way and partner order is unchanged.
+
+    Ties between equal scores are broken by partner order, so a reordered
+    partner file forces a full rescore.
+    """
+    if state is None:
+        return False
+    if (state.get('top_k') != top_k or state.get('scoring') != scoring_signature()
+            or state.get('code_order') != list(engine.bits)):
+        return False
+    current = set(partner_keys)
+    kept_before = [key for key in state['partners'] if key in current]
+    kept_now = [key for key in partner_keys if key in state['partners']]
+    return kept_before == kept_now
+
+
+def update_top_lists(engine, partner_keys, partner_hashes, prospects, top_k, state=None):
+    """
+    Computes every prospect's top-k partners, reusing a saved state where possible.
+
+    prospects is a list of (key, fingerprint, audience_codes cell). A
+    prospect is scored from scratch if it is new or its codes changed, or
+    if a partner in its saved top-k changed or disappeared. If only other
+    partners changed and share a code with it, just those partners are
+    scored and merged into its saved top-k. All other prospects keep their
+    saved top-k. The results equal MatchEngine.top_k for every prospect.
+
+    Returns (tops, new_state, counts), where tops maps each prospect key to
+    [(partner index, score, overlap type)].
+    """
+    index = {key: j for j, key in enumerate(partner_keys)}
+    counts = {'scored': 0, 'rescored': 0, 'updated': 0, 'reused': 0}
+    if _reusable(state, engine, partner_keys, top_k):
+        saved_partners = state['partners']
+        saved_prospects = state['prospects']
+        changed = [j for j, key in enumerate(partner_keys)
+                   if key not in saved_partners or saved_partners[key]['hash'] != partner_hashes[j]]
+        stale = {key for key in saved_partners if key not in index}
+        stale.update(partner_keys[j] for j in changed)
+    else:
+        saved_prospects = {}
+        changed = []
+        stale = set()
+    changed_mask = 0
+    for j in changed:
+        changed_mask |= engine.masks[j]
+
+    tops = {}
+    new_prospects = {}
+    for key, fingerprint, audience_codes in prospects:
+        saved = saved_prospects.get(key)
+        if saved is None or saved['hash'] != fingerprint:
+            codes = extract_codes(audience_codes)
+            mask = engine.encode(codes)
+            top = engine.top_k(codes, top_k)
+            counts['scored'] += 1
+        else:
+            mask = saved['mask']
+            if any(partner_key in stale for partner_key, _, _ in saved['top']):
+                top = engine.top_k(engine.decode(mask), top_k)
+                counts['rescored'] += 1
+            else:
+                top = [(index[partner_key], score, overlap_type) for partner_key, score, overlap_type in saved['top']]
+                if mask & changed_mask:
+                    for j in changed:
+                        if mask & engine.masks[j]:
+                            score, overlap_type = engine.score(mask, j)
+                            if score > 0:
+                                top.append((j, score, overlap_type))
+                    # Ties keep partner order, as in MatchEngine.top_k
+                    top.sort(key=lambda match: match[0])
+                    top = heapq.nlargest(top_k, top, key=lambda match: match[1])
+                    counts['updated'] += 1
+                else:
+                    counts['reused'] += 1
+        tops[key] = top
+        new_prospects[key] = {
+            'hash': fingerprint,
+            'mask': mask,
+            'top': [[partner_keys[j], score, overlap_type] for j, score, overlap_type in top],
+        }
+
+    new_state = {
+        'version': STATE_VERSION,
+        'top_k': top_k,
+        'scoring': scoring_signature(),
+        'code_order': list(engine.bits),
+        'partners': {key: {'hash': partner_hashes[j], 'mask': engine.masks[j]}
+                     for j, key in enumerate(partner_keys)},
+        'prospects': new_prospects,
+    }
+    counts['removed'] = len(set(saved_prospects) - set(new_prospects))
+    return tops, new_state, counts
+
+
+def diff_top_lists(old_state, new_state, labels, partner_names):
+    """
+    Returns delta report rows comparing the saved top-k lists with the new ones.
+
+    labels maps prospect keys to (firma, url) and partner_names maps partner
+    keys to display names; keys missing from them (removed rows) fall back
+    to the labels stored in the old state. Entries that entered a top-k are
+    'added', entries that left it 'removed', and entries whose rank or
+    score moved 'changed'.
+    """
+    old_prospects = old_state['prospects'] if old_state else {}
+    old_labels = old_state.get('labels', {}) if old_state else {}
+    old_names = old_state.get('partner_names', {}) if old_state else {}
+    rows = []
+    keys = list(new_state['prospects']) + [key for key in old_prospects if key not in new_state['prospects']]
+    for key in keys:
+        before = {entry[0]: (rank, entry) for rank, entry in
+                  enumerate(old_prospects.get(key, {}).get('top', []), start=1)}
+        after = {entry[0]: (rank, entry) for rank, entry in
+                 enumerate(new_state['prospects'].get(key, {}).get('top', []), start=1)}
+        if before == after:
+            continue
+        firma, url = labels.get(key) or old_labels.get(key) or (key, '')
+
+        def row(partner_key, change, old, new):
+            entry = (new or old)[1]
+            return {
+                'prospect_firma': firma,
+                'prospect_url': url,
+                'partner_name': partner_names.get(partner_key) or old_names.get(partner_key, partner_key),
+                'change': change,
+                'old_rank': old[0] if old else '',
+                'new_rank': new[0] if new else '',
+                'old_score': old[1][1] if old else '',
+                'new_score': new[1][1] if new else '',
+                'overlap_type': entry[2],
+            }
+
+        for partner_key, new in after.items():
+            old = before.get(partner_key)
+            if old is None:
+                rows.append(row(partner_key, 'added', None, new))
+            elif old[0] != new[0] or old[1][1:] != new[1][1:]:
+                rows.append(row(partner_key, 'changed', old, new))
+        for partner_key, old in before.items():
+            if partner_key not in after:
+                rows.append(row(partner_key, 'removed', old, None))
+    return rows
@@ -0,0 +1,290 @@
+import heapq
+import json
+
+from src.taxonomy import codes_from_result
+
+# Task 4.2: Implement Scoring Logic
+# --- Constants for scoring weights ---
+VERTICAL_WEIGHT = 1.0
+HORIZONTAL_WEIGHT = 0.5
+FUNCTIONAL_WEIGHT = 0.8
+SPECIAL_VERTICAL_WEIGHT = 1.2 # e.g., for regulated industries
+SPECIAL_FUNCTIONAL_WEIGHT = 1.1 # e.g., for critical functions
+
+# --- Score Boosts ---
+EVALUATION_SCORE_BOOST = 0.1 # 10% boost for each point of evaluation score
+LEAD_VOLUME_BOOST = 0.05 # 5% boost for high lead volume partners
+LEAD_VOLUME_THRESHOLD = 50 # Avg leads per day above which a partner counts as high volume
+
+# --- Code Sets ---
+# Using sets for efficient lookups
+SPECIAL_SET = {'X_HORIZ', 'X_SME', 'F_HR', 'F_SALES', 'F_OPS'}
+REGULATED_SET = {'FIN_BANK', 'FIN_INS', 'HC_HOSP', 'HC_PHARM'}
+
+def calculate_match_score(prospect_codes, partner_codes, partner_row):
+    """
+    Calculates the match score between a prospect and a partner based on their audience codes.
+
+    Args:
+        prospect_codes (list): A list of audience codes for the prospect.
+        partner_codes (list): A list of audience codes for the partner.
+        partner_row (dict): The full data row for the partner, used for boosts.
+
+    Returns:
+        tuple: A tuple containing the final score (float) and the type of overlap (str).
+               Returns (0, 'No Overlap') if there's no match.
+    """
+    prospect_set = set(prospect_codes)
+    partner_set = set(partner_codes)
+
+    # Find the intersection of codes
+    overlap = prospect_set.intersection(partner_set)
+
+    if not overlap:
+        return 0, "No Overlap"
+
+    base_score = 0
+    overlap_type = "Unknown"
+
+    # Determine the highest-value match type based on weights
+    # This logic prioritizes the highest value match if multiple exist
+    is_vertical = any(code.startswith('V_') for code in overlap)
+    is_functional = any(code.startswith('F_') for code in overlap)
+    is_horizontal = any(code.startswith('X_') for code in overlap)
+    is_regulated = any(code in REGULATED_SET for code in overlap)
+
+    if is_vertical:
+        base_score = SPECIAL_VERTICAL_WEIGHT if is_regulated else VERTICAL_WEIGHT
+        overlap_type = 'VERTICAL'
+    elif is_functional:
+        base_score = FUNCTIONAL_WEIGHT
+        overlap_type = 'FUNCTIONAL'
+    elif is_horizontal:
+        base_score = HORIZONTAL_WEIGHT
+        overlap_type = 'HORIZONTAL'
+
+    # --- Apply Score Boosts ---
+    final_score = base_score
+
+    # Boost based on partner's Evaluation Score
+    try:
+        eval_score = float(partner_row.get('Evaluation Score', 0))
+        if eval_score > 0:
+            final_score *= (1 + (eval_score * EVALUATION_SCORE_BOOST))
+    except (ValueError, TypeError):
+        pass # Ignore if the score is not a valid number
+
+    # Boost based on Average Leads Per Day
+    try:
+        avg_leads = float(partner_row.get('Avg Leads Per Day', 0))
+        if avg_leads > LEAD_VOLUME_THRESHOLD:
+            final_score *= (1 + LEAD_VOLUME_BOOST)
+    except (ValueError, TypeError):
+        pass # Ignore if leads are not a valid number
+
+    return final_score, overlap_type
+
+def extract_codes(audience_codes_str):
+    """
+    Parses an audience_codes JSON cell into a list of codes.
+
+    Codes are kept as written, including ones outside the taxonomy (such as
+    V_ verticals), so scores match calculate_match_score on the raw cells;
+    an unparsable cell yields an empty list.
+    """
+    try:
+        return codes_from_result(json.loads(audience_codes_str or '{}'))
+    except (json.JSONDecodeError, TypeError):
+        return []
+
+def as_float(value):
+    """
+    Parses a numeric CSV cell, returning NaN for empty or invalid values.
+    """
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return float('nan')
+
+def boost_factors(eval_score, avg_leads):
+    """
+    Returns the (evaluation, lead volume) multipliers for parsed boost values, or None where no boost applies.
+
+    NaN (a missing or invalid value) never earns a boost.
+    """
+    eval_factor = 1 + (eval_score * EVALUATION_SCORE_BOOST) if eval_score > 0 else None
+    lead_factor = 1 + LEAD_VOLUME_BOOST if avg_leads > LEAD_VOLUME_THRESHOLD else None
+    return eval_factor, lead_factor
+
+def partner_boosts(partner_row):
+    """
+    Returns the (evaluation, lead volume) multipliers for a partner, or None where no boost applies.
+
+    The factors are applied one after the other, exactly as in calculate_match_score.
+    """
+    return boost_factors(as_float(partner_row.get('Evaluation Score', 0)),
+                         as_float(partner_row.get('Avg Leads Per Day', 0)))
+
+
+class MatchEngine:
+    """
+    Indexed replacement for scoring every prospect against every partner.
+
+    Partner codes are parsed and encoded as integer bitsets once, boosts are
+    computed once per partner, and an inverted index from code to partners
+    restricts scoring to partners that share at least one code with the
+    prospect. Prospects with the same code set share one scoring pass.
+    Scores are identical to calculate_match_score.
+    """
+
+    # Maximum number of distinct prospect code sets whose matches are memoized
+    MEMO_LIMIT = 4096
+
+    def __init__(self, partners, partner_codes, taxonomy=None):
+        self.partners = partners
+        self._memo = {}
+        self._top_memo = {}
+        self.bits = {}
+        if taxonomy is not None:
+            for code in taxonomy.codes:
+                self._bit(code)
+        self.masks = [self.encode(codes, grow=True) for codes in partner_codes]
+        self.boosts = [partner_boosts(partner) for partner in partners]
+        self._build_index()
+
+    @classmethod
+    def from_masks(cls, partners, masks, code_order, boosts):
+        """
+        Builds an engine from partner bitsets already encoded against code_order.
+
+        Used with precomputed inputs (see src.codes_file), so no audience_codes
+        cell has to be parsed; boosts are (evaluation, lead volume) factor pairs.
+        """
+        engine = cls.__new__(cls)
+        engine.partners = partners
+        engine._memo = {}
+        engine._top_memo = {}
+        engine.bits = {code: 1 << i for i, code in enumerate(code_order)}
+        engine.masks = list(masks)
+        engine.boosts = list(boosts)
+        engine._build_index()
+        return engine
+
+    def _build_index(self):
+        self.index = {}
+        for j, mask in enumerate(self.masks):
+            for code in self.decode(mask):
+                self.index.setdefault(code, []).append(j)
+
+        self.vertical_mask = self._class_mask(lambda code: code.startswith('V_'))
+        self.functional_mask = self._class_mask(lambda code: code.startswith('F_'))
+        self.horizontal_mask = self._class_mask(lambda code: code.startswith('X_'))
+        self.regulated_mask = self._class_mask(lambda code: code in REGULATED_SET)
+
+    def _bit(self, code):
+        bit = self.bits.get(code)
+        if bit is None:
+            bit = 1 << len(self.bits)
+            self.bits[code] = bit
+        return bit
+
+    def _class_mask(self, predicate):
+        mask = 0
+        for code, bit in self.bits.items():
+            if predicate(code):
+                mask |= bit
+        return mask
+
+    def encode(self, codes, grow=False):
+        """
+        Encodes a list of codes as a bitset. Unknown codes are ignored unless grow is set.
+        """
+        mask = 0
+        for code in codes:
+            bit = self._bit(code) if grow else self.bits.get(code)
+            if bit:
+                mask |= bit
+        return mask
+
+    def decode(self, mask):
+        """
+        Returns the codes of a bitset made by encode(), in bit order.
+        """
+        return [code for code, bit in self.bits.items() if mask & bit]
+
+    def candidates(self, prospect_codes):
+        """
+        Returns the indices of partners sharing at least one code, in partner order.
+        """
+        found = set()
+        for code in set(prospect_codes):
+            found.update(self.index.get(code, ()))
+        return sorted(found)
+
+    def base_score(self, overlap):
+        """
+        Returns (base score, overlap type) for an overlap bitset.
+        """
+        if overlap & self.vertical_mask:
+            if overlap & self.regulated_mask:
+                return SPECIAL_VERTICAL_WEIGHT, 'VERTICAL'
+            return VERTICAL_WEIGHT, 'VERTICAL'
+        if overlap & self.functional_mask:
+            return FUNCTIONAL_WEIGHT, 'FUNCTIONAL'
+        if overlap & self.horizontal_mask:
+            return HORIZONTAL_WEIGHT, 'HORIZONTAL'
+        return 0, 'Unknown'
+
+    def score(self, prospect_mask, j):
+        """
+        Scores a prospect bitset against partner j; same result as calculate_match_score.
+        """
+        overlap = prospect_mask & self.masks[j]
+        if not overlap:
+            return 0, "No Overlap"
+        final_score, overlap_type = self.base_score(overlap)
+        eval_factor, lead_factor = self.boosts[j]
+        if eval_factor is not None:
+            final_score *= eval_factor
+        if lead_factor is not None:
+            final_score *= lead_factor
+        return final_score, overlap_type
+
+    def _iter_matches(self, prospect_codes, prospect_mask):
+        for j in self.candidates(prospect_codes):
+            score, overlap_type = self.score(prospect_mask, j)
+            if score > 0:
+                yield j, score, overlap_type
+
+    def match(self, prospect_codes):
+        """
+        Returns [(partner index, score, overlap type)] for every partner with a positive score.
+        """
+        return self.match_mask(self.encode(prospect_codes))
+
+    def match_mask(self, prospect_mask):
+        """
+        Like match(), for a prospect bitset encoded with this engine's bits.
+        """
+        matches = self._memo.get(prospect_mask)
+        if matches is None:
+            matches = list(self._iter_matches(self.decode(prospect_mask), prospect_mask))
+            if len(self._memo) < self.MEMO_LIMIT:
+                self._memo[prospect_mask] = matches
+        return matches
+
+    def top_k(self, prospect_codes, k):
+        """
+        Returns the k best matches, highest score first, keeping only k candidates in memory.
+
+        Ties keep partner order, as a stable sort of match() would.
+        """
+        prospect_mask = self.encode(prospect_codes)
+        key = (prospect_mask, k)
+        top = self._top_memo.get(key)
+        if top is None:
+            top = heapq.nlargest(k, self._iter_matches(prospect_codes, prospect_mask),
+                                 key=lambda match: match[1])
+            if len(self._top_memo) < self.MEMO_LIMIT:
+                self._top_memo[key] = top
+        return top
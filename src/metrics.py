@@ -0,0 +1,160 @@
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds (seconds) of the latency histogram buckets; the last bucket is open-ended
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _metric_name(name, labels):
+    """
+    Formats a metric name with its labels, e.g. llm.latency_seconds{model=gemini-1.5-flash}.
+    """
+    if not labels:
+        return name
+    return name + '{' + ','.join(f"{k}={v}" for k, v in sorted(labels.items())) + '}'
+
+
+class Histogram:
+    """
+    Bucketed distribution with count, sum, min and max.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def quantile(self, q):
+        """
+        Returns the upper bound of the bucket holding the q-th quantile (None past the last bound).
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (None,), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound if bound is not None else self.max
+        return self.max
+
+    def summary(self):
+        labels = [f"<={bound}" for bound in self.buckets] + [f">{self.buckets[-1]}"]
+        return {
+            'count': self.count,
+            'sum': round(self.total, 6),
+            'mean': round(self.total / self.count, 6) if self.count else None,
+            'min': round(self.min, 6) if self.min is not None else None,
+            'max': round(self.max, 6) if self.max is not None else None,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'buckets': dict(zip(labels, self.counts)),
+        }
+
+
+class Metrics:
+    """
+    Thread-safe registry of counters and histograms for one run.
+
+    Counters and histograms are identified by a name plus optional labels
+    (e.g. model='gemini-2.0-flash'). snapshot() returns everything as a
+    plain dictionary with sorted keys, so run summaries can be diffed.
+    """
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def inc(self, name, amount=1, **labels):
+        key = _metric_name(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        key = _metric_name(name, labels)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """
+        Observes the duration of the with-block in seconds.
+        """
+        began = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(name, time.monotonic() - began, **labels)
+
+    def counter(self, name, **labels):
+        return self.counters.get(_metric_name(name, labels), 0)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'counters': dict(sorted(self.counters.items())),
+                'histograms': {key: self.histograms[key].summary() for key in sorted(self.histograms)},
+            }
+
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+def get_metrics():
+    """
+    Returns the process-wide Metrics registry.
+    """
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = Metrics()
+        return _metrics
+
+def set_metrics(metrics):
+    """
+    Replaces the process-wide Metrics registry (e.g. with a fresh one per run or test).
+    """
+    global _metrics
+    with _metrics_lock:
+        _metrics = metrics
+
+
+def write_run_summary(path, **sections):
+    """
+    Writes a JSON run summary: the metrics snapshot plus any extra sections.
+
+    Keys are sorted and the file is replaced atomically, so summaries of
+    successive runs can be compared with a plain diff.
+    """
+    metrics = get_metrics()
+    summary = dict(sections)
+    summary['seconds'] = round(time.monotonic() - metrics.started, 3)
+    summary['metrics'] = metrics.snapshot()
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2, sort_keys=True, ensure_ascii=False, default=str)
+        f.write('\n')
+    os.replace(tmp_path, path)
+    return summary
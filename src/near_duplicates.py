@@ -0,0 +1,139 @@
+import random
+import re
+import threading
+import zlib
+
+# Default Jaccard similarity above which two descriptions share one classification
+DEFAULT_THRESHOLD = 0.9
+
+# MinHash signature length and character shingle size
+DEFAULT_NUM_PERM = 64
+DEFAULT_SHINGLE_SIZE = 5
+
+_PRIME = (1 << 61) - 1
+_NON_WORD = re.compile(r'[\W_]+', re.UNICODE)
+
+
+def normalize_description(text, name=None):
+    """
+    Lower-cases text, drops punctuation and collapses whitespace.
+
+    If name (e.g. the company name) is given, it is removed as well, so
+    templated blurbs that differ only in the company compare as equal.
+    """
+    text = _NON_WORD.sub(' ', (text or '').lower())
+    if name:
+        normalized_name = _NON_WORD.sub(' ', name.lower()).strip()
+        if normalized_name:
+            text = re.sub(r'\b' + re.escape(normalized_name) + r'\b', ' ', text)
+    return ' '.join(text.split())
+
+
+def shingles(text, size=DEFAULT_SHINGLE_SIZE):
+    """
+    Returns the set of hashed character shingles of a normalized text.
+    """
+    if len(text) <= size:
+        return {zlib.crc32(text.encode('utf-8'))}
+    return {zlib.crc32(text[i:i + size].encode('utf-8')) for i in range(len(text) - size + 1)}
+
+
+def jaccard(a, b):
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def choose_bands(num_perm, threshold):
+    """
+    Picks (bands, rows) for LSH so that pairs at the threshold are almost always candidates.
+
+    The LSH S-curve crosses 50% near (1/bands) ** (1/rows); rows is the
+    largest divisor of num_perm that puts that point at least 0.1 below the
+    threshold. Candidates are verified with the exact Jaccard similarity.
+    """
+    best = (num_perm, 1)
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        if (1 / bands) ** (1 / rows) <= threshold - 0.1:
+            best = (bands, rows)
+    return best
+
+
+class NearDuplicateIndex:
+    """
+    MinHash/LSH index of classified descriptions.
+
+    match() finds a previously added description whose shingle Jaccard
+    similarity is at least threshold; classify_many then reuses that
+    description's result instead of calling the LLM. Every reuse is recorded
+    in provenance as (description, representative, similarity).
+    """
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD, num_perm=DEFAULT_NUM_PERM,
+                 shingle_size=DEFAULT_SHINGLE_SIZE, seed=1):
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        rng = random.Random(seed)
+        self._perms = [(rng.randrange(1, _PRIME), rng.randrange(0, _PRIME)) for _ in range(num_perm)]
+        self.bands, self.rows = choose_bands(num_perm, threshold)
+        self._buckets = [{} for _ in range(self.bands)]
+        self._shingles = {}
+        self._results = {}
+        self.provenance = []
+        self._lock = threading.Lock()
+
+    def _signature(self, hashes):
+        return [min((a * h + b) % _PRIME for h in hashes) for a, b in self._perms]
+
+    def _band_keys(self, signature):
+        return [tuple(signature[i * self.rows:(i + 1) * self.rows]) for i in range(self.bands)]
+
+    def _prepare(self, description, name):
+        hashes = shingles(normalize_description(description, name), self.shingle_size)
+        return hashes, self._band_keys(self._signature(hashes))
+
+    def match(self, description, name=None):
+        """
+        Returns (representative, similarity) for the most similar indexed description, or None.
+        """
+        hashes, band_keys = self._prepare(description, name)
+        with self._lock:
+            candidates = set()
+            for bucket, band_key in zip(self._buckets, band_keys):
+                candidates.update(bucket.get(band_key, ()))
+            best = None
+            for candidate in candidates:
+                similarity = jaccard(hashes, self._shingles[candidate])
+                if similarity >= self.threshold and (best is None or similarity > best[1]):
+                    best = (candidate, similarity)
+            return best
+
+    def add(self, description, name=None):
+        """
+        Indexes a description as the representative of its cluster.
+        """
+        hashes, band_keys = self._prepare(description, name)
+        with self._lock:
+            if description in self._shingles:
+                return
+            self._shingles[description] = hashes
+            for bucket, band_key in zip(self._buckets, band_keys):
+                bucket.setdefault(band_key, []).append(description)
+
+    def set_result(self, description, result):
+        with self._lock:
+            self._results[description] = result
+
+    def result(self, description):
+        with self._lock:
+            return self._results.get(description)
+
+    def record(self, description, representative, similarity):
+        with self._lock:
+            self.provenance.append((description, representative, similarity))
+
+    def __len__(self):
+        return len(self._shingles)
@@ -0,0 +1,256 @@
+import queue
+import threading
+import time
+
+# Sentinel passed down a stage's queue once all items have been fed
+_DONE = object()
+
+
+class StageFailure:
+    """
+    Placeholder result for an item whose stage function raised.
+
+    Later stages pass it through untouched and the pipeline yields it in the
+    item's place, so one bad row does not stop the run.
+    """
+
+    def __init__(self, stage, error):
+        self.stage = stage
+        self.error = error
+
+    def __repr__(self):
+        return f"StageFailure({self.stage!r}, {self.error!r})"
+
+
+class Stage:
+    """
+    One step of a Pipeline: fn runs on `workers` threads fed by a queue of queue_size items.
+
+    With batch_size > 1, a worker takes up to batch_size queued items at once
+    and fn receives (and must return) a list.
+    """
+
+    def __init__(self, name, fn, workers=1, queue_size=None, batch_size=1):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+        self.queue_size = queue_size or self.workers * 2
+        self.batch_size = max(1, batch_size)
+
+        self.processed = 0
+        self.failures = 0
+        self.busy_seconds = 0.0
+        self.started = None
+        self.finished = None
+        self.max_queue_depth = 0
+        self._depth_total = 0
+        self._depth_samples = 0
+        self._lock = threading.Lock()
+
+    def _sample_depth(self, depth):
+        with self._lock:
+            self.max_queue_depth = max(self.max_queue_depth, depth)
+            self._depth_total += depth
+            self._depth_samples += 1
+
+    def _record(self, count, failures, seconds):
+        with self._lock:
+            now = time.monotonic()
+            if self.started is None:
+                self.started = now - seconds
+            self.finished = now
+            self.processed += count
+            self.failures += failures
+            self.busy_seconds += seconds
+
+    def summary(self):
+        """
+        Returns throughput and queue-depth figures for this stage.
+        """
+        elapsed = (self.finished - self.started) if self.started is not None else 0.0
+        return {
+            'stage': self.name,
+            'workers': self.workers,
+            'processed': self.processed,
+            'failures': self.failures,
+            'busy_seconds': round(self.busy_seconds, 3),
+            'items_per_second': round(self.processed / elapsed, 3) if elapsed > 0 else None,
+            'max_queue_depth': self.max_queue_depth,
+            'mean_queue_depth': round(self._depth_total / self._depth_samples, 2)
+                                if self._depth_samples else 0.0,
+        }
+
+    def report(self):
+        s = self.summary()
+        return (
+            f"{s['stage']}: {s['processed']} items ({s['failures']} failed) on {s['workers']} workers, "
+            f"{s['items_per_second']} items/s, busy {s['busy_seconds']}s, "
+            f"queue depth max {s['max_queue_depth']} / mean {s['mean_queue_depth']}"
+        )
+
+
+class Pipeline:
+    """
+    Streams items through stages connected by bounded queues.
+
+    Every stage runs concurrently with the others, so total time approaches
+    that of the slowest stage. Bounded queues give backpressure, at most
+    max_in_flight items are inside the pipeline at once, and results are
+    yielded in input order.
+    """
+
+    def __init__(self, stages, max_in_flight=None):
+        self.stages = stages
+        self.max_in_flight = max_in_flight or sum(s.queue_size + s.workers * s.batch_size
+                                                  for s in stages)
+        self.seconds = 0.0
+
+    def run(self, items):
+        """
+        Yields the final result for each item, in input order.
+
+        If iterating items raises, the items fed so far are still yielded and
+        the exception is raised afterwards.
+        """
+        queues = [queue.Queue(maxsize=stage.queue_size) for stage in self.stages]
+        output = queue.Queue()
+        slots = threading.BoundedSemaphore(self.max_in_flight)
+        stop = threading.Event()
+        started = time.monotonic()
+
+        def put(q, value):
+            while not stop.is_set():
+                try:
+                    q.put(value, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+
+        # An exception raised by the items iterator, re-raised by the consumer
+        feed_error = []
+
+        def feed():
+            try:
+                for seq, item in enumerate(items):
+                    while not slots.acquire(timeout=0.1):
+                        if stop.is_set():
+                            return
+                    put(queues[0], (seq, item))
+            except Exception as e:
+                feed_error.append(e)
+            finally:
+                # Always shut the stages down, or the consumer waits forever
+                for _ in range(self.stages[0].workers):
+                    put(queues[0], _DONE)
+
+        remaining = [stage.workers for stage in self.stages]
+        remaining_lock = threading.Lock()
+
+        def work(index):
+            stage = self.stages[index]
+            inbox = queues[index]
+            is_last = index == len(self.stages) - 1
+            outbox = output if is_last else queues[index + 1]
+            finished = False
+            while not finished and not stop.is_set():
+                try:
+                    first = inbox.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                stage._sample_depth(inbox.qsize())
+                if first is _DONE:
+                    break
+                batch = [first]
+                while len(batch) < stage.batch_size:
+                    try:
+                        nxt = inbox.get_nowait()
+                    except queue.Empty:
+                        break
+                    if nxt is _DONE:
+                        finished = True
+                        break
+                    batch.append(nxt)
+
+                for seq, value in self._apply(stage, batch):
+                    if is_last:
+                        output.put((seq, value))
+                    else:
+                        put(outbox, (seq, value))
+
+            with remaining_lock:
+                remaining[index] -= 1
+                last_worker = remaining[index] == 0
+            # Each worker consumes exactly one sentinel; the last one to
+            # finish shuts down the next stage
+            if last_worker:
+                if is_last:
+                    output.put(_DONE)
+                else:
+                    for _ in range(self.stages[index + 1].workers):
+                        put(outbox, _DONE)
+
+        threads = [threading.Thread(target=feed, daemon=True)]
+        for index, stage in enumerate(self.stages):
+            threads += [threading.Thread(target=work, args=(index,), daemon=True)
+                        for _ in range(stage.workers)]
+        for thread in threads:
+            thread.start()
+
+        pending = {}
+        next_seq = 0
+        try:
+            while True:
+                message = output.get()
+                if message is _DONE:
+                    if feed_error:
+                        raise feed_error[0]
+                    break
+                seq, value = message
+                pending[seq] = value
+                while next_seq in pending:
+                    yield pending.pop(next_seq)
+                    next_seq += 1
+                    slots.release()
+        finally:
+            stop.set()
+            self.seconds = time.monotonic() - started
+
+    def _apply(self, stage, batch):
+        """
+        Runs the stage function on a batch of (seq, value) pairs, isolating failures.
+        """
+        runnable = [(seq, value) for seq, value in batch if not isinstance(value, StageFailure)]
+        results = [(seq, value) for seq, value in batch if isinstance(value, StageFailure)]
+        if not runnable:
+            return results
+
+        began = time.monotonic()
+        failures = 0
+        try:
+            if stage.batch_size > 1:
+                outputs = list(stage.fn([value for _, value in runnable]))
+                if len(outputs) != len(runnable):
+                    raise ValueError(f"batch of {len(runnable)} items returned {len(outputs)} results")
+                results += [(seq, out) for (seq, _), out in zip(runnable, outputs)]
+            else:
+                for seq, value in runnable:
+                    try:
+                        results.append((seq, stage.fn(value)))
+                    except Exception as e:
+                        failures += 1
+                        results.append((seq, StageFailure(stage.name, e)))
+        except Exception as e:
+            failures += len(runnable)
+            results += [(seq, StageFailure(stage.name, e)) for seq, _ in runnable]
+        stage._record(len(runnable), failures, time.monotonic() - began)
+        return results
+
+    def report(self):
+        """
+        Returns one line per stage plus the total wall-clock time.
+        """
+        lines = [stage.report() for stage in self.stages]
+        busiest = max((stage.busy_seconds / stage.workers for stage in self.stages), default=0.0)
+        lines.append(f"pipeline: {self.seconds:.3f}s wall clock "
+                     f"(slowest stage {busiest:.3f}s of work per worker)")
+        return "\n".join(lines)
@@ -0,0 +1,181 @@
+import json
+import logging
+import os
+import threading
+
+from src.taxonomy import PROJECT_ROOT, get_taxonomy
+
+logger = logging.getLogger(__name__)
+
+# Default keyword -> code table for the rule-based fast path
+RULES_FILE = os.path.join(PROJECT_ROOT, 'prefilter_rules.json')
+
+# Share of fast-path rows that are also sent to the LLM to measure agreement
+DEFAULT_AUDIT_RATE = 0.1
+
+
+class RuleClassifier:
+    """
+    Deterministic pre-classifier that maps structured CSV columns onto taxonomy codes.
+
+    Each rule lists keywords for one code. A rule scores the weight of every
+    configured column in which one of its keywords appears (case-insensitive
+    substring match). A row is classified only when the best code matched in
+    at least min_columns columns, reaches min_score and leads the runner-up
+    by at least min_margin; everything else is left to the LLM.
+    """
+
+    def __init__(self, rules, columns, min_score=3.0, min_margin=1.0, min_columns=2,
+                 secondary_min_score=1.0, max_secondary=3, taxonomy=None):
+        taxonomy = taxonomy if taxonomy is not None else get_taxonomy()
+        self.rules = []
+        for rule in rules:
+            if rule['code'] not in taxonomy:
+                logger.warning("Prefilter rule code %s is not in the taxonomy; ignoring it.", rule['code'])
+                continue
+            self.rules.append((rule['code'], [k.lower() for k in rule['keywords']]))
+        self.columns = dict(columns)
+        self.min_score = min_score
+        self.min_margin = min_margin
+        self.min_columns = min_columns
+        self.secondary_min_score = secondary_min_score
+        self.max_secondary = max_secondary
+
+    def score(self, row):
+        """
+        Returns [(code, score, matches)] sorted by descending score.
+
+        matches lists (column, keyword) pairs that contributed to the score.
+        """
+        scores = {}
+        for column, weight in self.columns.items():
+            text = (row.get(column) or '').lower()
+            if not text:
+                continue
+            for code, keywords in self.rules:
+                keyword = next((k for k in keywords if k in text), None)
+                if keyword is None:
+                    continue
+                total, matches = scores.get(code, (0.0, []))
+                scores[code] = (total + weight, matches + [(column, keyword)])
+        ranked = [(code, total, matches) for code, (total, matches) in scores.items()]
+        ranked.sort(key=lambda item: -item[1])
+        return ranked
+
+    def classify(self, row):
+        """
+        Returns a classification dict for a confident row, or None if the LLM should decide.
+        """
+        ranked = self.score(row)
+        if not ranked:
+            return None
+        code, best, matches = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+        if best < self.min_score or best - runner_up < self.min_margin:
+            return None
+        if len({column for column, _ in matches}) < self.min_columns:
+            return None
+        secondary = [c for c, s, _ in ranked[1:] if s >= self.secondary_min_score][:self.max_secondary]
+        evidence = ', '.join(f"'{keyword}' in {column}" for column, keyword in matches)
+        return {
+            "primary": code,
+            "secondary": secondary,
+            "explanation": f"Rule-based: matched {evidence}.",
+        }
+
+
+def load_rules(path=RULES_FILE, taxonomy=None, profile=None):
+    """
+    Loads a RuleClassifier from a JSON rules file.
+
+    profile names one of the file's "profiles" (e.g. 'partners' or
+    'prospects'); its columns and thresholds override the top-level ones,
+    as each input CSV has its own columns.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    if profile is not None:
+        if profile not in config.get('profiles', {}):
+            raise ValueError(f"No prefilter profile {profile!r} in {path}")
+        config = dict(config, **config['profiles'][profile])
+    return RuleClassifier(
+        config['rules'],
+        config['columns'],
+        min_score=config.get('min_score', 3.0),
+        min_margin=config.get('min_margin', 1.0),
+        min_columns=config.get('min_columns', 2),
+        secondary_min_score=config.get('secondary_min_score', 1.0),
+        max_secondary=config.get('max_secondary', 3),
+        taxonomy=taxonomy,
+    )
+
+
+class PrefilterStats:
+    """
+    Counts how many rows the fast path answered and how often it agreed with the LLM.
+
+    Every audit_every-th fast-path row is also classified by the LLM; the
+    LLM's answer is the one written out, and its primary code is compared
+    with the rule's.
+    """
+
+    def __init__(self, audit_rate=DEFAULT_AUDIT_RATE):
+        self.audit_every = round(1 / audit_rate) if audit_rate > 0 else 0
+        self.rows = 0
+        self.fast_path = 0
+        self.audit_calls = 0
+        self.audited = 0
+        self.agreed = 0
+        self.disagreements = []
+        self._lock = threading.Lock()
+
+    def admit(self, rule_result):
+        """
+        Counts a row and returns True if its rule result should also be checked by the LLM.
+        """
+        with self._lock:
+            self.rows += 1
+            if rule_result is None:
+                return False
+            self.fast_path += 1
+            audit = bool(self.audit_every) and self.fast_path % self.audit_every == 0
+            self.audit_calls += audit
+            return audit
+
+    def record_audit(self, rule_result, llm_result, label=''):
+        if 'error' in llm_result:
+            return
+        with self._lock:
+            self.audited += 1
+            if llm_result.get('primary') == rule_result['primary']:
+                self.agreed += 1
+            else:
+                self.disagreements.append((label, rule_result['primary'], llm_result.get('primary')))
+
+    def avoided(self):
+        """
+        Rows whose LLM call was skipped (fast-path rows that were not audited).
+        """
+        return self.fast_path - self.audit_calls
+
+    def summary(self):
+        """
+        Returns the fast-path counters and rates as a dictionary.
+        """
+        return {
+            'rows': self.rows,
+            'fast_path': self.fast_path,
+            'llm_calls_avoided': self.avoided(),
+            'avoidance_rate': round(self.avoided() / self.rows, 4) if self.rows else 0.0,
+            'audited': self.audited,
+            'agreement_rate': round(self.agreed / self.audited, 4) if self.audited else None,
+        }
+
+    def report(self):
+        rate = self.avoided() / self.rows if self.rows else 0.0
+        agreement = f"{self.agreed / self.audited:.0%}" if self.audited else "n/a"
+        lines = [f"{self.fast_path} of {self.rows} rows matched a rule, {self.avoided()} LLM calls "
+                 f"avoided ({rate:.0%}); agreement with the LLM on {self.audited} audited rows: {agreement}"]
+        for label, rule_code, llm_code in self.disagreements:
+            lines.append(f"  disagreement {label}: rules {rule_code}, LLM {llm_code}")
+        return "\n".join(lines)
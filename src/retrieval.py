@@ -0,0 +1,186 @@
+import json
+import logging
+import math
+import os
+import re
+from collections import Counter
+
+from src.taxonomy import PROJECT_ROOT, get_taxonomy
+
+logger = logging.getLogger(__name__)
+
+# Keyword map (code -> keywords) and code frequencies used to rank candidate codes
+KEYWORDS_FILE = os.path.join(PROJECT_ROOT, 'taxonomy_keywords.json')
+
+# Codes sent to the LLM per description, besides the fallback codes
+DEFAULT_TOP_N = 12
+
+# Codes every pruned prompt keeps, so the model can still say it does not know
+FALLBACK_CODES = ('UNKNOWN', 'OTHER')
+
+# Tokens are cut to this many characters, a crude stemmer that also folds
+# German compounds and English plurals onto the same term
+STEM_LENGTH = 6
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+_WORD = re.compile(r'[^\W\d_]+', re.UNICODE)
+_STOPWORDS = frozenset("""
+    and are for from has have into its not our that the their them they this with which who will
+    company companies business businesses offer offers provide provides services solutions
+    der die das und für mit von den dem des ein eine einer ist sind auf aus bei wir ihre
+""".split())
+
+
+def tokenize(text):
+    """
+    Lower-cased word stems of text, without stopwords and words shorter than three letters.
+    """
+    return [word[:STEM_LENGTH] for word in _WORD.findall((text or '').lower())
+            if len(word) >= 3 and word not in _STOPWORDS]
+
+
+class CodeRetriever:
+    """
+    BM25 index over the taxonomy that picks the codes most likely to fit a description.
+
+    Each code's document is its label plus its keywords from the keyword
+    map. Codes are ranked by BM25 score against the description, with ties
+    (in particular descriptions that match nothing) broken by how often the
+    code appears in past answers. Everything runs locally.
+    """
+
+    def __init__(self, taxonomy=None, keywords=None, frequencies=None, top_n=DEFAULT_TOP_N):
+        self.taxonomy = taxonomy if taxonomy is not None else get_taxonomy()
+        self.top_n = top_n
+        keywords = keywords or {}
+        frequencies = frequencies or {}
+        self.fallback = [code for code in FALLBACK_CODES if code in self.taxonomy]
+        self.codes = [code for code in self.taxonomy.codes if code not in self.fallback]
+        self.priors = {code: frequencies.get(code, 0) for code in self.codes}
+
+        documents = {code: Counter(tokenize(self.taxonomy.codes[code])
+                                   + tokenize(' '.join(keywords.get(code, []))))
+                     for code in self.codes}
+        average_length = sum(sum(doc.values()) for doc in documents.values()) / max(1, len(documents))
+        document_frequency = Counter(term for doc in documents.values() for term in doc)
+        self.postings = {}
+        for code, doc in documents.items():
+            norm = K1 * (1 - B + B * sum(doc.values()) / (average_length or 1))
+            for term, tf in doc.items():
+                df = document_frequency[term]
+                idf = math.log(1 + (len(documents) - df + 0.5) / (df + 0.5))
+                self.postings.setdefault(term, []).append((code, idf * tf * (K1 + 1) / (tf + norm)))
+
+    def scores(self, description):
+        """
+        Returns {code: BM25 score} for the codes sharing a term with description.
+        """
+        scores = Counter()
+        for term in set(tokenize(description)):
+            for code, weight in self.postings.get(term, ()):
+                scores[code] += weight
+        return scores
+
+    def rank(self, description):
+        """
+        Returns every code except the fallback codes, most likely first.
+        """
+        scores = self.scores(description)
+        return sorted(self.codes, key=lambda code: (-scores.get(code, 0.0), -self.priors[code]))
+
+    def candidates(self, description, top_n=None):
+        """
+        Returns the top_n most likely codes for description plus the fallback codes.
+        """
+        top_n = self.top_n if top_n is None else top_n
+        return self.rank(description)[:top_n] + self.fallback
+
+    def prune(self, descriptions):
+        """
+        Returns the taxonomy restricted to the candidate codes of one or more descriptions.
+        """
+        if isinstance(descriptions, str):
+            descriptions = [descriptions]
+        codes = set()
+        for description in descriptions:
+            codes.update(self.candidates(description))
+        return self.taxonomy.subset(codes)
+
+
+def load_retriever(path=KEYWORDS_FILE, taxonomy=None, top_n=DEFAULT_TOP_N):
+    """
+    Builds a CodeRetriever from a keyword map file; a missing file means labels only.
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    except FileNotFoundError:
+        logger.warning("Keyword map %s not found; retrieving on code labels only.", path)
+        config = {}
+    return CodeRetriever(taxonomy, config.get('keywords'), config.get('frequencies'), top_n=top_n)
+
+
+def learn_keywords(labelled, taxonomy=None, per_code=15, min_count=2):
+    """
+    Learns a keyword map and code frequencies from (description, codes) pairs.
+
+    A term becomes a keyword of a code if it appears in at least min_count
+    of the code's descriptions; the per_code terms that are most specific
+    to the code (share of its descriptions times inverse document
+    frequency) are kept. Returns (keywords, frequencies), keywords holding
+    stems as produced by tokenize.
+    """
+    taxonomy = taxonomy if taxonomy is not None else get_taxonomy()
+    labelled = list(labelled)
+    document_frequency = Counter()
+    code_terms = {}
+    frequencies = Counter()
+    for description, codes in labelled:
+        terms = set(tokenize(description))
+        document_frequency.update(terms)
+        for code in taxonomy.valid_codes(codes):
+            frequencies[code] += 1
+            code_terms.setdefault(code, Counter()).update(terms)
+
+    keywords = {}
+    for code, terms in code_terms.items():
+        if code in FALLBACK_CODES:
+            continue
+        ranked = sorted(
+            ((count / frequencies[code] * math.log(len(labelled) / document_frequency[term]), term)
+             for term, count in terms.items() if count >= min_count),
+            key=lambda item: (-item[0], item[1]))
+        learned = [term for weight, term in ranked[:per_code] if weight > 0]
+        if learned:
+            keywords[code] = learned
+    return keywords, dict(frequencies)
+
+
+def recall_at(retriever, labelled, sizes):
+    """
+    Measures how often the retrieved candidates contain the codes of known answers.
+
+    labelled holds (description, primary, codes) triples, e.g. descriptions
+    with cached LLM answers. Returns one dict per size in sizes with the
+    share of primary codes found ('primary_recall') and the share of all
+    answer codes found ('code_recall'); fallback codes count as found.
+    """
+    labelled = list(labelled)
+    ranked = [(retriever.rank(description), primary, codes) for description, primary, codes in labelled]
+    results = []
+    for size in sizes:
+        primary_hits = code_hits = code_total = 0
+        for ranking, primary, codes in ranked:
+            found = set(ranking[:size]) | set(retriever.fallback)
+            primary_hits += primary in found
+            code_hits += sum(code in found for code in codes)
+            code_total += len(codes)
+        results.append({
+            'top_n': size,
+            'primary_recall': round(primary_hits / len(ranked), 4) if ranked else 0.0,
+            'code_recall': round(code_hits / code_total, 4) if code_total else 0.0,
+        })
+    return results
@@ -0,0 +1,214 @@
+import logging
+import os
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Default client-side limits for Gemini calls; override with environment variables
+DEFAULT_REQUESTS_PER_MINUTE = int(os.getenv("GEMINI_REQUESTS_PER_MINUTE", "1000"))
+DEFAULT_TOKENS_PER_MINUTE = int(os.getenv("GEMINI_TOKENS_PER_MINUTE", "1000000"))
+
+# HTTP status codes that indicate a transient failure worth retrying
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+# Exception class names (from google.api_core and requests) that are transient
+RETRYABLE_EXCEPTION_NAMES = {
+    'ResourceExhausted', 'TooManyRequests', 'ServiceUnavailable', 'InternalServerError',
+    'DeadlineExceeded', 'GatewayTimeout', 'BadGateway', 'Aborted',
+    'ConnectionError', 'Timeout', 'ReadTimeout', 'ConnectTimeout',
+}
+
+
+def estimate_tokens(text):
+    """
+    Rough token estimate for a prompt (about four characters per token).
+    """
+    return max(1, len(text) // 4)
+
+
+def is_retryable(exc):
+    """
+    Returns True if the exception looks like a rate limit or a transient server error.
+    """
+    code = getattr(exc, 'code', None)
+    if code is None:
+        code = getattr(exc, 'status_code', None)
+    try:
+        if int(code) in RETRYABLE_STATUS_CODES:
+            return True
+    except (TypeError, ValueError):
+        pass
+    return any(cls.__name__ in RETRYABLE_EXCEPTION_NAMES for cls in type(exc).__mro__)
+
+
+class TokenBucket:
+    """
+    Token bucket that refills at rate_per_minute, holding at most capacity tokens.
+    """
+
+    def __init__(self, rate_per_minute, capacity=None, clock=time.monotonic):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.tokens = self.capacity
+        self.clock = clock
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        """
+        Returns how long to wait before amount tokens are available (0 if they are now).
+        """
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount):
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+
+
+class CircuitBreaker:
+    """
+    Pauses all calls for cooldown seconds after failure_threshold consecutive failures.
+
+    After the pause, a single further failure re-opens the breaker straight away.
+    """
+
+    def __init__(self, failure_threshold=5, cooldown=60.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.clock = clock
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+
+    def remaining(self):
+        """
+        Returns the seconds left before calls may resume.
+        """
+        return max(0.0, self.open_until - self.clock())
+
+    def record_success(self):
+        self.consecutive_failures = 0
+
+    def record_failure(self):
+        """
+        Records a failure. Returns True if this failure opened the breaker.
+        """
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= self.failure_threshold and self.remaining() == 0:
+            self.open_until = self.clock() + self.cooldown
+            return True
+        return False
+
+
+class RequestScheduler:
+    """
+    Shared scheduler for LLM requests: rate limits, retries with backoff and a circuit breaker.
+    """
+
+    def __init__(self, requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE,
+                 tokens_per_minute=DEFAULT_TOKENS_PER_MINUTE, max_retries=5,
+                 base_delay=1.0, max_delay=60.0, failure_threshold=5, cooldown=60.0,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.request_bucket = TokenBucket(requests_per_minute, clock=clock)
+        self.token_bucket = TokenBucket(tokens_per_minute, clock=clock)
+        self.breaker = CircuitBreaker(failure_threshold, cooldown, clock=clock)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.sleep = sleep
+        self._lock = threading.Lock()
+        self.metrics = {
+            'requests': 0,
+            'retries': 0,
+            'failures': 0,
+            'circuit_opens': 0,
+            'throttle_seconds': 0.0,
+        }
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self.metrics[name] += amount
+
+    def _acquire(self, estimated_tokens):
+        """
+        Blocks until the circuit is closed and both rate limits admit the request.
+        """
+        while True:
+            with self._lock:
+                wait = max(
+                    self.breaker.remaining(),
+                    self.request_bucket.wait_time(1),
+                    self.token_bucket.wait_time(estimated_tokens),
+                )
+                if wait <= 0:
+                    self.request_bucket.consume(1)
+                    self.token_bucket.consume(estimated_tokens)
+                    self.metrics['requests'] += 1
+                    return
+                self.metrics['throttle_seconds'] += wait
+            self.sleep(wait)
+
+    def backoff_delay(self, attempt):
+        """
+        Exponential backoff with full jitter for the given retry attempt (starting at 1).
+        """
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+    def call(self, fn, *args, estimated_tokens=1, **kwargs):
+        """
+        Calls fn(*args, **kwargs) under the rate limits, retrying transient errors.
+
+        Non-retryable errors, and the last error once retries are exhausted, are re-raised.
+        """
+        attempt = 0
+        while True:
+            self._acquire(estimated_tokens)
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                with self._lock:
+                    if self.breaker.record_failure():
+                        self.metrics['circuit_opens'] += 1
+                        logger.warning("Circuit breaker open: pausing LLM calls for %.0fs.",
+                                       self.breaker.cooldown)
+                if not is_retryable(e) or attempt >= self.max_retries:
+                    self._count('failures')
+                    raise
+                attempt += 1
+                self._count('retries')
+                self.sleep(self.backoff_delay(attempt))
+                continue
+            with self._lock:
+                self.breaker.record_success()
+            return result
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def get_scheduler():
+    """
+    Returns the process-wide request scheduler shared by all LLM callers.
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RequestScheduler()
+        return _scheduler
+
+def set_scheduler(scheduler):
+    """
+    Replaces the process-wide request scheduler (e.g. with a fast one in tests).
+    """
+    global _scheduler
+    with _scheduler_lock:
+        _scheduler = scheduler
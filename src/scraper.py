@@ -0,0 +1,191 @@
+import logging
+import threading
+import time
+from urllib.parse import urlsplit, urlunsplit
+
+import requests
+from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+
+from src.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = "Mozilla/5.0 (compatible; LLM-Classifier/1.0; prospect enrichment)"
+
+# Defaults for the scraping stage
+DEFAULT_TIMEOUT = 10
+DEFAULT_MAX_BYTES = 2 * 1024 * 1024
+DEFAULT_MAX_WORKERS = 16
+DEFAULT_PER_HOST_LIMIT = 2
+DEFAULT_MAX_REDIRECTS = 5
+
+# Cached pages younger than this are reused without any network request
+DEFAULT_PAGE_TTL = 7 * 24 * 3600
+
+
+def normalize_url(url):
+    """
+    Turns a URL cell into a fetchable URL.
+
+    Bare domains such as 'blipack.ch' or 'www.oxyle.ch' get an https://
+    scheme, the host is lower-cased and surrounding whitespace is removed.
+    Returns None for an empty cell.
+    """
+    if not url:
+        return None
+    url = url.strip()
+    if not url:
+        return None
+    if '://' not in url:
+        url = 'https://' + url.lstrip('/')
+    parts = urlsplit(url)
+    if not parts.netloc:
+        return None
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or '/',
+                       parts.query, ''))
+
+
+def extract_text(content, encoding=None):
+    """
+    Parses HTML bytes and returns the text of the body tag.
+
+    encoding is used when the server declared a charset; otherwise
+    BeautifulSoup detects it from the document (e.g. a <meta charset> tag).
+    """
+    soup = BeautifulSoup(content, 'html.parser', from_encoding=encoding)
+    body = soup.find('body')
+    if body:
+        return body.get_text(separator=' ', strip=True)
+    return ""
+
+
+class Scraper:
+    """
+    Concurrent page fetcher backed by one pooled requests.Session.
+
+    At most per_host_limit requests run against the same host at a time,
+    and responses are cut off after max_bytes. With a page_cache
+    (src.cache.ScrapeCache), pages younger than page_ttl seconds are served
+    from disk and older ones are revalidated with ETag/Last-Modified.
+    """
+
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS, per_host_limit=DEFAULT_PER_HOST_LIMIT,
+                 timeout=DEFAULT_TIMEOUT, max_bytes=DEFAULT_MAX_BYTES,
+                 max_redirects=DEFAULT_MAX_REDIRECTS, user_agent=USER_AGENT,
+                 page_cache=None, page_ttl=DEFAULT_PAGE_TTL):
+        self.max_workers = max_workers
+        self.per_host_limit = per_host_limit
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.page_cache = page_cache
+        self.page_ttl = page_ttl
+        self.stats = {'fetched': 0, 'cache_hits': 0, 'revalidated': 0, 'errors': 0}
+
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = user_agent
+        self.session.max_redirects = max_redirects
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._host_slots = {}
+        self._lock = threading.Lock()
+
+    def _host_slot(self, url):
+        host = urlsplit(url).netloc
+        with self._lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = threading.Semaphore(self.per_host_limit)
+                self._host_slots[host] = slot
+            return slot
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+        get_metrics().inc('scraper.pages', result=name)
+
+    def fetch(self, url):
+        """
+        Fetches a URL and returns (content bytes, declared encoding or None).
+
+        Redirects are followed; the body is truncated at max_bytes.
+        Raises requests.exceptions.RequestException on failure.
+        """
+        cached = self.page_cache.get_page(url) if self.page_cache is not None else None
+        if cached is not None and time.time() - cached['fetched_at'] < self.page_ttl:
+            self._count('cache_hits')
+            return cached['content'], cached['encoding']
+
+        headers = {}
+        if cached is not None:
+            if cached['etag']:
+                headers['If-None-Match'] = cached['etag']
+            if cached['last_modified']:
+                headers['If-Modified-Since'] = cached['last_modified']
+
+        with self._host_slot(url), get_metrics().timer('scraper.fetch_seconds'):
+            with self.session.get(url, timeout=self.timeout, stream=True, headers=headers) as response:
+                if cached is not None and response.status_code == 304:
+                    self.page_cache.touch_page(url)
+                    self._count('revalidated')
+                    return cached['content'], cached['encoding']
+                response.raise_for_status()
+                chunks = []
+                size = 0
+                for chunk in response.iter_content(chunk_size=64 * 1024):
+                    chunks.append(chunk)
+                    size += len(chunk)
+                    if size >= self.max_bytes:
+                        break
+                content = b''.join(chunks)[:self.max_bytes]
+                declared = 'charset' in response.headers.get('Content-Type', '').lower()
+                encoding = response.encoding if declared else None
+                etag = response.headers.get('ETag')
+                last_modified = response.headers.get('Last-Modified')
+
+        self._count('fetched')
+        if self.page_cache is not None:
+            self.page_cache.set_page(url, content, encoding, etag, last_modified)
+        return content, encoding
+
+    def fetch_page(self, url):
+        """
+        Fetches a URL cell and returns (content bytes, encoding), or None if it cannot be fetched.
+        """
+        normalized = normalize_url(url)
+        if normalized is None:
+            return None
+        try:
+            return self.fetch(normalized)
+        except requests.exceptions.RequestException as e:
+            logger.warning("Error scraping %s: %s", normalized, e)
+            self._count('errors')
+            return None
+
+    def scrape(self, url):
+        """
+        Scrapes a URL and returns the body text, or "" if it cannot be fetched.
+        """
+        page = self.fetch_page(url)
+        if page is None:
+            return ""
+        return extract_text(*page)
+
+    def close(self):
+        self.session.close()
+
+
+_scraper = None
+_scraper_lock = threading.Lock()
+
+def get_scraper():
+    """
+    Returns the process-wide Scraper, so every caller shares one connection pool.
+    """
+    global _scraper
+    with _scraper_lock:
+        if _scraper is None:
+            _scraper = Scraper()
+        return _scraper
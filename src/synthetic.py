@@ -0,0 +1,322 @@
+import csv
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src.classifier import PACKED_PROMPT_TEMPLATE, PROMPT_TEMPLATE, REPAIR_PROMPT_TEMPLATE
+from src.taxonomy import get_taxonomy
+
+# Columns of the real prospect export (data/Manuav B-Liste Export.csv)
+PROSPECT_FIELDS = ['Telefonnummer', 'ansprache', 'Titel', 'vorname', 'nachname', 'firma', 'strasse',
+                   'adresszusatz', 'plz', 'ort', 'email', 'url', 'Beschreibung', 'Kategorie']
+
+# Partner columns read by process_partners and the prefilter rules
+PARTNER_FIELDS = ['Company Name', 'Industry', 'Industry Category', 'Products/Services Offered',
+                  'USP (Unique Selling Proposition) / Key Selling Points', 'Customer Target Segments',
+                  'Customer Target Segments Category', 'Business Model', 'Business Model Category',
+                  'Website', 'Evaluation Score', 'Avg Leads Per Day']
+
+# Share of synthetic prospects whose description is a templated copy of an earlier one
+NEAR_DUPLICATE_RATE = 0.05
+
+# (Kategorie, product, customers) triples the synthetic companies are built from;
+# some Kategorie values match prefilter_rules.json, most do not
+COMPANY_PROFILES = [
+    ('Rechtsanwälte / Kanzleisoftware', 'Kanzleisoftware für die Aktenverwaltung', 'Law firms'),
+    ('Steuerberatung', 'Software für die digitale Buchhaltung', 'Tax firms'),
+    ('Medizintechnik', 'smarte Therapiegeräte für die Bewegungstherapie', 'Clinics and rehabilitation centres'),
+    ('Pflegeeinrichtung', 'Dienstplanung für Pflegeheime', 'Care facilities'),
+    ('Logistik / Spedition', 'Tourenplanung und Sendungsverfolgung', 'Freight forwarders'),
+    ('Handwerk', 'Auftragsverwaltung für Handwerksbetriebe', 'Skilled trades'),
+    ('Software / IT', 'eine Cloud-Plattform für das Projektmanagement', 'Mid-sized companies'),
+    ('Maschinenbau', 'Sondermaschinen für die Verpackungsindustrie', 'Manufacturers'),
+    ('E-Commerce', 'einen Onlineshop-Baukasten', 'Online retailers'),
+    ('Personaldienstleistung', 'Recruiting-Software und Bewerbermanagement', 'HR departments'),
+    ('Energie', 'Energiemanagement für Gewerbeimmobilien', 'Utilities and property managers'),
+    ('Marketing / Agentur', 'Kampagnen und Leadgenerierung', 'B2B marketing teams'),
+    ('Finanzdienstleistung', 'Zahlungsabwicklung für Händler', 'Payment providers'),
+    ('Bildung', 'Lernplattformen für Hochschulen', 'Universities'),
+]
+
+LEGAL_FORMS = ['GmbH', 'AG', 'GmbH & Co. KG', 'KG', 'UG']
+NAME_PARTS = ['Nord', 'Alpen', 'Rhein', 'Blau', 'Klar', 'Data', 'Medi', 'Log', 'Werk', 'Smart',
+              'Netz', 'Hanse', 'Sonnen', 'Digital', 'Prime', 'Vita', 'Tech', 'Flow', 'Kraft', 'Linea']
+CITIES = ['Berlin', 'Hamburg', 'München', 'Köln', 'Leipzig', 'Stuttgart', 'Bayreuth', 'Kassel']
+TAGLINES = ['Seit über 20 Jahren Ihr Partner.', 'Made in Germany.', 'Persönlich. Digital. Nah.']
+
+
+def _rng(seed, i):
+    return random.Random(f"{seed}:{i}")
+
+
+def synthetic_company(i, seed=0):
+    """
+    Returns a deterministic fake company (name, domain, description, ...) for index i.
+    """
+    rng = _rng(seed, i)
+    kategorie, product, customers = rng.choice(COMPANY_PROFILES)
+    stem = rng.choice(NAME_PARTS) + rng.choice(NAME_PARTS).lower()
+    name = f"{stem} {i} {rng.choice(LEGAL_FORMS)}"
+    city = rng.choice(CITIES)
+    description = (f"Die {name} aus {city} entwickelt {product}. "
+                   f"Zu den Kunden zählen {customers.lower()} in ganz Deutschland; "
+                   f"das Team umfasst rund {rng.randint(5, 400)} Mitarbeitende.")
+    return {
+        'name': name,
+        'domain': f"{stem.lower()}{i}.example",
+        'city': city,
+        'kategorie': kategorie,
+        'product': product,
+        'customers': customers,
+        'description': description,
+        'tagline': rng.choice(TAGLINES),
+    }
+
+
+def prospect_rows(rows, base_url=None, seed=0):
+    """
+    Yields synthetic prospect rows with the columns of the real prospect export.
+
+    With base_url (see SyntheticSite) every url points at a local synthetic
+    page, otherwise at the company's .example domain. A share
+    (NEAR_DUPLICATE_RATE) of descriptions copies an earlier company's text
+    with only the name changed, as templated blurbs in real exports do.
+    """
+    for i in range(rows):
+        company = synthetic_company(i, seed)
+        rng = _rng(seed, -i - 1)
+        description = company['description']
+        if i and rng.random() < NEAR_DUPLICATE_RATE:
+            original = synthetic_company(rng.randrange(i), seed)
+            description = original['description'].replace(original['name'], company['name'])
+        row = dict.fromkeys(PROSPECT_FIELDS, '')
+        row.update({
+            'firma': company['name'],
+            'ort': company['city'],
+            'url': f"{base_url}/company/{i}" if base_url else f"https://www.{company['domain']}/",
+            'Beschreibung': description,
+            'Kategorie': company['kategorie'],
+        })
+        yield row
+
+
+def partner_rows(rows, seed=0):
+    """
+    Yields synthetic partner rows with the columns process_partners reads.
+    """
+    for i in range(rows):
+        company = synthetic_company(i, seed + 1)
+        rng = _rng(seed + 1, -i - 1)
+        row = dict.fromkeys(PARTNER_FIELDS, '')
+        row.update({
+            'Company Name': company['name'],
+            'Industry': company['kategorie'],
+            'Industry Category': company['kategorie'],
+            'Products/Services Offered': company['product'],
+            'USP (Unique Selling Proposition) / Key Selling Points': company['tagline'],
+            'Customer Target Segments': company['customers'],
+            'Customer Target Segments Category': f"{company['customers']} (B2B)",
+            'Business Model': 'Software subscription' if rng.random() < 0.5 else 'Project-based services',
+            'Website': company['domain'],
+            'Evaluation Score': str(rng.randint(20, 50)),
+            'Avg Leads Per Day': str(rng.randint(1, 8)),
+        })
+        yield row
+
+
+def random_codes(rng, codes):
+    """
+    Returns an audience_codes dict with a random primary and up to three secondary codes.
+    """
+    roll = rng.random()
+    if roll < 0.02:
+        return {"error": "Classification failed: simulated"}
+    if roll < 0.07:
+        return {"primary": "UNKNOWN", "secondary": [], "explanation": "Synthetic."}
+    primary, *secondary = rng.sample(codes, rng.randint(1, 4))
+    return {"primary": primary, "secondary": secondary, "explanation": "Synthetic."}
+
+
+def write_prospects_csv(path, rows, base_url=None, seed=0):
+    """
+    Writes a synthetic prospect export (latin-1, like the real file).
+    """
+    with open(path, 'w', newline='', encoding='latin-1') as f:
+        writer = csv.DictWriter(f, fieldnames=PROSPECT_FIELDS)
+        writer.writeheader()
+        writer.writerows(prospect_rows(rows, base_url, seed))
+
+
+def write_partners_csv(path, rows, seed=0):
+    """
+    Writes a synthetic partner CSV (latin-1, like the real file).
+    """
+    with open(path, 'w', newline='', encoding='latin-1') as f:
+        writer = csv.DictWriter(f, fieldnames=PARTNER_FIELDS)
+        writer.writeheader()
+        writer.writerows(partner_rows(rows, seed))
+
+
+def write_prospects_with_codes(path, rows, seed=0, taxonomy=None):
+    """
+    Writes a synthetic output/prospects_with_codes.csv for run_matching.
+    """
+    taxonomy = taxonomy if taxonomy is not None else get_taxonomy()
+    codes = sorted(code for code in taxonomy.codes if code not in ('UNKNOWN', 'OTHER'))
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=['firma', 'url', 'audience_codes'])
+        writer.writeheader()
+        for row in prospect_rows(rows, seed=seed):
+            rng = _rng(seed, f"codes{row['url']}")
+            writer.writerow({'firma': row['firma'], 'url': row['url'],
+                             'audience_codes': json.dumps(random_codes(rng, codes))})
+
+
+def write_partners_with_codes(path, rows, seed=0, taxonomy=None):
+    """
+    Writes a synthetic output/partners_with_codes.csv for run_matching.
+    """
+    taxonomy = taxonomy if taxonomy is not None else get_taxonomy()
+    codes = sorted(code for code in taxonomy.codes if code not in ('UNKNOWN', 'OTHER'))
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=['Company Name', 'Evaluation Score',
+                                               'Avg Leads Per Day', 'audience_codes'])
+        writer.writeheader()
+        for row in partner_rows(rows, seed):
+            rng = _rng(seed, f"codes{row['Company Name']}")
+            writer.writerow({'Company Name': row['Company Name'],
+                             'Evaluation Score': row['Evaluation Score'],
+                             'Avg Leads Per Day': row['Avg Leads Per Day'],
+                             'audience_codes': json.dumps(random_codes(rng, codes))})
+
+
+def synthetic_page(i, seed=0):
+    """
+    Returns the HTML of company i's homepage, boilerplate included.
+    """
+    company = synthetic_company(i, seed)
+    menu = ''.join(f'<li><a href="/{item.lower()}">{item}</a></li>'
+                   for item in ['Startseite', 'Produkte', 'Über uns', 'Karriere', 'Kontakt'])
+    return f"""<!DOCTYPE html>
+<html lang="de"><head><meta charset="utf-8"><title>{company['name']}</title>
+<style>body {{ font-family: sans-serif; }}</style>
+<script>window.dataLayer = window.dataLayer || []; function gtag() {{ dataLayer.push(arguments); }}</script>
+</head><body>
+<div class="cookie-consent">Wir verwenden Cookies, um Ihnen das beste Erlebnis zu bieten. <button>Akzeptieren</button></div>
+<header><nav><ul>{menu}</ul></nav></header>
+<main>
+<h1>{company['name']}</h1>
+<p>{company['tagline']}</p>
+<section><h2>Was wir tun</h2><p>{company['description']}</p></section>
+<section><h2>Für wen</h2><p>{company['customers']} setzen auf {company['product']}.</p><p>{company['tagline']}</p></section>
+</main>
+<footer><p>&copy; {company['name']}, {company['city']}</p><p>Impressum | Datenschutz</p></footer>
+</body></html>
+""".encode('utf-8')
+
+
+class SyntheticSite:
+    """
+    Local HTTP server that serves synthetic_page(i) at /company/<i>.
+
+    Use as a context manager; base_url is known once the server has
+    started on a free port. Each response is delayed by latency seconds.
+    """
+
+    def __init__(self, seed=0, latency=0.0, host='127.0.0.1', port=0):
+        self.seed = seed
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                match = re.fullmatch(r'/company/(\d+)/?', self.path)
+                with site._lock:
+                    site.requests += 1
+                if site.latency:
+                    time.sleep(site.latency)
+                if match is None:
+                    self.send_error(404)
+                    return
+                body = synthetic_page(int(match.group(1)), site.seed)
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.base_url = f"http://{host}:{self.server.server_address[1]}"
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def _fake_result(text, codes):
+    """
+    Deterministic classification for a text: the same text always gets the same codes.
+    """
+    h = zlib.crc32(text.encode('utf-8'))
+    primary = codes[h % len(codes)]
+    secondary = [codes[(h // 7) % len(codes)]] if h % 3 else []
+    return {"primary": primary, "secondary": [c for c in secondary if c != primary],
+            "explanation": "Synthetic classification."}
+
+
+def fake_responder(taxonomy=None):
+    """
+    Returns a FakeLLMClient responder that answers every prompt the pipeline sends.
+
+    Summary prompts get the first sentences of the page text, single and
+    packed classification prompts a valid JSON answer derived from a hash of
+    each description, and repair prompts a valid object.
+    """
+    taxonomy = taxonomy if taxonomy is not None else get_taxonomy()
+    codes = sorted(code for code in taxonomy.codes if code not in ('UNKNOWN', 'OTHER'))
+    single_prefix, single_suffix = taxonomy.prompt_parts(PROMPT_TEMPLATE, '{{description}}')
+    packed_prefix, packed_suffix = taxonomy.prompt_parts(PACKED_PROMPT_TEMPLATE, '{{descriptions}}')
+    repair_start = REPAIR_PROMPT_TEMPLATE.split('{{')[0]
+
+    def respond(prompt, model_name):
+        if '\n\nTEXT: ' in prompt:
+            text = prompt.split('\n\nTEXT: ', 1)[1]
+            return ' '.join(text.split()[:60])
+        if prompt.startswith(packed_prefix) and prompt.endswith(packed_suffix):
+            answers = []
+            for line in prompt[len(packed_prefix):len(prompt) - len(packed_suffix)].splitlines():
+                match = re.match(r'\*   \*\*ID ([^:]+):\*\* (.*)$', line)
+                if match:
+                    answers.append(dict(id=match.group(1), **_fake_result(match.group(2), codes)))
+            return json.dumps(answers)
+        if prompt.startswith(single_prefix) and prompt.endswith(single_suffix):
+            return json.dumps(_fake_result(prompt[len(single_prefix):len(prompt) - len(single_suffix)], codes))
+        if prompt.startswith(repair_start):
+            return json.dumps(_fake_result(prompt, codes))
+        return json.dumps({"primary": "UNKNOWN", "secondary": [], "explanation": "Unrecognized prompt."})
+
+    return respond
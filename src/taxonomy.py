@@ -0,0 +1,114 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Project root, so the taxonomy is found regardless of the current working directory
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Default taxonomy file
+TAXONOMY_FILE = os.path.join(PROJECT_ROOT, 'audience_taxonomy_v2025-06.json')
+
+
+class Taxonomy:
+    """
+    Parsed audience taxonomy with everything derived from it computed once.
+
+    codes maps each code to its label, code_set is the set of valid codes and
+    version is a short content hash used in cache keys.
+    """
+
+    def __init__(self, codes, path=None):
+        self.codes = dict(codes)
+        self.path = path
+        self.code_set = frozenset(self.codes)
+        self.codes_json = json.dumps(self.codes, indent=2)
+        material = json.dumps(self.codes, sort_keys=True, ensure_ascii=False)
+        self.version = hashlib.sha256(material.encode('utf-8')).hexdigest()[:12]
+        self._prompt_parts = {}
+        self._lock = threading.Lock()
+
+    def __bool__(self):
+        return bool(self.codes)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __contains__(self, code):
+        return code in self.code_set
+
+    def prompt_parts(self, template, placeholder):
+        """
+        Returns (prefix, suffix) of template with the taxonomy filled in, split at placeholder.
+
+        The result is computed once per template, so building a prompt only
+        needs to concatenate prefix + text + suffix.
+        """
+        key = (template, placeholder)
+        parts = self._prompt_parts.get(key)
+        if parts is None:
+            rendered = template.replace('{{taxonomy}}', self.codes_json)
+            prefix, _, suffix = rendered.partition(placeholder)
+            parts = (prefix, suffix)
+            with self._lock:
+                self._prompt_parts[key] = parts
+        return parts
+
+    def valid_codes(self, codes):
+        """
+        Returns the codes that belong to this taxonomy, keeping order and dropping duplicates.
+        """
+        return [code for code in dict.fromkeys(codes) if code in self.code_set]
+
+    def subset(self, codes):
+        """
+        Returns a Taxonomy with only the given codes, in this taxonomy's order.
+        """
+        codes = set(codes)
+        return Taxonomy({code: label for code, label in self.codes.items() if code in codes}, self.path)
+
+
+_taxonomies = {}
+_taxonomies_lock = threading.Lock()
+
+def get_taxonomy(path=TAXONOMY_FILE):
+    """
+    Loads the taxonomy file once per process and returns the shared Taxonomy.
+
+    Returns an empty Taxonomy if the file is missing or invalid; failures are
+    not memoized so a later call can retry.
+    """
+    with _taxonomies_lock:
+        taxonomy = _taxonomies.get(path)
+        if taxonomy is not None:
+            return taxonomy
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                taxonomy = Taxonomy(json.load(f), path)
+        except FileNotFoundError:
+            logger.error("Taxonomy file not found: %s", path)
+            return Taxonomy({}, path)
+        except json.JSONDecodeError:
+            logger.error("Could not decode JSON from the taxonomy file %s.", path)
+            return Taxonomy({}, path)
+        _taxonomies[path] = taxonomy
+        return taxonomy
+
+def codes_from_result(result, taxonomy=None):
+    """
+    Returns [primary] + secondary codes from a classification result.
+
+    When a taxonomy is given, codes that are not part of it are dropped.
+    """
+    codes = []
+    if isinstance(result, dict):
+        if result.get('primary'):
+            codes.append(result['primary'])
+        if isinstance(result.get('secondary'), list):
+            codes.extend(code for code in result['secondary'] if isinstance(code, str))
+    if taxonomy is not None:
+        codes = taxonomy.valid_codes(codes)
+    return codes
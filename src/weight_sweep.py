@@ -0,0 +1,168 @@
+import heapq
+import itertools
+import json
+from collections import Counter
+
+from src import matching
+from src.matching import as_float
+
+# Scoring constants a sweep configuration may override
+PARAMETERS = (
+    'VERTICAL_WEIGHT', 'SPECIAL_VERTICAL_WEIGHT', 'FUNCTIONAL_WEIGHT', 'HORIZONTAL_WEIGHT',
+    'EVALUATION_SCORE_BOOST', 'LEAD_VOLUME_BOOST', 'LEAD_VOLUME_THRESHOLD',
+)
+
+# Overlap classes of a prospect/partner pair, in the order MatchEngine.base_score checks them,
+# and the weight that scores each class
+CLASS_WEIGHTS = ('SPECIAL_VERTICAL_WEIGHT', 'VERTICAL_WEIGHT', 'FUNCTIONAL_WEIGHT', 'HORIZONTAL_WEIGHT')
+
+SWEEP_HEADERS = ['config', *PARAMETERS, 'prospects', 'changed_prospects', 'top1_changed',
+                 'mean_overlap', 'mean_rank_shift', 'entered', 'left', 'biggest_gains', 'biggest_losses']
+
+
+def baseline_config():
+    """
+    Returns the scoring constants currently set in src.matching.
+    """
+    return {name: getattr(matching, name) for name in PARAMETERS}
+
+
+def load_sweep(path):
+    """
+    Reads a sweep file and returns [(name, config)], starting with the baseline.
+
+    The file may set "baseline" overrides, a "grid" mapping parameters to
+    lists of values (every combination becomes a configuration) and a list
+    of explicit "configs", each with an optional "name".
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        sweep = json.load(f)
+    baseline = baseline_config()
+    baseline.update(_checked(sweep.get('baseline', {})))
+    configs = [('baseline', baseline)]
+
+    grid = _checked(sweep.get('grid', {}))
+    names = sorted(grid)
+    for values in itertools.product(*(grid[name] for name in names)):
+        overrides = dict(zip(names, values))
+        configs.append((','.join(f"{name}={value}" for name, value in overrides.items()),
+                        dict(baseline, **overrides)))
+    for i, config in enumerate(sweep.get('configs', []), start=1):
+        config = dict(config)
+        name = config.pop('name', f"config {i}")
+        configs.append((name, dict(baseline, **_checked(config))))
+    return configs
+
+
+def _checked(overrides):
+    unknown = set(overrides) - set(PARAMETERS)
+    if unknown:
+        raise ValueError(f"Unknown scoring parameters: {', '.join(sorted(unknown))}")
+    return overrides
+
+
+class PairTable:
+    """
+    Overlap class of every prospect/partner pair that shares a code, computed once.
+
+    A pair's score under any configuration is its class weight times the
+    partner's evaluation factor times its lead factor, so re-ranking for a
+    new configuration only needs one factor table per partner. Prospects
+    with the same code set share one ranking.
+    """
+
+    def __init__(self, engine, prospect_masks):
+        self.engine = engine
+        self.eval_scores = [as_float(partner.get('Evaluation Score', 0)) for partner in engine.partners]
+        self.avg_leads = [as_float(partner.get('Avg Leads Per Day', 0)) for partner in engine.partners]
+        groups = {}
+        self.group_of = []
+        for mask in prospect_masks:
+            self.group_of.append(groups.setdefault(mask, len(groups)))
+        self.group_sizes = Counter(self.group_of)
+        self.pairs = [self._pairs(mask) for mask in groups]
+
+    def _pairs(self, prospect_mask):
+        engine = self.engine
+        pairs = []
+        for j in engine.candidates(engine.decode(prospect_mask)):
+            overlap = prospect_mask & engine.masks[j]
+            if overlap & engine.vertical_mask:
+                pairs.append((j, 0 if overlap & engine.regulated_mask else 1))
+            elif overlap & engine.functional_mask:
+                pairs.append((j, 2))
+            elif overlap & engine.horizontal_mask:
+                pairs.append((j, 3))
+        return pairs
+
+    def rank(self, config, top_k):
+        """
+        Returns each code set's top-k partner indices under config, best first.
+
+        Scores are multiplied in the same order as MatchEngine.score and ties
+        keep partner order, so the baseline reproduces MatchEngine.top_k.
+        """
+        eval_boost = config['EVALUATION_SCORE_BOOST']
+        lead_factor = 1 + config['LEAD_VOLUME_BOOST']
+        threshold = config['LEAD_VOLUME_THRESHOLD']
+        eval_factors = [1 + (e * eval_boost) if e > 0 else 1.0 for e in self.eval_scores]
+        lead_factors = [lead_factor if leads > threshold else 1.0 for leads in self.avg_leads]
+        weights = [config[name] for name in CLASS_WEIGHTS]
+        tops = []
+        for pairs in self.pairs:
+            scored = [(j, weights[c] * eval_factors[j] * lead_factors[j]) for j, c in pairs]
+            best = heapq.nlargest(top_k, (item for item in scored if item[1] > 0), key=lambda item: item[1])
+            tops.append([j for j, _ in best])
+        return tops
+
+
+def compare_rankings(table, baseline, candidate, partner_names, movers=3):
+    """
+    Rank-stability and diff metrics of candidate top-k lists against the baseline ones.
+
+    Rates are over prospects that have a match under either configuration;
+    overlap is the share of shared partners, rank shift the mean absolute
+    rank change of shared partners. Gains and losses count top-k
+    appearances per partner.
+    """
+    prospects = changed = top1_changed = entered = left = 0
+    overlap_sum = shift_sum = 0.0
+    shifted = 0
+    appearances = Counter()
+    for group, size in table.group_sizes.items():
+        before, after = baseline[group], candidate[group]
+        if not before and not after:
+            continue
+        prospects += size
+        if before != after:
+            changed += size
+        if before[:1] != after[:1]:
+            top1_changed += size
+        common = set(before) & set(after)
+        overlap_sum += size * len(common) / max(len(before), len(after))
+        if common:
+            shift_sum += size * sum(abs(before.index(j) - after.index(j)) for j in common) / len(common)
+            shifted += size
+        entered += size * len(set(after) - common)
+        left += size * len(set(before) - common)
+        for j in after:
+            appearances[j] += size
+        for j in before:
+            appearances[j] -= size
+
+    def describe(items):
+        return '; '.join(f"{partner_names[j]} {count:+d}" for j, count in items)
+
+    gains = sorted(((j, n) for j, n in appearances.items() if n > 0), key=lambda item: (-item[1], item[0]))
+    losses = sorted(((j, n) for j, n in appearances.items() if n < 0), key=lambda item: (item[1], item[0]))
+    return {
+        'prospects': prospects,
+        'changed_prospects': round(changed / prospects, 4) if prospects else 0.0,
+        'top1_changed': round(top1_changed / prospects, 4) if prospects else 0.0,
+        'mean_overlap': round(overlap_sum / prospects, 4) if prospects else 1.0,
+        'mean_rank_shift': round(shift_sum / shifted, 4) if shifted else 0.0,
+        'entered': entered,
+        'left': left,
+        'biggest_gains': describe(gains[:movers]),
+        'biggest_losses': describe(losses[:movers]),
+    }
@@ -0,0 +1,28 @@
+import sys
+import os
+
+import pytest
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src import classifier
+from src.cache import ScrapeCache, SQLiteCache, set_scrape_cache
+
+@pytest.fixture(autouse=True)
+def temporary_caches(tmp_path_factory):
+    """
+    Points the classification and scrape caches at a temporary directory, so no test writes cache.db into the repo.
+
+    Tests that install their own caches replace these.
+    """
+    directory = tmp_path_factory.mktemp('caches')
+    cache = SQLiteCache(str(directory / 'cache.db'))
+    scrape_cache = ScrapeCache(str(directory / 'scrape_cache.db'))
+    classifier.set_cache(cache)
+    set_scrape_cache(scrape_cache)
+    yield
+    classifier.set_cache(None)
+    set_scrape_cache(None)
+    cache.close()
+    scrape_cache.close()
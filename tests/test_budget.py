@@ -0,0 +1,116 @@
+import sys
+import os
+import csv
+import json
+from types import SimpleNamespace
+
+import pytest
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from scripts import process_partners
+from src import classifier, llm_client
+from src.budget import BudgetExceeded, RunBudget, get_budget, set_budget
+from src.cache import MemoryCache
+from src.llm_client import FakeLLMClient, GeminiClient
+from src.metrics import Metrics, get_metrics, set_metrics
+
+def write_partners(path, names):
+    with open(path, 'w', newline='', encoding='latin-1') as f:
+        writer = csv.DictWriter(f, fieldnames=[
+            'Company Name', 'Industry', 'Products/Services Offered',
+            'USP (Unique Selling Proposition) / Key Selling Points',
+            'Evaluation Score', 'Avg Leads Per Day'])
+        writer.writeheader()
+        for name in names:
+            writer.writerow({
+                'Company Name': name, 'Industry': 'HR', 'Products/Services Offered': 'software',
+                'USP (Unique Selling Proposition) / Key Selling Points': 'simple',
+                'Evaluation Score': '40', 'Avg Leads Per Day': '3'})
+
+def classified_names(path):
+    with open(path, encoding='utf-8') as f:
+        return [row['Company Name'] for row in csv.DictReader(f)]
+
+def test_budget_admits_until_limits_and_accounts_per_stage():
+    budget = RunBudget(max_tokens=100, max_calls=3)
+    budget.admit(40, 'summarize')
+    # The in-flight estimate counts against the token limit until the call ends
+    with pytest.raises(BudgetExceeded):
+        budget.admit(70, 'classify')
+    budget.record(40, 30, 10, 'summarize', reported=True)
+    budget.admit(50, 'classify')
+    budget.release(50, 'classify')
+    assert not budget.exhausted
+    budget.admit(55, 'classify')
+    assert budget.exhausted
+    with pytest.raises(BudgetExceeded):
+        budget.admit(1, 'classify')
+
+    summary = budget.summary()
+    assert (summary['calls'], summary['tokens']) == (3, 40)
+    assert summary['stages']['summarize']['tokens'] == 40
+    assert summary['stages']['summarize']['reported_calls'] == 1
+    assert {k: summary['stages']['classify'][k] for k in ('calls', 'failed_calls', 'refused_calls')} == {
+        'calls': 2, 'failed_calls': 1, 'refused_calls': 2}
+
+def test_generate_records_reported_usage(monkeypatch):
+    response = SimpleNamespace(text="Summary.", usage_metadata=SimpleNamespace(
+        prompt_token_count=123, candidates_token_count=7))
+    model = SimpleNamespace(generate_content=lambda prompt: response)
+    monkeypatch.setattr(llm_client, 'genai', SimpleNamespace(
+        configure=lambda api_key=None: None, GenerativeModel=lambda model_name, generation_config=None: model))
+    llm_client.set_client(GeminiClient(api_key="test"))
+    set_budget(RunBudget())
+    try:
+        assert llm_client.generate("Summarize this page.", "gemini-2.0-flash", stage='summarize') == "Summary."
+        stage = get_budget().summary()['stages']['summarize']
+    finally:
+        llm_client.set_client(None)
+        set_budget(None)
+    assert (stage['prompt_tokens'], stage['response_tokens'], stage['reported_calls']) == (123, 7, 1)
+
+def test_process_partners_stops_at_call_budget_and_resumes(tmp_path, monkeypatch):
+    input_file = str(tmp_path / 'partners.csv')
+    output_file = str(tmp_path / 'partners_with_codes.csv')
+    write_partners(input_file, ['A', 'B', 'C', 'D', 'E'])
+    fake = FakeLLMClient(json.dumps({"primary": "F_HR", "secondary": [], "explanation": "HR."}))
+    monkeypatch.setattr(process_partners, 'CHECKPOINT_BATCH_SIZE', 3)
+    llm_client.set_client(fake)
+    classifier.set_cache(MemoryCache())
+    options = dict(input_file=input_file, output_file=output_file, max_concurrency=1,
+                   use_rules=False, near_duplicate_threshold=0)
+    try:
+        # C is refused inside the first batch and the second batch is never started
+        process_partners.main(max_calls=2, **options)
+        assert classified_names(output_file) == ['A', 'B']
+        assert len(fake.calls) == 2
+        with open(output_file + '.run.json', encoding='utf-8') as f:
+            assert json.load(f)['budget']['stages']['classify']['refused_calls'] == 1
+
+        process_partners.main(resume=True, **options)
+        assert classified_names(output_file) == ['A', 'B', 'C', 'D', 'E']
+        assert len(fake.calls) == 5
+    finally:
+        llm_client.set_client(None)
+        classifier.set_cache(None)
+        set_budget(None)
+
+def test_refused_repair_call_is_not_counted():
+    fake = FakeLLMClient('{"primary": "NOT_A_CODE", "secondary": [], "explanation": "?"}')
+    llm_client.set_client(fake)
+    classifier.set_cache(MemoryCache())
+    set_budget(RunBudget(max_calls=1))
+    set_metrics(Metrics())
+    stats = classifier.BatchStats()
+    try:
+        result = classifier.classify_blurb("An HR software vendor.", stats=stats)
+    finally:
+        llm_client.set_client(None)
+        classifier.set_cache(None)
+        set_budget(None)
+    assert result.get('budget_exceeded')
+    assert len(fake.calls) == 1
+    assert (stats.llm_calls, stats.parse_failures, stats.repairs) == (1, 1, 0)
+    assert get_metrics().snapshot()['counters']['classifier.repairs{result=failed}'] == 1
@@ -0,0 +1,210 @@
+import sys
+import os
+import json
+import threading
+
+import pytest
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.cache import MemoryCache, ScrapeCache, SQLiteCache, import_legacy_cache, make_cache_key, open_cache
+from src import classifier
+
+def test_cache_key_depends_on_all_parts():
+    base = make_cache_key("desc", "tax1", "model", "1")
+    assert base == make_cache_key("desc", "tax1", "model", "1")
+    assert base != make_cache_key("desc2", "tax1", "model", "1")
+    assert base != make_cache_key("desc", "tax2", "model", "1")
+    assert base != make_cache_key("desc", "tax1", "model2", "1")
+    assert base != make_cache_key("desc", "tax1", "model", "2")
+
+def test_sqlite_cache_roundtrip(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    cache = SQLiteCache(path)
+    cache.set('k', {"primary": "X_SME", "secondary": []})
+    assert cache.get('k') == {"primary": "X_SME", "secondary": []}
+    assert cache.get('missing') is None
+    assert len(cache) == 1
+    cache.close()
+
+    # Entries survive reopening the database
+    reopened = SQLiteCache(path)
+    assert reopened.get('k')["primary"] == "X_SME"
+    reopened.close()
+
+def test_sqlite_cache_concurrent_writers(tmp_path):
+    cache = SQLiteCache(str(tmp_path / 'cache.db'))
+
+    def write(start):
+        for i in range(start, start + 50):
+            cache.set(f'key-{i}', {"primary": str(i)})
+
+    threads = [threading.Thread(target=write, args=(n * 50,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(cache) == 200
+    assert cache.get('key-123') == {"primary": "123"}
+    cache.close()
+
+def test_legacy_cache_is_imported_once(tmp_path):
+    legacy_path = tmp_path / 'cache.json'
+    legacy_path.write_text(json.dumps({
+        "good description": {"primary": "F_HR", "secondary": [], "explanation": ""},
+        "failed description": {"error": "Gemini API call failed"},
+    }))
+
+    cache = open_cache(str(tmp_path / 'cache.db'), str(legacy_path), 'tax', 'model', '1')
+    assert len(cache) == 1
+    assert cache.get(make_cache_key("good description", 'tax', 'model', '1'))["primary"] == "F_HR"
+
+    # A second import pass is skipped once the flag is set
+    cache.set(make_cache_key("good description", 'tax', 'model', '1'), {"primary": "X_SME"})
+    cache.close()
+    cache = open_cache(str(tmp_path / 'cache.db'), str(legacy_path), 'tax', 'model', '1')
+    assert cache.get(make_cache_key("good description", 'tax', 'model', '1'))["primary"] == "X_SME"
+    cache.close()
+
+def test_import_legacy_cache_missing_file(tmp_path):
+    assert import_legacy_cache(MemoryCache(), str(tmp_path / 'nope.json'), 'tax', 'model', '1') == 0
+
+def test_classify_blurb_uses_cache(monkeypatch):
+    calls = []
+
+    def fake_call_llm(prompt, generation_config=None):
+        calls.append(prompt)
+        return '```json\n{"primary": "F_HR", "secondary": ["TECH_SAAS"], "explanation": "HR software."}\n```'
+
+    monkeypatch.setattr(classifier, 'call_llm', fake_call_llm)
+    classifier.set_cache(MemoryCache())
+    try:
+        first = classifier.classify_blurb("An HR software vendor.")
+        second = classifier.classify_blurb("An HR software vendor.")
+    finally:
+        classifier.set_cache(None)
+
+    assert first == second == {"primary": "F_HR", "secondary": ["TECH_SAAS"], "explanation": "HR software."}
+    assert len(calls) == 1
+
+def test_old_database_is_migrated_and_entries_record_versions(tmp_path):
+    import sqlite3
+    path = str(tmp_path / 'cache.db')
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE entries (key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)")
+    conn.execute("INSERT INTO entries VALUES ('old', '{\"primary\": \"F_HR\"}', 1000.0)")
+    conn.commit()
+    conn.close()
+
+    cache = SQLiteCache(path)
+    assert cache.get('old') == {"primary": "F_HR"}
+    cache.set('new', {"primary": "X_SME"}, model='m', prompt_version='1', taxonomy_version='t')
+    rows = dict(cache._connect().execute(
+        "SELECT key, model || '/' || prompt_version || '/' || taxonomy_version FROM entries").fetchall())
+    assert rows == {'old': None, 'new': 'm/1/t'}
+    cache.close()
+
+def test_ttl_and_lru_eviction(tmp_path, monkeypatch):
+    from src import cache as cache_module
+    clock = [1000.0]
+    monkeypatch.setattr(cache_module.time, 'time', lambda: clock[0])
+    monkeypatch.setattr(cache_module, 'EVICT_INTERVAL', 4)
+    path = str(tmp_path / 'cache.db')
+    step = cache_module.TOUCH_INTERVAL + 1
+
+    cache = SQLiteCache(path, max_entries=3)
+    for i in range(3):
+        cache.set(f'k{i}', {"primary": str(i)})
+        clock[0] += step
+    # Using k0 makes k1 the least recently used entry when the fourth write enforces the cap
+    assert cache.get('k0') is not None
+    clock[0] += step
+    cache.set('k3', {"primary": "3"})
+    assert sorted(key for (key,) in cache._connect().execute("SELECT key FROM entries")) == ['k0', 'k2', 'k3']
+    cache.close()
+
+    # With a TTL, entries created before it are misses and evict() removes them
+    cache = SQLiteCache(path, ttl=2.5 * step)
+    assert cache.get('k0') is None and cache.get('k2') is not None
+    assert cache.evict() == 1 and len(cache) == 2
+    cache.close()
+
+def test_compact_and_stats(tmp_path):
+    def current(model, prompt_version, taxonomy_version):
+        return model == 'm' and prompt_version.split('+')[0] == '1' and taxonomy_version == 't'
+
+    cache = SQLiteCache(str(tmp_path / 'cache.db'))
+    cache.set('good', {"primary": "F_HR"}, model='m', prompt_version='1', taxonomy_version='t')
+    cache.set('pruned', {"primary": "F_HR"}, model='m', prompt_version='1+top8', taxonomy_version='t')
+    cache.set('old-model', {"primary": "F_HR"}, model='old', prompt_version='1', taxonomy_version='t')
+    cache.set('failed', {"error": "Gemini API call failed"}, model='m', prompt_version='1', taxonomy_version='t')
+    cache.set('legacy', {"primary": "F_HR"})
+    assert cache.get('good') and cache.get('missing') is None
+
+    stats = cache.stats()
+    assert stats['entries'] == 5 and stats['error_entries'] == 1
+    assert stats['hits'] == 1 and stats['misses'] == 1 and stats['hit_rate'] == 0.5
+    assert stats['age']['<1d'] == 5
+    assert {v['model'] for v in stats['versions']} == {'m', 'old', None}
+
+    assert cache.compact(current) == {'error': 1, 'stale': 1, 'unversioned': 0, 'evicted': 0}
+    assert cache.compact(current, drop_unversioned=True)['unversioned'] == 1
+    assert sorted(key for (key,) in cache._connect().execute("SELECT key FROM entries")) == ['good', 'pruned']
+    cache.close()
+
+def test_warm_from_partner_codes(tmp_path, capsys):
+    import csv
+    from scripts import manage_cache
+    from scripts.process_partners import create_partner_blurb
+    from src.taxonomy import get_taxonomy
+
+    partner = {'Company Name': 'Acme', 'Industry': 'HR', 'Products/Services Offered': 'payroll',
+               'USP (Unique Selling Proposition) / Key Selling Points': 'fast'}
+    # Unknown secondary codes are dropped by validate_result before caching
+    answer = {"primary": "F_HR", "secondary": ["NOT_A_CODE"], "explanation": "Payroll."}
+    input_file, codes_file = str(tmp_path / 'partners.csv'), str(tmp_path / 'partners_with_codes.csv')
+    with open(input_file, 'w', newline='', encoding='latin-1') as f:
+        writer = csv.DictWriter(f, fieldnames=list(partner))
+        writer.writeheader()
+        writer.writerows([partner, dict(partner, **{'Company Name': 'Rules Inc'})])
+    with open(codes_file, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=['Company Name', 'audience_codes'])
+        writer.writeheader()
+        writer.writerows([
+            {'Company Name': 'Acme', 'audience_codes': json.dumps(answer)},
+            {'Company Name': 'Rules Inc', 'audience_codes': json.dumps(dict(answer, explanation="Rule-based: x"))},
+            {'Company Name': 'Ghost', 'audience_codes': json.dumps({"error": "failed"})},
+        ])
+
+    db = str(tmp_path / 'cache.db')
+    manage_cache.main('warm', db=db, codes_file=codes_file, input_file=input_file)
+    assert 'Warmed 1 entries' in capsys.readouterr().out
+    manage_cache.cli(['--db', db, 'warm', codes_file, '--input', input_file])
+    assert '(1 already cached, 2 not usable)' in capsys.readouterr().out
+
+    cache = SQLiteCache(db)
+    key = make_cache_key(create_partner_blurb(partner), get_taxonomy().version,
+                         classifier.MODEL_NAME, classifier.PROMPT_VERSION)
+    assert cache.get(key) == dict(answer, secondary=[]) and len(cache) == 1
+    cache.close()
+
+    manage_cache.main('stats', db=db)
+    assert 'Entries: 1 (0 errors)' in capsys.readouterr().out
+
+def test_compact_refuses_scrape_cache_without_keep_other_versions(tmp_path, capsys):
+    from scripts import manage_cache
+
+    db = str(tmp_path / 'scrape_cache.db')
+    cache = ScrapeCache(db)
+    cache.set('summary', "A maker of blister packaging machines.", model='gemini-2.0-flash', prompt_version='s1')
+    cache.close()
+
+    with pytest.raises(SystemExit):
+        manage_cache.cli(['--db', db, 'compact'])
+    assert 'is a scrape cache' in capsys.readouterr().err
+    manage_cache.main('compact', db=db, keep_other_versions=True)
+    cache = ScrapeCache(db)
+    assert len(cache) == 1
+    cache.close()
@@ -1,11 +1,17 @@
 import sys
 import os
 import json
+import threading
+import time
 
 # Add the project root to the Python path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from src.classifier import classify_blurb
+from src import classifier, llm_client
+from src.cache import MemoryCache
+from src.classifier import (BatchStats, classify_blurb, classify_many, extract_json,
+                            parse_packed_response, parse_result)
+from src.llm_client import FakeLLMClient
 
 # Sub-Task 1.5.1: Define Test Cases
 test_cases = [
@@ -14,51 +20,210 @@ test_cases = [
         "expected": {
             "primary": "X_HORIZ",
             "secondary": ["X_SME"],
-            "explanation": "This is a test response from the placeholder LLM."
+            "explanation": "A horizontal tool used by companies of every size."
         }
     }
 ]
 
 # Sub-Tasks 1.5.2 & 1.5.3: Write Test Loop and Assertions
-def run_tests():
+def test_classify_blurb_smoke_cases():
     """
-    Runs the test suite for the classify_blurb function.
+    Runs the smoke cases through classify_blurb with a fake LLM that returns each expected answer.
     """
     print("--- RUNNING SMOKE TESTS ---")
     for i, test_case in enumerate(test_cases):
         description = test_case["description"]
         expected = test_case["expected"]
 
-        # The hardcoded response from call_llm doesn't depend on the input,
-        # so we can use any description. The test case description is used for clarity.
-        actual = classify_blurb(description)
-
-        # The placeholder LLM response has a different explanation.
-        # We will match the expected output from the instructions.
-        # The actual `call_llm` returns a slightly different explanation.
-        # Let's adjust the expected output to match the placeholder.
-        expected_for_placeholder = {
-            "primary": "X_HORIZ",
-            "secondary": ["X_SME"],
-            "explanation": "This is a test response from the placeholder LLM."
-        }
-        
-        # The actual response from the placeholder has a different explanation text.
-        # Let's use the one from the hardcoded function for a valid comparison.
-        actual_from_llm = {
-            "primary": "X_HORIZ",
-            "secondary": ["X_SME"],
-            "explanation": "This is a test response from the placeholder LLM."
-        }
-        
-        # The classify_blurb function will return the hardcoded response from call_llm
-        # for any input since the LLM call is simulated.
-        actual_result = classify_blurb("Any description will do for this test.")
-
+        fake = FakeLLMClient(json.dumps(expected))
+        llm_client.set_client(fake)
+        classifier.set_cache(MemoryCache())
+        try:
+            actual_result = classify_blurb(description)
+        finally:
+            llm_client.set_client(None)
+            classifier.set_cache(None)
 
         assert actual_result == expected, f"Test case {i+1} failed!\nExpected: {json.dumps(expected, indent=2)}\nActual:   {json.dumps(actual_result, indent=2)}"
+        assert description in fake.calls[0][1]
         print(f"--- Test Case {i+1} PASSED ---")
 
+def test_classify_many_dedupes_and_keeps_order(monkeypatch):
+    calls = []
+    in_flight = []
+    peak = [0]
+    lock = threading.Lock()
+
+    def fake_classify(description, stats=None):
+        with lock:
+            calls.append(description)
+            in_flight.append(description)
+            peak[0] = max(peak[0], len(in_flight))
+        time.sleep(0.02)
+        with lock:
+            in_flight.remove(description)
+        if description == "broken":
+            raise RuntimeError("boom")
+        return {"primary": description.upper(), "secondary": []}
+
+    monkeypatch.setattr(classifier, 'classify_blurb', fake_classify)
+    descriptions = ["a", "b", "a", "broken", "c", "d", "e", "b"]
+    results = classify_many(descriptions, max_concurrency=2)
+
+    assert sorted(calls) == ["a", "b", "broken", "c", "d", "e"]
+    assert peak[0] <= 2
+    assert [r.get("primary") for r in results] == ["A", "B", "A", None, "C", "D", "E", "B"]
+    assert "error" in results[3]
+
+def test_classify_many_empty():
+    assert classify_many([]) == []
+
+def test_parse_packed_response_drops_bad_items():
+    response = """```json
+    [
+      {"id": "1", "primary": "F_HR", "secondary": ["TECH_SAAS"], "explanation": "HR."},
+      {"id": "2", "primary": "", "secondary": []},
+      {"id": "3", "primary": "X_SME", "secondary": "MFG_SM"},
+      {"id": "9", "primary": "X_SME", "secondary": []}
+    ]
+    ```"""
+    parsed = parse_packed_response(response, ["1", "2", "3", "4"])
+    assert list(parsed) == ["1"]
+    assert parsed["1"]["primary"] == "F_HR"
+    assert parse_packed_response("not json", ["1"]) == {}
+
+def test_classify_many_packed_falls_back_for_missing_items():
+    def responder(prompt, model_name):
+        if "**Company Descriptions:**" in prompt:
+            # Answer every packed item except the one mentioning "gamma"
+            answers = []
+            for line in prompt.splitlines():
+                if line.startswith("*   **ID ") and "gamma" not in line:
+                    item_id = line.split("**ID ")[1].split(":")[0]
+                    answers.append({"id": item_id, "primary": "X_HORIZ", "secondary": []})
+            return json.dumps(answers)
+        return json.dumps({"primary": "X_SME", "secondary": [], "explanation": "single"})
+
+    fake = FakeLLMClient(responder)
+    llm_client.set_client(fake)
+    classifier.set_cache(MemoryCache())
+    stats = BatchStats(pack_size=3)
+    try:
+        results = classify_many(["alpha", "beta", "gamma", "delta", "alpha"],
+                                max_concurrency=2, pack_size=3, stats=stats)
+    finally:
+        llm_client.set_client(None)
+        classifier.set_cache(None)
+
+    assert [r["primary"] for r in results] == ["X_HORIZ", "X_HORIZ", "X_SME", "X_HORIZ", "X_HORIZ"]
+    # Two packed calls (3 + 1 items) plus one single-item fallback
+    assert len(fake.calls) == 3
+    summary = stats.summary()
+    assert summary["items"] == 5
+    assert summary["unique_items"] == 4
+    assert summary["llm_calls"] == 3
+    assert summary["fallbacks"] == 1
+    assert summary["cost_per_item_usd"] > 0
+
+def test_extract_json_recovers_objects_from_prose():
+    assert extract_json('{"primary": "F_HR"}') == {"primary": "F_HR"}
+    assert extract_json('Sure! Here it is:\n```json\n{"primary": "F_HR", "secondary": []}\n```\nHope that helps.') \
+        == {"primary": "F_HR", "secondary": []}
+    assert extract_json('Answer: {broken} then {"primary": "X_SME"} done') == {"primary": "X_SME"}
+    assert extract_json('no json here') is None
+    assert extract_json(None) is None
+
+def test_parse_result_validates_codes():
+    taxonomy = {"F_HR": "HR", "TECH_SAAS": "SaaS", "X_SME": "SME"}
+    result, problem = parse_result(
+        '{"primary": "F_HR", "secondary": ["TECH_SAAS", "S_SW"], "explanation": "HR."}', taxonomy)
+    assert problem is None
+    assert result == {"primary": "F_HR", "secondary": ["TECH_SAAS"], "explanation": "HR."}
+    assert parse_result('{"primary": "S_SW", "secondary": []}', taxonomy)[1] \
+        == "primary code 'S_SW' is not in the taxonomy"
+    assert parse_result('{"primary": "F_HR", "secondary": "X_SME"}', taxonomy)[0] is None
+    # API errors reported by call_llm pass through unchanged
+    assert parse_result('{"error": "Gemini API call failed: 503"}', taxonomy) \
+        == ({"error": "Gemini API call failed: 503"}, None)
+
+class ConfigRecordingClient:
+    """
+    Fake client that records generation configs and can reject JSON mode.
+    """
+
+    def __init__(self, responses, reject_json_mode=False, error=None):
+        self.responses = iter(responses)
+        self.reject_json_mode = reject_json_mode
+        self.error = error
+        self.configs = []
+        self.prompts = []
+
+    def generate(self, prompt, model_name, generation_config=None):
+        self.configs.append(generation_config)
+        self.prompts.append(prompt)
+        if self.reject_json_mode and 'response_mime_type' in (generation_config or {}):
+            raise TypeError("GenerationConfig got an unexpected keyword argument 'response_schema'")
+        if self.error is not None:
+            raise self.error
+        return next(self.responses)
+
+def test_classify_blurb_repairs_an_invalid_response_once(monkeypatch):
+    monkeypatch.setattr(classifier, '_json_mode_available', True)
+    client = ConfigRecordingClient([
+        'The best fit is {"primary": "S_SW", "secondary": []}',
+        '{"primary": "TECH_SAAS", "secondary": ["F_HR"], "explanation": "fixed"}',
+    ])
+    llm_client.set_client(client)
+    classifier.set_cache(MemoryCache())
+    stats = BatchStats()
+    try:
+        result = classify_blurb("A software vendor.", stats=stats)
+    finally:
+        llm_client.set_client(None)
+        classifier.set_cache(None)
+
+    assert result == {"primary": "TECH_SAAS", "secondary": ["F_HR"], "explanation": "fixed"}
+    assert "primary code 'S_SW' is not in the taxonomy" in client.prompts[1]
+    assert client.configs[0]["response_mime_type"] == "application/json"
+    assert "S_SW" not in client.configs[0]["response_schema"]["properties"]["primary"]["enum"]
+    summary = stats.summary()
+    assert summary["llm_calls"] == 2
+    assert summary["parse_failures"] == 1
+    assert summary["repairs"] == 1
+    assert summary["parse_failure_rate"] == 0.5
+
+def test_classify_blurb_falls_back_when_json_mode_is_rejected(monkeypatch):
+    monkeypatch.setattr(classifier, '_json_mode_available', True)
+    client = ConfigRecordingClient(['{"primary": "F_HR", "secondary": [], "explanation": "ok"}'],
+                                   reject_json_mode=True)
+    llm_client.set_client(client)
+    classifier.set_cache(MemoryCache())
+    try:
+        result = classify_blurb("An HR vendor.")
+    finally:
+        llm_client.set_client(None)
+        classifier.set_cache(None)
+
+    assert result["primary"] == "F_HR"
+    assert 'response_mime_type' in client.configs[0]
+    assert client.configs[1] == classifier.GENERATION_CONFIG
+    assert classifier._json_mode_available is False
+
+def test_unrelated_type_error_keeps_json_mode(monkeypatch):
+    monkeypatch.setattr(classifier, '_json_mode_available', True)
+    client = ConfigRecordingClient([], error=TypeError("unsupported operand type(s) for +: 'int' and 'NoneType'"))
+    llm_client.set_client(client)
+    classifier.set_cache(MemoryCache())
+    try:
+        result = classify_blurb("An HR vendor.")
+    finally:
+        llm_client.set_client(None)
+        classifier.set_cache(None)
+
+    assert 'Gemini API call failed' in result['error']
+    assert len(client.configs) == 1
+    assert classifier._json_mode_available is True
+
 # Add Execution Block
 if __name__ == "__main__":
-    run_tests()
\ No newline at end of file
+    test_classify_blurb_smoke_cases()
\ No newline at end of file
@@ -0,0 +1,41 @@
+import sys
+import os
+import json
+import subprocess
+
+import pytest
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from scripts import cli
+from src.cache import SQLiteCache
+
+def test_match_and_cache_commands_do_not_load_heavy_modules():
+    for command in ('match', 'cache', 'partners'):
+        _, heavy = cli.measure_import(command)
+        assert heavy == [], command
+
+def test_command_modules_leave_sys_path_alone():
+    modules = [module for module, _ in cli.COMMANDS.values()]
+    code = ("import sys\nbefore = list(sys.path)\n"
+            + ''.join(f"import {module}\n" for module in modules)
+            + "print(sys.path == before)")
+    completed = subprocess.run([sys.executable, '-c', code], cwd=cli.PROJECT_ROOT,
+                               capture_output=True, text=True, check=True)
+    assert completed.stdout.strip().splitlines()[-1] == 'True'
+
+def test_cli_passes_arguments_to_the_command(tmp_path, capsys):
+    db = str(tmp_path / 'cache.db')
+    cache = SQLiteCache(db)
+    cache.set('k', {"primary": "F_HR", "secondary": []})
+    cache.close()
+
+    cli.main(['cache', '--db', db, 'stats', '--json'])
+    assert json.loads(capsys.readouterr().out)['entries'] == 1
+
+    with pytest.raises(SystemExit):
+        cli.main(['match', '--help'])
+    assert 'python -m scripts.cli match' in capsys.readouterr().out
+    with pytest.raises(SystemExit):
+        cli.main(['import-times', 'nope'])
@@ -0,0 +1,79 @@
+import sys
+import os
+import json
+import math
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+
+from src.codes_file import CodesFile, codes_path, write_codes_file
+from src.taxonomy import Taxonomy, get_taxonomy
+from src.synthetic import write_partners_with_codes, write_prospects_with_codes
+
+def test_codes_file_round_trip(tmp_path):
+    path = str(tmp_path / 'partners.bin')
+    rows = [
+        {'Company Name': 'Müller GmbH', 'Evaluation Score': '42', 'Avg Leads Per Day': '60',
+         'audience_codes': json.dumps({"primary": "F_HR", "secondary": ["X_SME", "NOT_A_CODE"]})},
+        {'Company Name': 'Broken', 'Evaluation Score': 'n/a', 'Avg Leads Per Day': '',
+         'audience_codes': json.dumps({"error": "failed"})},
+    ]
+    taxonomy = get_taxonomy()
+    write_codes_file(path, rows, 'partners', taxonomy)
+
+    with CodesFile(path, 'partners', taxonomy) as codes:
+        assert len(codes) == 2
+        bits = {code: 1 << i for i, code in enumerate(codes.code_order)}
+        # Codes outside the taxonomy are kept, after the taxonomy's own codes
+        assert codes.code_order[-1] == 'NOT_A_CODE'
+        assert codes.mask(0) == bits['F_HR'] | bits['X_SME'] | bits['NOT_A_CODE']
+        assert codes.mask(1) == 0
+        assert list(codes.floats('Evaluation Score'))[0] == 42.0
+        assert math.isnan(codes.floats('Evaluation Score')[1])
+        assert codes.row(0) == {'Company Name': 'Müller GmbH', 'Evaluation Score': '42',
+                                'Avg Leads Per Day': '60'}
+
+def test_codes_file_rejects_other_taxonomy_and_kind(tmp_path):
+    path = str(tmp_path / 'prospects.bin')
+    write_codes_file(path, [{'firma': 'A', 'url': 'a', 'audience_codes': '{}'}], 'prospects')
+    with pytest.raises(ValueError, match='taxonomy'):
+        CodesFile(path, 'prospects', Taxonomy({'F_HR': 'HR'}))
+    with pytest.raises(ValueError, match='not partners'):
+        CodesFile(path, 'partners')
+
+def test_codes_file_supports_more_than_64_codes(tmp_path):
+    taxonomy = Taxonomy({f"C_{i:03d}": str(i) for i in range(100)})
+    path = str(tmp_path / 'prospects.bin')
+    rows = [{'firma': 'A', 'url': 'a', 'audience_codes': json.dumps({"primary": "C_099", "secondary": ["C_001"]})}]
+    write_codes_file(path, rows, 'prospects', taxonomy)
+    with CodesFile(path, 'prospects', taxonomy) as codes:
+        assert codes.words == 2
+        assert codes.mask(0) == (1 << 99) | (1 << 1)
+
+def test_run_matching_binary_matches_csv_report(tmp_path):
+    from scripts.run_matching import main
+
+    partners_file = str(tmp_path / 'partners_with_codes.csv')
+    prospects_file = str(tmp_path / 'prospects_with_codes.csv')
+    write_partners_with_codes(partners_file, 60, seed=4)
+    write_prospects_with_codes(prospects_file, 200, seed=4)
+
+    main(partners_file=partners_file, prospects_file=prospects_file, output_file=str(tmp_path / 'csv.csv'))
+    main(partners_file=partners_file, prospects_file=prospects_file, output_file=str(tmp_path / 'bin.csv'),
+         binary=True)
+
+    assert os.path.exists(codes_path(partners_file)) and os.path.exists(codes_path(prospects_file))
+    with open(tmp_path / 'csv.csv', encoding='utf-8') as f, open(tmp_path / 'bin.csv', encoding='utf-8') as g:
+        expected = f.read()
+        assert g.read() == expected
+        assert len(expected.splitlines()) > 1
+
+def test_run_matching_rejects_binary_with_other_modes(capsys):
+    from scripts.run_matching import cli
+
+    for mode in (['--stream'], ['--incremental'], ['--sweep']):
+        with pytest.raises(SystemExit):
+            cli(['--binary'] + mode)
+        assert 'not allowed with argument' in capsys.readouterr().err
@@ -1,8 +1,14 @@
 import sys
 import os
+import csv
+import json
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from scripts import enrich_prospects
 from scripts.enrich_prospects import scrape_url, get_summary
+from src import classifier, llm_client
+from src.cache import MemoryCache, ScrapeCache, set_scrape_cache
 from src.classifier import classify_blurb
+from src.llm_client import FakeLLMClient
 
 def test_prospect_pipeline():
     """
@@ -41,5 +47,132 @@ def test_prospect_pipeline():
 
     print("--- Pipeline test passed successfully! ---")
 
+def test_summary_cache_ignores_whitespace_changes(tmp_path):
+    fake = FakeLLMClient("A maker of therapy devices for clinics.")
+    llm_client.set_client(fake)
+    set_scrape_cache(ScrapeCache(str(tmp_path / 'scrape_cache.db')))
+    try:
+        first = get_summary("Smart   therapy devices\nfor clinics")
+        second = get_summary("Smart therapy devices for clinics ")
+        other = get_summary("Blister packaging systems")
+    finally:
+        llm_client.set_client(None)
+        set_scrape_cache(None)
+
+    assert first == second == other == "A maker of therapy devices for clinics."
+    assert len(fake.calls) == 2
+    assert fake.calls[0][0] == enrich_prospects.SUMMARY_MODEL_NAME
+
+class FakeScraper:
+    """
+    Stands in for src.scraper.Scraper; the 'broken' host raises.
+    """
+
+    def __init__(self, max_workers=4, page_cache=None):
+        self.max_workers = max_workers
+        self.stats = {'fetched': 0, 'cache_hits': 0, 'revalidated': 0, 'errors': 0}
+
+    def fetch_page(self, url):
+        if 'broken' in url:
+            raise RuntimeError("connection reset")
+        if 'down' in url:
+            return None
+        return f"<html><body><nav>Startseite</nav><p>Homepage of {url}</p></body></html>".encode('utf-8'), 'utf-8'
+
+    def close(self):
+        pass
+
+def test_main_streams_rows_through_pipeline(tmp_path, monkeypatch):
+    def respond(prompt, model_name):
+        if model_name == enrich_prospects.SUMMARY_MODEL_NAME:
+            return "A maker of blister packaging machines."
+        return '{"primary": "UNKNOWN", "secondary": [], "explanation": "test"}'
+
+    input_file = tmp_path / 'prospects.csv'
+    with open(input_file, 'w', newline='', encoding='latin-1') as f:
+        writer = csv.writer(f)
+        writer.writerow(['firma', 'url', 'Beschreibung', 'Kategorie'])
+        for i in range(6):
+            url = {2: 'broken.example', 4: 'down.example'}.get(i, f'firma{i}.example')
+            writer.writerow([f'Firma {i}', url, 'Baut Blisterverpackungen' if i == 4 else '',
+                             'LegalTech' if i == 5 else ''])
+        writer.writerow(['No URL', '', '', ''])
+
+    monkeypatch.setattr(enrich_prospects, 'Scraper', FakeScraper)
+    fake = FakeLLMClient(respond)
+    llm_client.set_client(fake)
+    classifier.set_cache(MemoryCache())
+    set_scrape_cache(ScrapeCache(str(tmp_path / 'scrape_cache.db')))
+    try:
+        enrich_prospects.main(max_concurrency=2, pack_size=1, use_rules=True,
+                              input_file=str(input_file),
+                              output_file=str(tmp_path / 'out.csv'),
+                              log_file=str(tmp_path / 'log.csv'))
+    finally:
+        llm_client.set_client(None)
+        classifier.set_cache(None)
+        set_scrape_cache(None)
+
+    with open(tmp_path / 'out.csv', newline='', encoding='utf-8') as f:
+        out = list(csv.DictReader(f))
+    assert [row['firma'] for row in out] == [f'Firma {i}' for i in range(6)]
+    codes = [json.loads(row['audience_codes']) for row in out]
+    assert 'scrape failed' in codes[2]['error']
+    assert all(c['primary'] == 'UNKNOWN' for i, c in enumerate(codes) if i not in (2, 5))
+    # The LegalTech row is answered by the rule fast path without scraping or the LLM
+    assert codes[5]['primary'] == 'LEG_LAW'
+    assert not any('firma5' in prompt for _, prompt in fake.calls)
+    with open(tmp_path / 'log.csv', newline='', encoding='utf-8') as f:
+        log = list(csv.DictReader(f))
+    assert len(log) == 4
+    # The unreachable page falls back to the CSV description instead of an LLM summary
+    assert log[3]['summary'] == 'Beschreibung: Baut Blisterverpackungen'
+    summary_prompts = [prompt for model, prompt in fake.calls if model == enrich_prospects.SUMMARY_MODEL_NAME]
+    assert all('Startseite' not in prompt for prompt in summary_prompts)
+
+def test_failed_summary_is_journaled_as_error_and_retried(tmp_path, monkeypatch):
+    failed = []
+
+    def respond(prompt, model_name):
+        if model_name == enrich_prospects.SUMMARY_MODEL_NAME:
+            if 'firma1' in prompt and not failed:
+                failed.append(prompt)
+                raise RuntimeError("summarizer crashed")
+            return "A maker of blister packaging machines."
+        return '{"primary": "F_HR", "secondary": [], "explanation": "test"}'
+
+    input_file = tmp_path / 'prospects.csv'
+    with open(input_file, 'w', newline='', encoding='latin-1') as f:
+        writer = csv.writer(f)
+        writer.writerow(['firma', 'url', 'Beschreibung', 'Kategorie'])
+        for i in range(3):
+            writer.writerow([f'Firma {i}', f'firma{i}.example', '', ''])
+
+    monkeypatch.setattr(enrich_prospects, 'Scraper', FakeScraper)
+    llm_client.set_client(FakeLLMClient(respond))
+    classifier.set_cache(MemoryCache())
+    set_scrape_cache(ScrapeCache(str(tmp_path / 'scrape_cache.db')))
+    options = dict(input_file=str(input_file), output_file=str(tmp_path / 'out.csv'),
+                   log_file=str(tmp_path / 'log.csv'))
+    try:
+        enrich_prospects.main(**options)
+        with open(tmp_path / 'out.csv', newline='', encoding='utf-8') as f:
+            codes = [json.loads(row['audience_codes']) for row in csv.DictReader(f)]
+        assert 'summarize failed' in codes[1]['error']
+        assert codes[0]['primary'] == codes[2]['primary'] == 'F_HR'
+
+        enrich_prospects.main(resume=True, retry_errors=True, **options)
+        with open(tmp_path / 'out.csv', newline='', encoding='utf-8') as f:
+            codes = [json.loads(row['audience_codes']) for row in csv.DictReader(f)]
+        assert [c.get('primary') for c in codes] == ['F_HR', 'F_HR', 'F_HR']
+        # Only the retried row was reduced and summarized in the second run
+        with open(tmp_path / 'out.csv.run.json', encoding='utf-8') as f:
+            summary = json.load(f)
+        assert summary['summaries']['llm_calls'] == 1 and summary['page_text']['pages'] == 1
+    finally:
+        llm_client.set_client(None)
+        classifier.set_cache(None)
+        set_scrape_cache(None)
+
 if __name__ == "__main__":
     test_prospect_pipeline()
\ No newline at end of file
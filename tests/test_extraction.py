@@ -0,0 +1,50 @@
+import sys
+import os
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.extraction import dedupe_blocks, reduce_page, row_context, truncate_to_budget
+
+PAGE = '''<html><head><style>body { color: red; }</style></head><body>
+<div id="cookie-consent">Wir verwenden Cookies. <button>Akzeptieren</button></div>
+<header><nav><a href="/">Home</a> <a href="/produkte">Produkte</a></nav></header>
+<div class="page-wrapper sidebar-layout"><main>
+<h1>Blipack AG</h1>
+<p>Systemlösungen für <b>Blisterverpackungen</b> und Zubehör.</p>
+<section><p>Jetzt Kontakt aufnehmen</p></section>
+<section><p>Jetzt  Kontakt aufnehmen</p></section>
+<script>trackPageView();</script>
+</main></div>
+<footer>Impressum | Datenschutz</footer>
+</body></html>'''
+
+def test_reduce_page_drops_boilerplate_and_repeats():
+    text, report = reduce_page(PAGE.encode('utf-8'), 'utf-8')
+    assert text == 'Blipack AG Systemlösungen für Blisterverpackungen und Zubehör. Jetzt Kontakt aufnehmen'
+    assert report['raw_tokens'] > report['reduced_tokens']
+    assert report['saved_tokens'] == report['raw_tokens'] - report['reduced_tokens']
+
+def test_reduce_page_keeps_hero_heading_in_header():
+    page = ('<html><body><header class="hero"><nav><a href="/">Home</a></nav>'
+            '<h1>Blipack AG</h1><p>Blisterverpackungen seit 1990.</p></header>'
+            '<header><a href="/kontakt">Kontakt</a></header><p>Produkte</p></body></html>')
+    text, _ = reduce_page(page.encode('utf-8'), 'utf-8')
+    assert text == 'Blipack AG Blisterverpackungen seit 1990. Produkte'
+
+def test_reduce_page_respects_token_budget():
+    page = b'<html><body><p>' + b'Verpackung ' * 2000 + b'</p></body></html>'
+    text, report = reduce_page(page, max_tokens=50)
+    assert report['reduced_tokens'] <= 50
+    assert text.endswith('Verpackung')
+
+def test_reduce_page_without_body():
+    text, report = reduce_page(b'<p>no body tag</p>', 'utf-8')
+    assert text == ''
+    assert report['saved_tokens'] == 0
+
+def test_helpers():
+    assert dedupe_blocks(['  A  b', '', 'a B', 'c']) == ['A b', 'c']
+    assert truncate_to_budget('short text', 100) == 'short text'
+    assert row_context({'Beschreibung': ' Baut Maschinen ', 'Kategorie': ''}) == 'Beschreibung: Baut Maschinen'
+    assert row_context({'firma': 'x'}) == ''
@@ -0,0 +1,86 @@
+import sys
+import os
+import csv
+import json
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from scripts import process_partners
+from src.journal import RunJournal, row_keys
+
+def test_row_keys_disambiguates_duplicates():
+    rows = [{'firma': 'Oxyle'}, {'firma': 'Qdrant'}, {'firma': 'Oxyle'}]
+    assert row_keys(rows, lambda r: r['firma']) == ['Oxyle', 'Qdrant', 'Oxyle#2']
+
+def test_journal_survives_truncated_last_line(tmp_path):
+    path = str(tmp_path / 'run.journal.jsonl')
+    journal = RunJournal(path)
+    journal.record('a', 'ok', {'x': 1})
+    journal.record('b', 'error', {'x': 2})
+    journal.close()
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"key": "c", "sta')
+
+    reloaded = RunJournal(path)
+    assert reloaded.status('a') == 'ok'
+    assert reloaded.status('b') == 'error'
+    assert reloaded.status('c') is None
+    assert not reloaded.should_process('a')
+    assert not reloaded.should_process('b')
+    assert reloaded.should_process('b', retry_errors=True)
+    assert reloaded.should_process('c')
+
+def write_partners(path, names):
+    with open(path, 'w', newline='', encoding='latin-1') as f:
+        writer = csv.DictWriter(f, fieldnames=[
+            'Company Name', 'Industry', 'Products/Services Offered',
+            'USP (Unique Selling Proposition) / Key Selling Points',
+            'Evaluation Score', 'Avg Leads Per Day'])
+        writer.writeheader()
+        for name in names:
+            writer.writerow({
+                'Company Name': name, 'Industry': 'HR', 'Products/Services Offered': 'software',
+                'USP (Unique Selling Proposition) / Key Selling Points': 'simple',
+                'Evaluation Score': '40', 'Avg Leads Per Day': '3'})
+
+def read_codes(path):
+    with open(path, encoding='utf-8') as f:
+        return [(r['Company Name'], json.loads(r['audience_codes'])) for r in csv.DictReader(f)]
+
+def test_process_partners_resume_and_retry_errors(tmp_path, monkeypatch):
+    input_file = str(tmp_path / 'partners.csv')
+    output_file = str(tmp_path / 'partners_with_codes.csv')
+    write_partners(input_file, ['A', 'B', 'C'])
+    classified = []
+
+    def fake_classify_many(descriptions, **kwargs):
+        results = []
+        for description in descriptions:
+            name = description.split(' ')[0]
+            classified.append(name)
+            if name == 'B' and classified.count('B') == 1:
+                results.append({"error": "Gemini API call failed: 503"})
+            else:
+                results.append({"primary": "F_HR", "secondary": []})
+        return results
+
+    monkeypatch.setattr(process_partners, 'classify_many', fake_classify_many)
+
+    process_partners.main(input_file=input_file, output_file=output_file)
+    assert classified == ['A', 'B', 'C']
+    assert 'error' in read_codes(output_file)[1][1]
+
+    # A plain resume skips every recorded row, including the failed one
+    process_partners.main(input_file=input_file, output_file=output_file, resume=True)
+    assert classified == ['A', 'B', 'C']
+
+    # Retrying errors only reclassifies B and replaces its row in place
+    process_partners.main(input_file=input_file, output_file=output_file,
+                          resume=True, retry_errors=True)
+    assert classified == ['A', 'B', 'C', 'B']
+    assert read_codes(output_file) == [
+        ('A', {"primary": "F_HR", "secondary": []}),
+        ('B', {"primary": "F_HR", "secondary": []}),
+        ('C', {"primary": "F_HR", "secondary": []}),
+    ]
@@ -0,0 +1,89 @@
+import sys
+import os
+import json
+from types import SimpleNamespace
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src import classifier, llm_client
+from src.cache import MemoryCache
+from src.llm_client import FakeLLMClient, GeminiClient
+
+class FakeGenai:
+    """
+    Minimal stand-in for the google.generativeai module.
+    """
+
+    def __init__(self):
+        self.configure_calls = 0
+        self.models_built = []
+
+    def configure(self, api_key=None):
+        self.configure_calls += 1
+
+    def GenerativeModel(self, model_name):
+        self.models_built.append(model_name)
+        return FakeModel()
+
+class FakeModel:
+    """
+    Records the generation config of every request.
+    """
+
+    def __init__(self):
+        self.configs = []
+
+    def generate_content(self, prompt, generation_config=None):
+        self.configs.append(generation_config)
+        return SimpleNamespace(text='{}', usage_metadata=None)
+
+def test_gemini_client_reuses_models(monkeypatch):
+    fake_genai = FakeGenai()
+    monkeypatch.setattr(llm_client, 'genai', fake_genai)
+    client = GeminiClient(api_key="test")
+
+    first = client.get_model("gemini-1.5-flash")
+    second = client.get_model("gemini-1.5-flash")
+    other = client.get_model("gemini-2.0-flash")
+
+    assert first is second
+    assert other is not first
+    assert fake_genai.configure_calls == 1
+    assert fake_genai.models_built == ["gemini-1.5-flash", "gemini-2.0-flash"]
+
+def test_pruned_taxonomy_schemas_share_one_model(monkeypatch):
+    fake_genai = FakeGenai()
+    monkeypatch.setattr(llm_client, 'genai', fake_genai)
+    monkeypatch.setattr(classifier, 'GENERATION_CONFIG_CACHE_SIZE', 2)
+    monkeypatch.setattr(classifier, '_generation_configs', {})
+    monkeypatch.setattr(classifier, 'JSON_MODE', True)
+    monkeypatch.setattr(classifier, '_json_mode_available', True)
+    client = GeminiClient(api_key="test")
+    taxonomy = classifier.get_taxonomy()
+    subsets = [taxonomy.subset(list(taxonomy.codes)[i:i + 3]) for i in range(5)]
+
+    for subset in subsets:
+        client.generate("prompt", classifier.MODEL_NAME, classifier.generation_config(subset))
+
+    assert fake_genai.models_built == [classifier.MODEL_NAME]
+    model = client.get_model(classifier.MODEL_NAME)
+    assert [c['response_schema']['properties']['primary']['enum'] for c in model.configs] == [
+        list(subset.codes) for subset in subsets]
+    assert len(classifier._generation_configs) == 2
+
+def test_classify_blurb_with_fake_client():
+    response = {"primary": "F_HR", "secondary": ["TECH_SAAS"], "explanation": "HR software."}
+    fake = FakeLLMClient(json.dumps(response))
+    llm_client.set_client(fake)
+    classifier.set_cache(MemoryCache())
+    try:
+        result = classifier.classify_blurb("An HR software vendor.")
+    finally:
+        llm_client.set_client(None)
+        classifier.set_cache(None)
+
+    assert result == response
+    assert len(fake.calls) == 1
+    assert fake.calls[0][0] == classifier.MODEL_NAME
+    assert "An HR software vendor." in fake.calls[0][1]
@@ -0,0 +1,222 @@
+import sys
+import os
+import csv
+import json
+import random
+
+import pytest
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.matching import MatchEngine, calculate_match_score
+from src.taxonomy import get_taxonomy
+
+def random_partners(rng, codes, count):
+    partners, partner_codes = [], []
+    for i in range(count):
+        partners.append({
+            'Company Name': f'Partner {i}',
+            'Evaluation Score': rng.choice(['', 'n/a', '0', '12', '47', str(rng.randint(1, 60))]),
+            'Avg Leads Per Day': rng.choice(['', '3', '51', '50', str(rng.randint(0, 120))]),
+        })
+        partner_codes.append(rng.sample(codes, rng.randint(0, 4)))
+    return partners, partner_codes
+
+def test_engine_matches_calculate_match_score_exactly():
+    rng = random.Random(7)
+    taxonomy = get_taxonomy()
+    # Include codes outside the taxonomy, and a vertical/regulated pair, to cover every branch
+    codes = sorted(taxonomy.code_set) + ['V_BANK', 'V_HOSP', 'HC_PHARM', 'X_SAAS']
+    partners, partner_codes = random_partners(rng, codes, 60)
+    engine = MatchEngine(partners, partner_codes, taxonomy)
+
+    for _ in range(200):
+        prospect_codes = rng.sample(codes, rng.randint(0, 4))
+        expected = []
+        for j, partner in enumerate(partners):
+            score, overlap_type = calculate_match_score(prospect_codes, partner_codes[j], partner)
+            if score > 0:
+                expected.append((j, score, overlap_type))
+        assert list(engine.match(prospect_codes)) == expected
+
+def test_engine_only_scores_partners_sharing_a_code():
+    partners = [{'Company Name': 'A'}, {'Company Name': 'B'}, {'Company Name': 'C'}]
+    engine = MatchEngine(partners, [['F_HR'], ['X_SME'], ['F_HR', 'X_SME']])
+    assert engine.candidates(['F_HR']) == [0, 2]
+    assert engine.candidates(['TECH_SAAS']) == []
+    assert [j for j, _, _ in engine.match(['X_SME'])] == [1, 2]
+
+def test_top_k_matches_stable_sort_of_all_matches():
+    rng = random.Random(11)
+    codes = sorted(get_taxonomy().code_set)
+    partners, partner_codes = random_partners(rng, codes, 80)
+    engine = MatchEngine(partners, partner_codes)
+
+    for _ in range(100):
+        prospect_codes = rng.sample(codes, rng.randint(1, 4))
+        expected = sorted(engine.match(prospect_codes), key=lambda m: m[1], reverse=True)[:3]
+        assert engine.top_k(prospect_codes, 3) == expected
+
+def test_run_streaming_writes_top_k_per_prospect(tmp_path):
+    from scripts.run_matching import run_streaming
+
+    partners_file = tmp_path / 'partners.csv'
+    prospects_file = tmp_path / 'prospects.csv'
+    output_file = tmp_path / 'matches.csv'
+    partners_file.write_text(
+        'Company Name,Evaluation Score,Avg Leads Per Day,audience_codes\n'
+        'A,10,1,"{""primary"": ""F_HR"", ""secondary"": []}"\n'
+        'B,40,60,"{""primary"": ""F_HR"", ""secondary"": [""X_SME""]}"\n'
+        'C,5,1,"{""primary"": ""X_SME"", ""secondary"": []}"\n',
+        encoding='utf-8')
+    prospects_file.write_text(
+        'firma,url,audience_codes\n'
+        'P1,p1.example,"{""primary"": ""F_HR"", ""secondary"": []}"\n'
+        'P2,p2.example,"{""primary"": ""TECH_SAAS"", ""secondary"": []}"\n'
+        'P3,p3.example,"{""primary"": ""X_SME"", ""secondary"": []}"\n',
+        encoding='utf-8')
+
+    run_streaming(top_k=1, partners_file=str(partners_file),
+                  prospects_file=str(prospects_file), output_file=str(output_file))
+
+    with open(output_file, encoding='utf-8') as f:
+        rows = list(csv.DictReader(f))
+    assert [(r['prospect_firma'], r['partner_name'], r['overlap_type']) for r in rows] == [
+        ('P1', 'B', 'FUNCTIONAL'),
+        ('P3', 'B', 'HORIZONTAL'),
+    ]
+
+def test_reports_score_raw_codes_outside_the_taxonomy(tmp_path):
+    from scripts.run_matching import main
+
+    partner = {'Company Name': 'A', 'Evaluation Score': '3', 'Avg Leads Per Day': '1',
+               'audience_codes': json.dumps({"primary": "V_HEALTH", "secondary": ["F_HR"]})}
+    prospects = [{'firma': 'P1', 'url': 'p1', 'audience_codes': json.dumps({"primary": "V_HEALTH", "secondary": ["F_HR"]})},
+                 {'firma': 'P2', 'url': 'p2', 'audience_codes': json.dumps({"primary": "V_BANK", "secondary": ["F_HR"]})}]
+    partners_file = str(tmp_path / 'partners_with_codes.csv')
+    prospects_file = str(tmp_path / 'prospects_with_codes.csv')
+    write_codes_csv(partners_file, list(partner), [partner])
+    write_codes_csv(prospects_file, list(prospects[0]), prospects)
+    expected = [calculate_match_score(codes, ['V_HEALTH', 'F_HR'], partner)
+                for codes in (['V_HEALTH', 'F_HR'], ['V_BANK', 'F_HR'])]
+    assert [overlap_type for _, overlap_type in expected] == ['VERTICAL', 'FUNCTIONAL']
+
+    for binary in (False, True):
+        output_file = str(tmp_path / f'matches_{binary}.csv')
+        main(partners_file=partners_file, prospects_file=prospects_file, output_file=output_file, binary=binary)
+        with open(output_file, encoding='utf-8') as f:
+            rows = list(csv.DictReader(f))
+        assert [(float(r['match_score']), r['overlap_type']) for r in rows] == expected
+
+def write_codes_csv(path, header, rows):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=header)
+        writer.writeheader()
+        writer.writerows(rows)
+
+def test_run_incremental_matches_full_run_after_changes(tmp_path, capsys):
+    from scripts.run_matching import main, run_incremental
+
+    rng = random.Random(5)
+    codes = ['F_HR', 'F_SALES', 'X_SME', 'X_HORIZ', 'HC_HOSP', 'FIN_BANK', 'TECH_SAAS', 'MFG_SM']
+
+    def codes_cell():
+        primary, *secondary = rng.sample(codes, rng.randint(1, 3))
+        return json.dumps({"primary": primary, "secondary": secondary})
+
+    partners = [{'Company Name': f'Partner {i}', 'Evaluation Score': str(rng.randint(0, 50)),
+                 'Avg Leads Per Day': str(rng.choice([1, 3, 60])), 'audience_codes': codes_cell()}
+                for i in range(40)]
+    prospects = [{'firma': f'Prospect {i % 45}', 'url': f'p{i}.example', 'audience_codes': codes_cell()}
+                 for i in range(50)]
+    files = {name: str(tmp_path / f'{name}.csv') for name in ('partners', 'prospects', 'full', 'incremental')}
+
+    def check(expected_counts=None):
+        write_codes_csv(files['partners'], list(partners[0]), partners)
+        write_codes_csv(files['prospects'], list(prospects[0]), prospects)
+        main(top_k=3, partners_file=files['partners'], prospects_file=files['prospects'],
+             output_file=files['full'])
+        run_incremental(top_k=3, partners_file=files['partners'], prospects_file=files['prospects'],
+                        output_file=files['incremental'])
+        with open(files['full'], encoding='utf-8') as f, open(files['incremental'], encoding='utf-8') as g:
+            assert f.read() == g.read()
+        with open(str(tmp_path / 'incremental.csv.state.json'), encoding='utf-8') as f:
+            return json.load(f)
+
+    state = check()
+    assert len(state['prospects']) == 50
+    with open(str(tmp_path / 'incremental_delta.csv'), encoding='utf-8') as f:
+        assert {row['change'] for row in csv.DictReader(f)} == {'added'}
+
+    partners[3]['audience_codes'] = codes_cell()
+    partners[7]['Evaluation Score'] = '49'
+    partners.append({'Company Name': 'Partner new', 'Evaluation Score': '45',
+                     'Avg Leads Per Day': '60', 'audience_codes': codes_cell()})
+    del partners[11]
+    prospects[2]['audience_codes'] = codes_cell()
+    del prospects[20]
+    prospects.append({'firma': 'Prospect new', 'url': 'new.example',
+                      'audience_codes': json.dumps({"primary": "F_HR", "secondary": ["X_SME"]})})
+    capsys.readouterr()
+    check()
+    # Only the changed prospect, the new one and those touched by changed partners are scored
+    printed = capsys.readouterr().out
+    assert 'Prospects: 2 scored,' in printed and ' 1 removed.' in printed
+    assert ' 0 unchanged' not in printed
+
+    with open(str(tmp_path / 'incremental_delta.csv'), encoding='utf-8') as f:
+        delta = list(csv.DictReader(f))
+    assert {row['change'] for row in delta} <= {'added', 'removed', 'changed'}
+    assert any(row['prospect_firma'] == 'Prospect new' and row['change'] == 'added' for row in delta)
+    assert any(row['prospect_url'] == 'p20.example' and row['change'] == 'removed' for row in delta)
+
+def test_pair_table_reranks_like_an_engine_built_with_the_config(tmp_path, monkeypatch):
+    from src import matching
+    from src.weight_sweep import PairTable, baseline_config, load_sweep
+
+    rng = random.Random(13)
+    codes = sorted(get_taxonomy().code_set) + ['V_BANK', 'V_HOSP', 'HC_PHARM']
+    partners, partner_codes = random_partners(rng, codes, 60)
+    prospect_codes = [rng.sample(codes, rng.randint(0, 4)) for _ in range(80)]
+    sweep_file = tmp_path / 'sweep.json'
+    sweep_file.write_text(json.dumps({
+        'grid': {'HORIZONTAL_WEIGHT': [0.5, 0.9], 'LEAD_VOLUME_THRESHOLD': [20, 50]},
+        'configs': [{'name': 'flat', 'VERTICAL_WEIGHT': 0.5, 'EVALUATION_SCORE_BOOST': 0.0}],
+    }))
+    configs = load_sweep(str(sweep_file))
+    assert [name for name, _ in configs][:2] == ['baseline', 'HORIZONTAL_WEIGHT=0.5,LEAD_VOLUME_THRESHOLD=20']
+    assert len(configs) == 6 and configs[0][1] == baseline_config()
+
+    engine = MatchEngine(partners, partner_codes)
+    table = PairTable(engine, [engine.encode(c) for c in prospect_codes])
+    for name, config in configs:
+        tops = table.rank(config, 3)
+        for attribute, value in config.items():
+            monkeypatch.setattr(matching, attribute, value)
+        reference = MatchEngine(partners, partner_codes)
+        for i, c in enumerate(prospect_codes):
+            assert tops[table.group_of[i]] == [j for j, _, _ in reference.top_k(c, 3)], name
+
+    sweep_file.write_text(json.dumps({'grid': {'VERTICAL_WIEGHT': [1.0]}}))
+    with pytest.raises(ValueError, match='VERTICAL_WIEGHT'):
+        load_sweep(str(sweep_file))
+
+def test_compare_rankings_reports_changes_against_baseline():
+    from src.weight_sweep import compare_rankings
+
+    class Table:
+        group_sizes = {0: 3, 1: 1, 2: 5}
+
+    names = ['A', 'B', 'C', 'D']
+    baseline = [[0, 1, 2], [1], []]
+    metrics = compare_rankings(Table, baseline, baseline, names)
+    assert metrics['prospects'] == 4 and metrics['changed_prospects'] == 0.0
+    assert metrics['mean_overlap'] == 1.0 and metrics['biggest_gains'] == ''
+
+    metrics = compare_rankings(Table, baseline, [[1, 0, 3], [1], []], names)
+    assert metrics['changed_prospects'] == 0.75 and metrics['top1_changed'] == 0.75
+    assert metrics['mean_overlap'] == round((3 * 2 / 3 + 1) / 4, 4)
+    assert metrics['mean_rank_shift'] == 0.75
+    assert metrics['entered'] == 3 and metrics['left'] == 3
+    assert metrics['biggest_gains'] == 'D +3' and metrics['biggest_losses'] == 'C -3'
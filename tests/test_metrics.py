@@ -0,0 +1,57 @@
+import sys
+import os
+import json
+import threading
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.metrics import Histogram, Metrics, get_metrics, set_metrics, write_run_summary
+
+def test_histogram_buckets_and_quantiles():
+    histogram = Histogram(buckets=(0.1, 1.0))
+    for value in (0.05, 0.05, 0.5, 2.0):
+        histogram.observe(value)
+    summary = histogram.summary()
+    assert summary['count'] == 4
+    assert summary['buckets'] == {'<=0.1': 2, '<=1.0': 1, '>1.0': 1}
+    assert summary['p50'] == 0.1
+    assert summary['p95'] == 2.0
+    assert summary['min'] == 0.05 and summary['max'] == 2.0
+
+def test_metrics_counters_are_labelled_and_thread_safe():
+    metrics = Metrics()
+
+    def work():
+        for _ in range(1000):
+            metrics.inc('classifier.cache', result='hit')
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    metrics.inc('classifier.cache', result='miss')
+    assert metrics.counter('classifier.cache', result='hit') == 4000
+    assert metrics.snapshot()['counters'] == {
+        'classifier.cache{result=hit}': 4000,
+        'classifier.cache{result=miss}': 1,
+    }
+
+def test_write_run_summary(tmp_path):
+    previous = get_metrics()
+    set_metrics(Metrics())
+    try:
+        with get_metrics().timer('llm.latency_seconds', model='m'):
+            pass
+        path = str(tmp_path / 'out' / 'run.json')
+        write_run_summary(path, script='test', rows={'ok': 3, 'error': 0})
+    finally:
+        set_metrics(previous)
+
+    with open(path, encoding='utf-8') as f:
+        summary = json.load(f)
+    assert summary['script'] == 'test'
+    assert summary['rows'] == {'ok': 3, 'error': 0}
+    assert summary['metrics']['histograms']['llm.latency_seconds{model=m}']['count'] == 1
+    assert 'seconds' in summary
@@ -0,0 +1,74 @@
+import sys
+import os
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src import classifier, llm_client
+from src.cache import MemoryCache
+from src.classifier import BatchStats, classify_many
+from src.llm_client import FakeLLMClient
+from src.near_duplicates import NearDuplicateIndex, choose_bands, normalize_description
+
+HR = "{} is a company in the HR sector. They offer payroll software. Their unique selling proposition is: simple."
+LOGISTICS = "Gamma is a company in the logistics sector. They offer fleet telematics for haulage firms."
+
+def test_normalize_description():
+    assert normalize_description("  Payroll-Software,  for SMEs! ") == "payroll software for smes"
+    assert normalize_description("Acme GmbH builds tools.", name="ACME GmbH") == "builds tools"
+
+def test_choose_bands_keeps_threshold_pairs_as_candidates():
+    bands, rows = choose_bands(64, 0.9)
+    assert bands * rows == 64
+    assert (1 / bands) ** (1 / rows) <= 0.8
+
+def test_index_matches_templated_blurbs_ignoring_company_name():
+    index = NearDuplicateIndex(threshold=0.9)
+    index.add(HR.format("Acme GmbH"), "Acme GmbH")
+    representative, similarity = index.match(HR.format("Beta AG") + "!", "Beta AG")
+    assert representative == HR.format("Acme GmbH")
+    assert similarity >= 0.9
+    assert index.match(LOGISTICS, "Gamma") is None
+    assert NearDuplicateIndex(threshold=0.99).match(HR.format("Beta AG"), "Beta AG") is None
+
+def test_classify_many_shares_results_across_near_duplicates():
+    fake = FakeLLMClient('{"primary": "F_HR", "secondary": [], "explanation": "payroll"}')
+    llm_client.set_client(fake)
+    classifier.set_cache(MemoryCache())
+    index = NearDuplicateIndex()
+    stats = BatchStats()
+    try:
+        names = ["Acme GmbH", "Beta AG", "Gamma"]
+        first = classify_many([HR.format(n) for n in names[:2]] + [LOGISTICS],
+                              stats=stats, near_duplicates=index, names=names)
+        # A later call still finds the earlier representative
+        second = classify_many([HR.format("Delta KG")], stats=stats, near_duplicates=index,
+                               names=["Delta KG"])
+    finally:
+        llm_client.set_client(None)
+        classifier.set_cache(None)
+
+    assert len(fake.calls) == 2
+    assert 'near_duplicate_of' not in first[0]
+    assert first[1]['primary'] == 'F_HR'
+    assert first[1]['near_duplicate_of'] == HR.format("Acme GmbH")
+    assert first[1]['similarity'] >= 0.9
+    assert second[0]['near_duplicate_of'] == HR.format("Acme GmbH")
+    assert stats.near_duplicates == 2
+    assert [member for member, _, _ in index.provenance] == [HR.format("Beta AG"), HR.format("Delta KG")]
+
+def test_failed_representative_is_not_shared():
+    # The first description's answer and its repair are both unusable
+    responses = iter(['not json', 'still not json', '{"primary": "F_HR", "secondary": [], "explanation": "x"}'])
+    llm_client.set_client(FakeLLMClient(lambda prompt, model: next(responses)))
+    classifier.set_cache(MemoryCache())
+    try:
+        results = classify_many([HR.format("Acme"), HR.format("Beta")], max_concurrency=1,
+                                near_duplicates=NearDuplicateIndex(), names=["Acme", "Beta"])
+    finally:
+        llm_client.set_client(None)
+        classifier.set_cache(None)
+
+    assert 'error' in results[0]
+    assert results[1]['primary'] == 'F_HR'
+    assert 'near_duplicate_of' not in results[1]
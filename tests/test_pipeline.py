@@ -0,0 +1,99 @@
+import sys
+import os
+import threading
+import time
+
+import pytest
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.pipeline import Pipeline, Stage, StageFailure
+
+def test_pipeline_preserves_order_and_isolates_failures():
+    def scrape(n):
+        time.sleep(0.001 * (n % 5))
+        return n * 10
+
+    def summarize(n):
+        if n == 30:
+            raise ValueError("bad page")
+        return n + 1
+
+    pipeline = Pipeline([
+        Stage('scrape', scrape, workers=4),
+        Stage('summarize', summarize, workers=2),
+        Stage('classify', lambda n: f"code-{n}", workers=3),
+    ])
+    results = list(pipeline.run(range(20)))
+
+    assert isinstance(results[3], StageFailure)
+    assert results[3].stage == 'summarize'
+    assert [r for i, r in enumerate(results) if i != 3] == [f"code-{n * 10 + 1}" for n in range(20) if n != 3]
+    summaries = [stage.summary() for stage in pipeline.stages]
+    assert [s['processed'] for s in summaries] == [20, 20, 19]
+    assert summaries[1]['failures'] == 1
+
+def test_pipeline_overlaps_stages():
+    delay = 0.02
+    pipeline = Pipeline([
+        Stage('a', lambda n: time.sleep(delay) or n, workers=1),
+        Stage('b', lambda n: time.sleep(delay) or n, workers=1),
+        Stage('c', lambda n: time.sleep(delay) or n, workers=1),
+    ])
+    started = time.monotonic()
+    assert list(pipeline.run(range(10))) == list(range(10))
+    elapsed = time.monotonic() - started
+    # Sequential execution would take 30 * delay; pipelined is about 12 * delay
+    assert elapsed < 22 * delay
+
+def test_pipeline_batches_and_bounds_in_flight_items():
+    fed = []
+    lock = threading.Lock()
+    max_gap = [0]
+    yielded = [0]
+
+    def source():
+        for n in range(50):
+            with lock:
+                fed.append(n)
+                max_gap[0] = max(max_gap[0], len(fed) - yielded[0])
+            yield n
+
+    batches = []
+    pipeline = Pipeline([
+        Stage('double', lambda n: n * 2, workers=2, queue_size=2),
+        Stage('pack', lambda ns: (batches.append(len(ns)), [n + 1 for n in ns])[1],
+              workers=1, queue_size=4, batch_size=4),
+    ], max_in_flight=6)
+
+    results = []
+    for value in pipeline.run(source()):
+        results.append(value)
+        with lock:
+            yielded[0] += 1
+
+    assert results == [n * 2 + 1 for n in range(50)]
+    assert max(batches) <= 4
+    assert sum(batches) == 50
+    assert max_gap[0] <= 7
+
+def test_pipeline_raises_item_errors_after_the_fed_items():
+    def items():
+        yield 1
+        yield 2
+        raise RuntimeError("bad input row")
+
+    pipeline = Pipeline([Stage('double', lambda n: n * 2, workers=2)])
+    results = []
+    with pytest.raises(RuntimeError, match="bad input row"):
+        for result in pipeline.run(items()):
+            results.append(result)
+    assert results == [2, 4]
+
+def test_pipeline_fails_batches_that_return_too_few_results():
+    pipeline = Pipeline([Stage('classify', lambda batch: batch[:-1], batch_size=3)])
+    results = list(pipeline.run(range(3)))
+    assert len(results) == 3
+    assert all(isinstance(r, StageFailure) and r.stage == 'classify' for r in results)
+    assert pipeline.stages[0].failures == 3
@@ -0,0 +1,127 @@
+import sys
+import os
+import csv
+import json
+
+import pytest
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from scripts import process_partners
+from src.prefilter import PrefilterStats, RuleClassifier, load_rules
+
+RULES = [
+    {"code": "LEG_LAW", "keywords": ["law firm", "LegalTech"]},
+    {"code": "X_SME", "keywords": ["smes"]},
+    {"code": "HC_HOSP", "keywords": ["hospital"]},
+    {"code": "HC_PC", "keywords": ["doctors"]},
+    {"code": "NOT_A_CODE", "keywords": ["anything"]},
+]
+COLUMNS = {"Customer Target Segments Category": 2.0, "Industry Category": 1.0, "Kategorie": 2.0}
+
+def test_rule_classifier_answers_only_clear_rows():
+    rules = RuleClassifier(RULES, COLUMNS)
+    assert [code for code, _ in rules.rules] == ['LEG_LAW', 'X_SME', 'HC_HOSP', 'HC_PC']
+
+    result = rules.classify({'Customer Target Segments Category': 'Legal Sector (B2B - Law Firms); SMEs',
+                             'Industry Category': 'LegalTech Software'})
+    assert result['primary'] == 'LEG_LAW'
+    assert result['secondary'] == ['X_SME']
+    assert "'law firm' in Customer Target Segments Category" in result['explanation']
+
+    # One keyword in one column is not enough, however strong the column
+    assert rules.classify({'Customer Target Segments Category': 'Legal Sector (B2B - Law Firms)',
+                           'Industry Category': 'EdTech / Healthcare Training'}) is None
+    assert rules.classify({'Kategorie': 'legaltech / Notariat'}) is None
+    assert RuleClassifier(RULES, COLUMNS, min_score=2.0, min_columns=1).classify(
+        {'Kategorie': 'legaltech / Notariat'})['primary'] == 'LEG_LAW'
+    # Two equally strong codes are ambiguous, a weak column alone is not enough
+    assert rules.classify({'Customer Target Segments Category': 'Hospitals, Doctors',
+                           'Industry Category': 'Hospital and doctors software'}) is None
+    assert rules.classify({'Industry Category': 'LegalTech'}) is None
+    assert rules.classify({'Kategorie': 'Softwareentwicklung'}) is None
+
+def test_default_rules_answer_partner_and_prospect_rows():
+    # Rows as they appear in the partner and prospect exports in data/
+    partners = load_rules(profile='partners')
+    assert partners.classify({
+        'Industry': 'Legal Tech Software (specifically for notaries)',
+        'Products/Services Offered': 'Digital client data sheets for all 28 appointment types for notaries',
+    })['primary'] == 'LEG_LAW'
+    assert partners.classify({
+        'Industry': 'Cloud-based HR Software; SaaS (HR Tech)',
+        'Products/Services Offered': 'Cloud-based HR software platform offering: Personnel management',
+    })['primary'] == 'F_HR'
+    assert partners.classify({
+        'Industry': 'Logistics and Freight Forwarding; Supplier of components and systems',
+        'Products/Services Offered': 'Land transport (Europe-wide groupage, part, and full loads); Air freight',
+    })['primary'] == 'LOG_3PL'
+    # Partners the LLM put elsewhere; a keyword in the products alone is not enough
+    assert partners.classify({
+        'Industry': 'Digital Recruitment Platform for Healthcare Professionals; HR Tech for Healthcare',
+        'Products/Services Offered': 'Digital platform for direct access to a pool of healthcare candidates',
+    }) is None
+    assert partners.classify({
+        'Industry': 'Healthcare Staffing & Training Services',
+        'Products/Services Offered': 'Training provider for nursing homes',
+    }) is None
+
+    prospects = load_rules(profile='prospects')
+    assert prospects.classify({'Kategorie': 'LegalTech / Notariat'})['primary'] == 'LEG_LAW'
+    assert prospects.classify({'Kategorie': 'Verpackungsindustrie'})['primary'] == 'MFG_SM'
+    assert prospects.classify({'Kategorie': 'Medizintechnik  Ophthalmologie / Augenchirurgie'})['primary'] == 'HC_DEVICE'
+    assert prospects.classify({'Kategorie': 'Softwareentwicklung'}) is None
+    assert prospects.classify({'Kategorie': ''}) is None
+
+    with pytest.raises(ValueError):
+        load_rules(profile='nope')
+
+def test_prefilter_stats_audits_every_nth_fast_row():
+    stats = PrefilterStats(audit_rate=0.5)
+    rule = {"primary": "LEG_LAW", "secondary": []}
+    audits = [stats.admit(result) for result in [rule, None, rule, rule, rule]]
+    assert audits == [False, False, True, False, True]
+    stats.record_audit(rule, {"primary": "LEG_LAW"})
+    stats.record_audit(rule, {"primary": "LEG_IP"}, label='Kanzlei X')
+    assert stats.avoided() == 2
+    report = stats.report()
+    assert '4 of 5 rows matched a rule, 2 LLM calls avoided (40%)' in report
+    assert 'agreement with the LLM on 2 audited rows: 50%' in report
+    assert 'Kanzlei X: rules LEG_LAW, LLM LEG_IP' in report
+
+def test_process_partners_skips_llm_for_rule_matches(tmp_path, monkeypatch):
+    input_file = str(tmp_path / 'partners.csv')
+    output_file = str(tmp_path / 'partners_with_codes.csv')
+    fields = ['Company Name', 'Industry', 'Products/Services Offered',
+              'USP (Unique Selling Proposition) / Key Selling Points', 'Industry Category',
+              'Customer Target Segments Category', 'Evaluation Score', 'Avg Leads Per Day']
+    with open(input_file, 'w', newline='', encoding='latin-1') as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        for name, industry in [('Lex', 'Legal Tech Software'), ('Gen', 'Software')]:
+            writer.writerow({'Company Name': name, 'Industry': industry, 'Products/Services Offered': 'x',
+                             'USP (Unique Selling Proposition) / Key Selling Points': 'y',
+                             'Industry Category': 'Legal Technology (SaaS)',
+                             'Customer Target Segments Category': 'Legal Sector (B2B - Law Firms)',
+                             'Evaluation Score': '40', 'Avg Leads Per Day': '3'})
+    classified = []
+
+    def fake_classify_many(descriptions, **kwargs):
+        classified.extend(d.split(' ')[0] for d in descriptions)
+        return [{"primary": "TECH_SAAS", "secondary": []} for _ in descriptions]
+
+    monkeypatch.setattr(process_partners, 'classify_many', fake_classify_many)
+    process_partners.main(input_file=input_file, output_file=output_file, use_rules=True, audit_rate=0)
+
+    assert classified == ['Gen']
+    with open(output_file, encoding='utf-8') as f:
+        codes = [json.loads(r['audience_codes'])['primary'] for r in csv.DictReader(f)]
+    assert codes == ['LEG_LAW', 'TECH_SAAS']
+
+    with open(output_file + '.run.json', encoding='utf-8') as f:
+        summary = json.load(f)
+    assert summary['script'] == 'process_partners'
+    assert summary['prefilter']['fast_path'] == 1
+    assert summary['prefilter']['llm_calls_avoided'] == 1
+    assert summary['rows'] == {'ok': 2, 'error': 0}
@@ -0,0 +1,91 @@
+import sys
+import os
+import json
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from scripts import tune_retrieval
+from src import classifier, llm_client
+from src.cache import MemoryCache, make_cache_key
+from src.classifier import MODEL_NAME, PROMPT_VERSION, build_prompt, classify_blurb, classify_many
+from src.llm_client import FakeLLMClient
+from src.retrieval import CodeRetriever, learn_keywords, load_retriever, recall_at
+from src.taxonomy import Taxonomy, get_taxonomy
+
+def test_candidates_rank_matching_codes_first_and_keep_fallbacks():
+    retriever = load_retriever(top_n=8)
+    candidates = retriever.candidates("Software for nursing homes and care facilities (Pflegeheime).")
+    assert candidates[0] == 'HC_LTC'
+    assert candidates[-2:] == ['UNKNOWN', 'OTHER']
+    assert len(candidates) == 10
+    # Nothing matches: the most frequent codes in past answers come first
+    assert retriever.candidates("Lorem ipsum.")[0] == 'X_SME'
+
+def test_pruned_prompt_size_does_not_grow_with_the_taxonomy():
+    base = get_taxonomy()
+    large = Taxonomy(dict(base.codes, **{f'NEW_{i}': f'Sector {i} ► Niche {i}' for i in range(500)}))
+    description = "A payroll software vendor for HR departments."
+    sizes = [len(build_prompt(description, CodeRetriever(taxonomy, top_n=10).prune(description)))
+             for taxonomy in (base, large)]
+    assert len(CodeRetriever(large, top_n=10).prune(description)) == 12
+    assert abs(sizes[0] - sizes[1]) < 200
+    assert sizes[1] < len(build_prompt(description, large)) / 5
+
+def test_classify_with_retriever_prompts_with_candidates_only():
+    answer = {"primary": "HC_LTC", "secondary": [], "explanation": "Care homes."}
+    fake = FakeLLMClient(json.dumps(answer))
+    cache = MemoryCache()
+    description = "Rostering software for nursing homes."
+    llm_client.set_client(fake)
+    classifier.set_cache(cache)
+    classifier.set_retriever(load_retriever(top_n=6))
+    try:
+        assert classify_blurb(description) == answer
+        prompt = fake.calls[0][1]
+        assert '"HC_LTC"' in prompt and '"UNKNOWN"' in prompt and '"LEG_IP"' not in prompt
+        # Pruned answers are cached apart from full-prompt ones
+        version = get_taxonomy().version
+        assert cache.get(make_cache_key(description, version, MODEL_NAME, PROMPT_VERSION)) is None
+        assert cache.get(make_cache_key(description, version, MODEL_NAME, PROMPT_VERSION + '+top6')) == answer
+
+        # A full-prompt answer is reused, in single and packed mode
+        other = "Payroll for SMEs."
+        cache.set(make_cache_key(other, version, MODEL_NAME, PROMPT_VERSION), answer)
+        assert classify_blurb(other) == answer
+        assert classify_many([other, description], pack_size=2) == [answer, answer]
+        assert len(fake.calls) == 1
+    finally:
+        llm_client.set_client(None)
+        classifier.set_cache(None)
+        classifier.set_retriever(None)
+
+def test_learned_keywords_raise_recall_and_tuning_recommends_a_size(tmp_path, monkeypatch, capsys):
+    taxonomy = get_taxonomy()
+    labelled = [(f"Zorblat widget {i} for gadget makers.", 'LEG_IP', ['LEG_IP']) for i in range(10)]
+    labelled += [(f"Crm tool number {i} for sales teams.", 'F_SALES', ['F_SALES', 'X_SME']) for i in range(10)]
+    plain = CodeRetriever(taxonomy, top_n=4)
+    assert recall_at(plain, labelled, [4])[0]['primary_recall'] < 1.0
+
+    keywords, frequencies = learn_keywords(((d, codes) for d, _, codes in labelled), taxonomy)
+    assert 'zorbla' in keywords['LEG_IP'] and frequencies['X_SME'] == 10
+    learned = CodeRetriever(taxonomy, keywords, frequencies, top_n=4)
+    assert recall_at(learned, labelled, [1, 4]) == [
+        {'top_n': 1, 'primary_recall': 1.0, 'code_recall': 0.6667},
+        {'top_n': 4, 'primary_recall': 1.0, 'code_recall': 1.0},
+    ]
+
+    cache = MemoryCache()
+    for description, primary, codes in labelled:
+        cache.set(make_cache_key(description, taxonomy.version, MODEL_NAME, PROMPT_VERSION),
+                  {"primary": primary, "secondary": codes[1:], "explanation": ""})
+    monkeypatch.setattr(tune_retrieval, 'get_cache', lambda taxonomy: cache)
+    keywords_file = str(tmp_path / 'keywords.json')
+    with open(keywords_file, 'w', encoding='utf-8') as f:
+        json.dump({"keywords": {"LEG_IP": ["patent"]}}, f)
+    size = tune_retrieval.main([d for d, _, _ in labelled] + ["Uncached."], sizes=[1, 2, 4],
+                               keywords_file=keywords_file, learn=True)
+    assert size == 1
+    assert '20 of 21 descriptions have a cached answer.' in capsys.readouterr().out
+    with open(keywords_file, encoding='utf-8') as f:
+        assert json.load(f)['keywords']['LEG_IP'][0] == 'patent'
@@ -0,0 +1,142 @@
+import sys
+import os
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+
+from src import classifier
+from src.cache import MemoryCache
+from src.scheduler import RequestScheduler, TokenBucket, is_retryable, set_scheduler
+
+class FakeClock:
+    """
+    Manually advanced clock; sleep() just moves time forward.
+    """
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+class ApiError(Exception):
+    def __init__(self, code):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+
+class FakeLLM:
+    """
+    Fails with the given errors first, then returns a fixed response.
+    """
+
+    def __init__(self, errors, response="ok"):
+        self.errors = list(errors)
+        self.response = response
+        self.calls = 0
+
+    def __call__(self, prompt):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return self.response
+
+def make_scheduler(clock, **kwargs):
+    return RequestScheduler(clock=clock, sleep=clock.sleep, **kwargs)
+
+def test_is_retryable():
+    assert is_retryable(ApiError(429))
+    assert is_retryable(ApiError(503))
+    assert not is_retryable(ApiError(400))
+    assert not is_retryable(ValueError("bad"))
+
+def test_token_bucket_wait_time():
+    clock = FakeClock()
+    bucket = TokenBucket(60, clock=clock)  # one token per second
+    bucket.consume(60)
+    assert bucket.wait_time(1) == pytest.approx(1.0)
+    clock.now += 2
+    assert bucket.wait_time(1) == 0
+
+def test_retries_transient_errors_and_counts_them():
+    clock = FakeClock()
+    scheduler = make_scheduler(clock, max_retries=3)
+    llm = FakeLLM([ApiError(429), ApiError(503)])
+
+    assert scheduler.call(llm, "prompt") == "ok"
+    assert llm.calls == 3
+    assert scheduler.metrics['retries'] == 2
+    assert scheduler.metrics['failures'] == 0
+
+def test_non_retryable_error_is_raised_immediately():
+    clock = FakeClock()
+    scheduler = make_scheduler(clock)
+    llm = FakeLLM([ApiError(400)])
+
+    with pytest.raises(ApiError):
+        scheduler.call(llm, "prompt")
+    assert llm.calls == 1
+    assert scheduler.metrics['failures'] == 1
+
+def test_gives_up_after_max_retries():
+    clock = FakeClock()
+    scheduler = make_scheduler(clock, max_retries=2)
+    llm = FakeLLM([ApiError(500)] * 5)
+
+    with pytest.raises(ApiError):
+        scheduler.call(llm, "prompt")
+    assert llm.calls == 3
+    assert scheduler.metrics['retries'] == 2
+
+def test_request_rate_limit_throttles():
+    clock = FakeClock()
+    scheduler = make_scheduler(clock, requests_per_minute=2)
+    llm = FakeLLM([])
+
+    for _ in range(4):
+        scheduler.call(llm, "prompt")
+    # Two requests fit in the bucket, the next two wait for refills
+    assert clock.now == pytest.approx(60.0)
+    assert scheduler.metrics['throttle_seconds'] == pytest.approx(60.0)
+
+def test_token_rate_limit_throttles():
+    clock = FakeClock()
+    scheduler = make_scheduler(clock, tokens_per_minute=100)
+    llm = FakeLLM([])
+
+    scheduler.call(llm, "prompt", estimated_tokens=100)
+    scheduler.call(llm, "prompt", estimated_tokens=50)
+    assert clock.now == pytest.approx(30.0)
+
+def test_circuit_breaker_pauses_run():
+    clock = FakeClock()
+    scheduler = make_scheduler(clock, max_retries=3, failure_threshold=2, cooldown=120.0,
+                               base_delay=0.0)
+    llm = FakeLLM([ApiError(503), ApiError(503)])
+
+    assert scheduler.call(llm, "prompt") == "ok"
+    assert scheduler.metrics['circuit_opens'] == 1
+    assert clock.now >= 120.0
+
+def test_failed_llm_call_is_not_cached(monkeypatch):
+    clock = FakeClock()
+    set_scheduler(make_scheduler(clock, max_retries=1, base_delay=0.0))
+    classifier.set_cache(MemoryCache())
+    responses = iter(['{"error": "Gemini API call failed: 503"}',
+                      '{"primary": "F_HR", "secondary": [], "explanation": ""}'])
+    monkeypatch.setattr(classifier, 'call_llm', lambda prompt, generation_config=None: next(responses))
+    try:
+        first = classifier.classify_blurb("An HR vendor.")
+        second = classifier.classify_blurb("An HR vendor.")
+    finally:
+        classifier.set_cache(None)
+        set_scheduler(None)
+
+    assert "error" in first
+    assert second["primary"] == "F_HR"
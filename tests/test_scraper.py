@@ -0,0 +1,143 @@
+import sys
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+
+from src.cache import ScrapeCache
+from src.scraper import Scraper, normalize_url
+
+class PageHandler(BaseHTTPRequestHandler):
+    """
+    Serves a handful of synthetic pages for scraper tests.
+    """
+
+    active = 0
+    peak = 0
+    etag_requests = []
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def send_page(self, body, content_type='text/html; charset=utf-8', status=200):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = self.path.split('?')[0]
+        if path == '/page':
+            self.send_page('<html><body><h1>Grüße</h1><p>Therapy devices</p></body></html>'.encode('utf-8'))
+        elif path == '/latin':
+            body = '<html><head><meta charset="iso-8859-1"></head><body>Systemlösungen</body></html>'
+            self.send_page(body.encode('latin-1'), content_type='text/html')
+        elif path == '/redirect':
+            self.send_response(301)
+            self.send_header('Location', '/page')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+        elif path == '/big':
+            self.send_page(b'<html><body>' + b'x' * 100000 + b'</body></html>')
+        elif path == '/slow':
+            with PageHandler.lock:
+                PageHandler.active += 1
+                PageHandler.peak = max(PageHandler.peak, PageHandler.active)
+            time.sleep(0.05)
+            with PageHandler.lock:
+                PageHandler.active -= 1
+            self.send_page(b'<html><body>slow</body></html>')
+        elif path == '/etag':
+            PageHandler.etag_requests.append(self.headers.get('If-None-Match'))
+            if self.headers.get('If-None-Match') == '"v1"':
+                self.send_response(304)
+                self.end_headers()
+            else:
+                self.send_response(200)
+                body = b'<html><body>versioned</body></html>'
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('ETag', '"v1"')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+        elif path == '/agent':
+            self.send_page(f'<html><body>{self.headers.get("User-Agent")}</body></html>'.encode('utf-8'))
+        else:
+            self.send_page(b'not found', status=404)
+
+@pytest.fixture(scope="module")
+def http_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), PageHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+def test_normalize_url():
+    assert normalize_url('blipack.ch') == 'https://blipack.ch/'
+    assert normalize_url(' www.Oxyle.CH ') == 'https://www.oxyle.ch/'
+    assert normalize_url('https://www.exxomove.de/') == 'https://www.exxomove.de/'
+    assert normalize_url('http://example.com/a?b=1#top') == 'http://example.com/a?b=1'
+    assert normalize_url('') is None
+    assert normalize_url(None) is None
+
+def test_scrape_utf8_page_and_user_agent(http_server):
+    scraper = Scraper()
+    assert scraper.scrape(http_server + '/page') == 'Grüße Therapy devices'
+    assert 'LLM-Classifier' in scraper.scrape(http_server + '/agent')
+
+def test_scrape_uses_meta_charset(http_server):
+    assert Scraper().scrape(http_server + '/latin') == 'Systemlösungen'
+
+def test_scrape_follows_redirects(http_server):
+    assert Scraper().scrape(http_server + '/redirect') == 'Grüße Therapy devices'
+
+def test_scrape_caps_response_size(http_server):
+    scraper = Scraper(max_bytes=1000)
+    content, _ = scraper.fetch(http_server + '/big')
+    assert len(content) == 1000
+
+def test_scrape_errors_return_empty_text(http_server):
+    assert Scraper().scrape(http_server + '/missing') == ""
+
+def test_concurrent_scrapes_are_limited_per_host(http_server):
+    PageHandler.peak = 0
+    scraper = Scraper(max_workers=8, per_host_limit=2)
+    urls = [http_server + f'/slow?{i}' for i in range(6)]
+    urls.insert(2, http_server + '/page')
+
+    # The pipeline's scrape stage calls one shared Scraper from several workers
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        texts = list(executor.map(scraper.scrape, urls))
+
+    assert texts[2] == 'Grüße Therapy devices'
+    assert texts[:2] + texts[3:] == ['slow'] * 6
+    assert PageHandler.peak <= 2
+
+def test_page_cache_serves_fresh_pages_and_revalidates_stale_ones(http_server, tmp_path):
+    PageHandler.etag_requests = []
+    cache = ScrapeCache(str(tmp_path / 'scrape_cache.db'))
+    url = http_server + '/etag'
+
+    scraper = Scraper(page_cache=cache, page_ttl=3600)
+    assert scraper.scrape(url) == 'versioned'
+    assert scraper.scrape(url) == 'versioned'
+    assert PageHandler.etag_requests == [None]
+    assert scraper.stats['fetched'] == 1
+    assert scraper.stats['cache_hits'] == 1
+
+    # With a zero TTL every cached page is revalidated with its ETag
+    stale = Scraper(page_cache=cache, page_ttl=0)
+    assert stale.scrape(url) == 'versioned'
+    assert PageHandler.etag_requests == [None, '"v1"']
+    assert stale.stats['revalidated'] == 1
+    cache.close()
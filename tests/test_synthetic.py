@@ -0,0 +1,91 @@
+import sys
+import os
+import csv
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+
+from scripts import benchmark
+from src import classifier, llm_client
+from src.cache import MemoryCache
+from src.classifier import classify_many
+from src.extraction import reduce_page
+from src.llm_client import FakeLLMClient, FakeLLMError
+from src.scheduler import is_retryable
+from src.scraper import Scraper
+from src.synthetic import SyntheticSite, fake_responder, write_partners_csv, write_prospects_csv
+
+def test_synthetic_csvs_are_deterministic(tmp_path):
+    first, second = str(tmp_path / 'a.csv'), str(tmp_path / 'b.csv')
+    write_prospects_csv(first, 50, seed=3)
+    write_prospects_csv(second, 50, seed=3)
+    with open(first, 'rb') as a, open(second, 'rb') as b:
+        assert a.read() == b.read()
+
+    with open(first, encoding='latin-1') as f:
+        rows = list(csv.DictReader(f))
+    assert len(rows) == 50
+    assert all(row['firma'] and row['url'] and row['Beschreibung'] for row in rows)
+
+    partners = str(tmp_path / 'partners.csv')
+    write_partners_csv(partners, 10)
+    with open(partners, encoding='latin-1') as f:
+        assert len(list(csv.DictReader(f))) == 10
+
+def test_fake_llm_client_counts_tokens_and_fails_at_error_rate():
+    fake = FakeLLMClient("x" * 40, error_rate=0.5, seed=1, record_calls=False)
+    failures = 0
+    for _ in range(100):
+        try:
+            fake.generate("y" * 400, "m")
+        except FakeLLMError as e:
+            assert is_retryable(e)
+            failures += 1
+    assert failures == fake.errors
+    assert 30 < failures < 70
+    assert fake.requests == 100
+    assert fake.tokens_in == 100 * (100 - failures)
+    assert fake.tokens_out == 10 * (100 - failures)
+    assert fake.calls == []
+
+@pytest.mark.parametrize('pack_size', [1, 4])
+def test_fake_responder_answers_classification_prompts(pack_size):
+    llm_client.set_client(FakeLLMClient(fake_responder()))
+    classifier.set_cache(MemoryCache())
+    try:
+        results = classify_many([f"Company {i} sells software." for i in range(6)], pack_size=pack_size)
+    finally:
+        llm_client.set_client(None)
+        classifier.set_cache(None)
+    assert all(result['primary'] not in ('UNKNOWN', 'OTHER') for result in results)
+
+def test_synthetic_site_serves_pages():
+    with SyntheticSite() as site:
+        scraper = Scraper(max_workers=2)
+        try:
+            content, encoding = scraper.fetch(site.base_url + '/company/7')
+            assert scraper.fetch_page(site.base_url + '/missing') is None
+        finally:
+            scraper.close()
+    text, report = reduce_page(content, encoding)
+    assert 'Cookies' not in text and 'Startseite' not in text
+    assert report['saved_tokens'] > 0
+
+def test_benchmarks_record_and_compare(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    results_file = str(tmp_path / 'benchmarks.jsonl')
+    results, regressions = benchmark.run_benchmarks(sizes=[20], results_file=results_file,
+                                                    latency=0.0, matching_partners=20)
+    assert {r['benchmark'] for r in results} == set(benchmark.BENCHMARKS)
+    assert regressions == []
+    pipeline = next(r for r in results if r['benchmark'] == 'pipeline')
+    assert pipeline['errors'] == 0
+    assert set(pipeline['stage_rows_per_second']) == {'scrape', 'summarize', 'classify'}
+
+    history = benchmark.load_results(results_file)
+    assert len(history) == len(results)
+    slower = dict(history[0], rows_per_second=history[0]['rows_per_second'] / 2)
+    before, change = benchmark.compare(slower, history)
+    assert change == pytest.approx(-0.5, abs=0.01)
@@ -0,0 +1,48 @@
+import sys
+import os
+import json
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.classifier import PROMPT_TEMPLATE, build_prompt, parse_packed_response
+from src.taxonomy import TAXONOMY_FILE, Taxonomy, codes_from_result, get_taxonomy
+
+def test_taxonomy_is_loaded_once_independent_of_cwd(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    first = get_taxonomy()
+    second = get_taxonomy()
+    assert first is second
+    assert len(first) == 56
+    assert "F_HR" in first
+    assert len(first.version) == 12
+
+def test_missing_taxonomy_is_empty(tmp_path):
+    taxonomy = get_taxonomy(str(tmp_path / 'missing.json'))
+    assert not taxonomy
+
+def test_build_prompt_matches_full_template_rendering():
+    with open(TAXONOMY_FILE, 'r', encoding='utf-8') as f:
+        codes = json.load(f)
+    expected = PROMPT_TEMPLATE.replace('{{taxonomy}}', json.dumps(codes, indent=2))
+    expected = expected.replace('{{description}}', "A payroll software vendor.")
+
+    assert build_prompt("A payroll software vendor.", get_taxonomy()) == expected
+    assert build_prompt("A payroll software vendor.", codes) == expected
+
+def test_codes_from_result_filters_unknown_codes():
+    taxonomy = Taxonomy({"F_HR": "HR", "TECH_SAAS": "SaaS"})
+    result = {"primary": "F_HR", "secondary": ["X_SAAS", "TECH_SAAS", "F_HR"]}
+    assert codes_from_result(result) == ["F_HR", "X_SAAS", "TECH_SAAS", "F_HR"]
+    assert codes_from_result(result, taxonomy) == ["F_HR", "TECH_SAAS"]
+    assert codes_from_result({"error": "failed"}, taxonomy) == []
+
+def test_packed_parse_uses_taxonomy_code_set():
+    taxonomy = Taxonomy({"F_HR": "HR", "TECH_SAAS": "SaaS"})
+    response = json.dumps([
+        {"id": "1", "primary": "F_HR", "secondary": ["X_SAAS", "TECH_SAAS"]},
+        {"id": "2", "primary": "S_SW", "secondary": []},
+    ])
+    parsed = parse_packed_response(response, ["1", "2"], taxonomy)
+    assert parsed["1"]["secondary"] == ["TECH_SAAS"]
+    assert "2" not in parsed